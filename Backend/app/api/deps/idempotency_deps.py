@@ -0,0 +1,167 @@
+"""
+``Idempotency-Key`` support for mutating routes.
+
+A route takes ``idempotency: IdempotencyGuard = Depends(Idempotency("orders"))``
+and returns ``await idempotency.run(lambda: ...)``. The first request with a key claims
+it in Redis and runs; its response is stored for IDEMPOTENCY_TTL_SECONDS and
+replayed to retries with the same key, which never run the work again. A
+retry that arrives while the first request is still running waits for its
+response. Reusing a key for a different request (other body or path) is an
+error. Keys are per user, and requests without the header run as usual.
+
+A failed request releases its key so it can be retried, unless the request's
+session committed before the failure (e.g. the order was placed and a
+notification failed): then the write happened, and the error is stored and
+replayed like a response.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable
+
+from fastapi import Depends, Header, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps.auth_deps import get_current_user
+from app.core.config import settings
+from app.core.exceptions import AppException, ConflictException, ValidationException
+from app.core.logging import logger
+from app.db.postgres import get_db
+from app.db.redis import get_redis
+from app.models.user_model import User
+
+_PENDING = "pending"
+_DONE = "done"
+
+
+def _error_entry(exc: BaseException) -> dict:
+    if isinstance(exc, AppException):
+        return {"code": exc.code, "message": exc.message}
+    if isinstance(exc, HTTPException):
+        return {"status_code": exc.status_code, "message": exc.detail}
+    return {"status_code": 500, "message": "Internal Server Error"}
+
+
+def _replay_error(error: dict) -> BaseException:
+    if "code" in error:
+        return AppException(error["message"], code=error["code"])
+    return HTTPException(status_code=error["status_code"], detail=error["message"])
+
+
+class IdempotencyGuard:
+    def __init__(self, redis_key: str | None, fingerprint: str, response: Response, db: AsyncSession):
+        self.redis_key = redis_key
+        self.fingerprint = fingerprint
+        self.response = response
+        self.db = db
+
+    async def run(self, work: Callable[[], Awaitable[Any]]) -> Any:
+        if self.redis_key is None:
+            return await work()
+        try:
+            redis = await get_redis()
+            stored = await self._claim(redis)
+        except (ConflictException, asyncio.CancelledError):
+            raise
+        except Exception as exc:
+            # Without Redis there is nothing to dedupe against; don't fail the request.
+            logger.warning("Idempotency check skipped for %s: %s", self.redis_key, str(exc))
+            return await work()
+
+        if stored is not None:
+            self.response.headers["Idempotent-Replayed"] = "true"
+            if "error" in stored:
+                raise _replay_error(stored["error"])
+            return stored["body"]
+
+        committed = False
+
+        def _on_commit(session) -> None:
+            nonlocal committed
+            committed = True
+
+        sync_session = self.db.sync_session
+        event.listen(sync_session, "after_commit", _on_commit)
+        try:
+            result = await work()
+        except BaseException as exc:
+            if committed:
+                # The write went through before the failure; a retry must not repeat it.
+                await self._store(redis, error=_error_entry(exc))
+            else:
+                # The work rolled back; let a retry run it again.
+                await self._release(redis)
+            raise
+        finally:
+            event.remove(sync_session, "after_commit", _on_commit)
+        await self._store(redis, body=jsonable_encoder(result))
+        return result
+
+    async def _claim(self, redis) -> dict | None:
+        """None when this request now owns the key, else the stored response of the one that did."""
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.05
+        while True:
+            pending = json.dumps({"state": _PENDING, "fingerprint": self.fingerprint})
+            if await redis.set(self.redis_key, pending, nx=True, ex=settings.IDEMPOTENCY_LOCK_SECONDS):
+                return None
+            raw = await redis.get(self.redis_key)
+            if raw is None:
+                # The first request failed and released the key; try to take it.
+                continue
+            entry = json.loads(raw)
+            if entry["fingerprint"] != self.fingerprint:
+                raise ConflictException("Idempotency-Key was already used for a different request")
+            if entry["state"] == _DONE:
+                return entry
+            if time.monotonic() >= deadline:
+                raise ConflictException("A request with this Idempotency-Key is still in progress")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def _store(self, redis, *, body: Any = None, error: dict | None = None) -> None:
+        entry = {"state": _DONE, "fingerprint": self.fingerprint}
+        if error is not None:
+            entry["error"] = error
+        else:
+            entry["body"] = body
+        try:
+            await redis.set(self.redis_key, json.dumps(entry), ex=settings.IDEMPOTENCY_TTL_SECONDS)
+        except Exception as exc:
+            logger.warning("Idempotent response not stored for %s: %s", self.redis_key, str(exc))
+
+    async def _release(self, redis) -> None:
+        try:
+            await redis.delete(self.redis_key)
+        except Exception as exc:
+            logger.warning("Idempotency key %s not released: %s", self.redis_key, str(exc))
+
+
+class Idempotency:
+    def __init__(self, scope: str):
+        self.scope = scope
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        user: User = Depends(get_current_user),
+        # The route's own session (dependencies are cached per request), to see its commits.
+        db: AsyncSession = Depends(get_db),
+        idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+    ) -> IdempotencyGuard:
+        body = await request.body()
+        fingerprint = hashlib.sha256(
+            b"\n".join([request.method.encode(), request.url.path.encode(), body])
+        ).hexdigest()
+        if idempotency_key is None:
+            return IdempotencyGuard(None, fingerprint, response, db)
+        idempotency_key = idempotency_key.strip()
+        if not idempotency_key or len(idempotency_key) > 255:
+            raise ValidationException("Idempotency-Key must be 1-255 characters")
+        key_hash = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        return IdempotencyGuard(f"idempotency:{self.scope}:{user.id}:{key_hash}", fingerprint, response, db)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps.auth_deps import require_roles
@@ -19,6 +19,11 @@ from app.services.admin_service import (
     refund_order,
     update_seller_commission_config,
 )
+from app.services.inventory_service import mark_hot_product, unmark_hot_product
+from app.services.reservation_expirer import reservation_stats
+from app.services.search_indexer import search_index_stats
+from app.services.search_service import search_backend_stats
+from app.utils.cache import cache_stats
 from app.utils.rate_limiter import RateLimiter
 
 admin_rate_limit = RateLimiter(limit=50, window_seconds=60, key_prefix="admin")
@@ -139,3 +144,50 @@ async def export_report(
     admin: User = Depends(require_roles("admin")),
 ):
     return await export_orders_report_csv(db=db)
+
+
+@router.get("/cache/stats")
+async def cache_statistics(
+    admin: User = Depends(require_roles("admin")),
+):
+    return cache_stats()
+
+
+@router.get("/search/index-stats")
+async def search_index_statistics(
+    admin: User = Depends(require_roles("admin")),
+):
+    return await search_index_stats()
+
+
+@router.get("/search/backend-stats")
+async def search_backend_statistics(
+    admin: User = Depends(require_roles("admin")),
+):
+    return search_backend_stats()
+
+
+@router.post("/inventory/hot/{product_id}")
+async def mark_hot(
+    product_id: int,
+    seconds: int | None = Query(default=None, ge=60, le=7 * 86400),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(require_roles("admin")),
+):
+    """Gate checkouts of a flash-sale product on a Redis counter (re-seeds it if already hot)."""
+    return await mark_hot_product(db=db, product_id=product_id, seconds=seconds)
+
+
+@router.delete("/inventory/hot/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def unmark_hot(
+    product_id: int,
+    admin: User = Depends(require_roles("admin")),
+):
+    await unmark_hot_product(product_id)
+
+
+@router.get("/inventory/reservations")
+async def inventory_reservations(
+    admin: User = Depends(require_roles("admin")),
+):
+    return await reservation_stats()
@@ -4,8 +4,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps.auth_deps import get_current_user
 from app.db.postgres import get_db
 from app.models.user_model import User
-from app.schemas.cart_schema import CartOut, CartSyncIn
-from app.services.cart_service import clear_user_cart, get_user_cart, replace_user_cart, sync_guest_cart
+from app.schemas.cart_schema import CartItemIn, CartOut, CartQuantityIn, CartSyncIn
+from app.services.cart_service import (
+    add_cart_item,
+    clear_user_cart,
+    get_user_cart,
+    remove_cart_item,
+    replace_user_cart,
+    set_cart_item_quantity,
+    sync_guest_cart,
+)
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
@@ -36,6 +44,34 @@ async def sync_cart(
     return await sync_guest_cart(db, user.id, payload)
 
 
+@router.post("/items", response_model=CartOut)
+async def add_item(
+    payload: CartItemIn,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    return await add_cart_item(db, user.id, payload)
+
+
+@router.put("/items/{product_id}", response_model=CartOut)
+async def set_item_quantity(
+    product_id: int,
+    payload: CartQuantityIn,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    return await set_cart_item_quantity(db, user.id, product_id, payload.quantity)
+
+
+@router.delete("/items/{product_id}", response_model=CartOut)
+async def remove_item(
+    product_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    return await remove_cart_item(db, user.id, product_id)
+
+
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
 async def clear_cart(
     db: AsyncSession = Depends(get_db),
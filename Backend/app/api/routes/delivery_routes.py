@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.exceptions import ConflictException, NotFoundException, PermissionDeniedException
 from app.db.postgres import get_db
-from app.schemas.delivery_schema import (DeliveryAssign, DeliveryStatusUpdate)
+from app.schemas.delivery_schema import (DeliveryAssign, DeliveryStatusUpdate, DispatchMatchRequest)
 from app.services.delivery_service import (
     assign_delivery_partner,
     claim_delivery_with_context,
@@ -11,7 +16,10 @@ from app.services.delivery_service import (
     get_delivery_route_context,
     get_partner_earnings_summary,
     get_tracking_for_order_access_checked,
+    get_tracking_snapshot_access_checked,
     generate_delivery_route,
+    ingest_delivery_tracking_batch,
+    parse_tracking_batch_payload,
     parse_tracking_payload,
     serialize_delivery,
     update_delivery_status,
@@ -20,6 +28,8 @@ from app.services.delivery_service import (
 from app.api.deps.auth_deps import get_current_user, require_roles
 from app.models.user_model import User
 from app.models.delivery_model import DeliveryStatus
+from app.services.dispatch_service import get_ranked_open_orders, match_partners_for_orders
+from app.services.tracking_service import watch_order
 
 router = APIRouter(prefix="/delivery", tags=["delivery"])
 
@@ -46,6 +56,31 @@ async def available_deliveries(
     return await get_available_deliveries_feed(db=db, partner_id=partner.id)
 
 
+@router.get("/available/ranked")
+async def ranked_available_deliveries(
+    lat: float | None = Query(None, ge=-90, le=90),
+    lng: float | None = Query(None, ge=-180, le=180),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    partner: User = Depends(require_roles("delivery")),
+):
+    return await get_ranked_open_orders(db=db, partner_id=partner.id, lat=lat, lng=lng, skip=skip, limit=limit)
+
+
+@router.post("/dispatch/match")
+async def dispatch_match(
+    data: DispatchMatchRequest,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(require_roles("admin")),
+):
+    if len(data.order_ids) > settings.DISPATCH_MATCH_MAX_ORDERS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.DISPATCH_MATCH_MAX_ORDERS} orders per request"
+        )
+    return await match_partners_for_orders(db=db, order_ids=data.order_ids, assign=data.assign)
+
+
 @router.post("/claim/{order_id}")
 async def claim_delivery(
     order_id: int,
@@ -143,9 +178,26 @@ async def tracking_location(
     return {"ok": True, "tracking": tracking}
 
 
+@router.post("/tracking/locations")
+async def tracking_locations_batch(
+    payload: dict,
+    db: AsyncSession = Depends(get_db),
+    partner: User = Depends(require_roles("delivery")),
+):
+    try:
+        points = parse_tracking_batch_payload(payload)
+        result = await ingest_delivery_tracking_batch(db=db, partner_id=partner.id, points=points)
+    except ConflictException as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"ok": True, **result}
+
+
 @router.get("/tracking/order/{order_id}")
 async def tracking_by_order(
     order_id: int,
+    history: bool = Query(True, description="Include a page of location history"),
+    limit: int = Query(100, ge=1, le=500),
+    before: str | None = Query(None, description="next_cursor from a previous page"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -154,9 +206,47 @@ async def tracking_by_order(
             db=db,
             order_id=order_id,
             current_user=current_user,
+            include_history=history,
+            history_limit=limit,
+            before=before,
         )
     except NotFoundException as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
     except PermissionDeniedException as exc:
         raise HTTPException(status_code=403, detail=str(exc)) from exc
 
+
+
+@router.get("/tracking/order/{order_id}/stream")
+async def tracking_stream(
+    order_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Server-Sent Events: a ``snapshot`` event, then a ``location`` event per update."""
+    try:
+        snapshot = await get_tracking_snapshot_access_checked(db=db, order_id=order_id, current_user=current_user)
+    except NotFoundException as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except PermissionDeniedException as exc:
+        raise HTTPException(status_code=403, detail=str(exc)) from exc
+    # Access is checked once; release the connection for the life of the stream.
+    await db.close()
+
+    async def events():
+        async with watch_order(order_id) as updates:
+            yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(updates.get(), timeout=settings.TRACKING_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: location\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,11 +2,13 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps.auth_deps import get_current_user
+from app.api.deps.idempotency_deps import Idempotency, IdempotencyGuard
 from app.db.postgres import get_db
 from app.models.user_model import User
-from app.schemas.order_schema import OrderCreate, OrderOut, ReturnRequest
+from app.schemas.order_schema import CheckoutCreate, CheckoutOut, OrderCreate, OrderOut, ReturnRequest
 from app.services.order_service import (
     cancel_order_and_notify,
+    checkout_and_notify,
     get_buyer_order_detail_payload,
     get_buyer_order_summary_payload,
     get_buyer_orders_payload,
@@ -17,6 +19,7 @@ from app.utils.rate_limiter import RateLimiter
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 place_order_rate_limit = RateLimiter(limit=10, window_seconds=60, key_prefix="place_order")
+order_idempotency = Idempotency("orders")
 
 
 @router.post("/", response_model=OrderOut)
@@ -25,8 +28,20 @@ async def place_order(
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
     _rate_limit: None = Depends(place_order_rate_limit),
+    idempotency: IdempotencyGuard = Depends(order_idempotency),
 ):
-    return await place_order_and_notify(db=db, user=user, payload=payload)
+    return await idempotency.run(lambda: place_order_and_notify(db=db, user=user, payload=payload))
+
+
+@router.post("/checkout", response_model=CheckoutOut)
+async def checkout(
+    payload: CheckoutCreate,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+    _rate_limit: None = Depends(place_order_rate_limit),
+    idempotency: IdempotencyGuard = Depends(order_idempotency),
+):
+    return await idempotency.run(lambda: checkout_and_notify(db=db, user=user, payload=payload))
 
 
 @router.get("/")
@@ -107,9 +107,10 @@ async def featured_products(db: AsyncSession = Depends(get_db)):
 @router.get("/search", response_model=list[ProductOut])
 async def search_products(
     q: str = Query(..., min_length=1, max_length=120),
+    limit: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db),
 ):
-    return await search_products_by_query(db=db, q=q)
+    return await search_products_by_query(db=db, q=q, limit=limit)
 
 
 @router.get("/{product_id}", response_model=ProductOut)
@@ -1,18 +1,24 @@
+from typing import Literal
+
 from fastapi import APIRouter, Query, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.postgres import get_db
 from app.utils.rate_limiter import RateLimiter
 from app.services.search_service import (
+    ProductFilters,
     global_search as global_search_service,
     search_products as search_products_service,
     search_stores as search_stores_service,
+    suggest as suggest_service,
 )
 
 search_rate_limit = RateLimiter(limit=60, window_seconds=60, key_prefix="search")
-router = APIRouter(prefix="/search", tags=["search"], dependencies=[Depends(search_rate_limit)])
+# Typeahead fires on keystrokes, so it gets its own, larger budget.
+suggest_rate_limit = RateLimiter(limit=600, window_seconds=60, key_prefix="search-suggest")
+router = APIRouter(prefix="/search", tags=["search"])
 
 
-@router.get("/")
+@router.get("/", dependencies=[Depends(search_rate_limit)])
 async def global_search(
     q: str = Query(..., min_length=1, max_length=120),
     db: AsyncSession = Depends(get_db)
@@ -21,23 +27,56 @@ async def global_search(
     return await global_search_service(db=db, q=q)
 
 
-@router.get("/products")
+@router.get("/products", dependencies=[Depends(search_rate_limit)])
 async def search_products(
     q: str = Query(..., min_length=1, max_length=120),
     page: int = Query(1, ge=1),
     size: int = Query(20, le=100),
+    cursor: str | None = Query(None, max_length=512, description="next_cursor from the previous page; overrides page"),
+    min_price: int | None = Query(None, ge=0),
+    max_price: int | None = Query(None, ge=0),
+    category: str | None = Query(None, max_length=100, description="Category slug"),
+    seller_id: int | None = Query(None),
+    in_stock: bool = Query(False, description="Only products with stock left"),
+    lat: float | None = Query(None, ge=-90, le=90),
+    lng: float | None = Query(None, ge=-180, le=180),
+    radius_km: float | None = Query(None, gt=0, le=100, description="Only sellers within this distance of lat/lng"),
+    sort: Literal["relevance", "rating"] = Query("relevance"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Search products by name or description"""
-    return await search_products_service(db=db, q=q, page=page, size=size)
+    """Search products by name or description, with filters and facet counts (first page only)"""
+    filters = ProductFilters(
+        min_price=min_price,
+        max_price=max_price,
+        category=category,
+        seller_id=seller_id,
+        in_stock=in_stock,
+        lat=lat,
+        lng=lng,
+        radius_km=radius_km,
+    )
+    return await search_products_service(
+        db=db, q=q, page=page, size=size, cursor=cursor, filters=filters, sort=sort
+    )
 
 
-@router.get("/stores")
+@router.get("/stores", dependencies=[Depends(search_rate_limit)])
 async def search_stores(
     q: str = Query(..., min_length=1, max_length=120),
     page: int = Query(1, ge=1),
     size: int = Query(20, le=100),
+    cursor: str | None = Query(None, max_length=512, description="next_cursor from the previous page; overrides page"),
     db: AsyncSession = Depends(get_db)
 ):
     """Search stores by name or description"""
-    return await search_stores_service(db=db, q=q, page=page, size=size)
+    return await search_stores_service(db=db, q=q, page=page, size=size, cursor=cursor)
+
+
+@router.get("/suggest", dependencies=[Depends(suggest_rate_limit)])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=60),
+    size: int = Query(5, ge=1, le=10),
+    db: AsyncSession = Depends(get_db)
+):
+    """Typeahead completions from product titles and store names"""
+    return await suggest_service(db=db, q=q, size=size)
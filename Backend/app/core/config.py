@@ -25,6 +25,15 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str
 
+    # Cache
+    CACHE_L1_MAX_ENTRIES: int = 5000
+    CACHE_L2_ENABLED: bool = True
+    CACHE_REDIS_PREFIX: str = "cache:"
+    CACHE_TAG_TTL_SECONDS: int = 3600
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    CACHE_STALE_SECONDS: int = 60
+    CACHE_LOCK_SECONDS: float = 3.0
+
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
@@ -48,11 +57,73 @@ class Settings(BaseSettings):
     RAZORPAY_KEY_SECRET: str = ""
     RAZORPAY_WEBHOOK_SECRET: str = ""
 
+    # Inventory
+    # Flash sales: checkouts of products marked hot are admitted against a Redis counter first.
+    INVENTORY_HOT_SKU_ENABLED: bool = True
+    INVENTORY_HOT_SKU_DEFAULT_SECONDS: int = 3600
+    # How long an unpaid prepaid order holds its stock.
+    INVENTORY_RESERVATION_TTL_SECONDS: int = 900
+    INVENTORY_RESERVATION_BATCH_SIZE: int = 200
+    INVENTORY_RESERVATION_POLL_SECONDS: float = 5.0
+
+    # Idempotency-Key: responses are replayed for a day; a duplicate waits up to
+    # IDEMPOTENCY_WAIT_SECONDS for the first request, whose claim lapses after IDEMPOTENCY_LOCK_SECONDS.
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+
+    # Cart: optional Redis write-through copy of each cart. Two concurrent writes can
+    # land in the cache out of order, so keep the TTL short.
+    CART_REDIS_ENABLED: bool = False
+    CART_REDIS_TTL_SECONDS: int = 900
+
     # Elasticsearch
     ELASTICSEARCH_URL: str = "http://localhost:9200"
     ELASTICSEARCH_PRODUCTS_INDEX: str = "rushcart_products"
     ELASTICSEARCH_STORES_INDEX: str = "rushcart_stores"
     ELASTICSEARCH_TIMEOUT_SECONDS: int = 5
+    # Breaker: open after this many consecutive errors or slow searches, probe again after the reset.
+    ELASTICSEARCH_BREAKER_FAILURES: int = 5
+    ELASTICSEARCH_BREAKER_SLOW_SECONDS: float = 1.0
+    ELASTICSEARCH_BREAKER_RESET_SECONDS: float = 30.0
+    # Hedging: also run the SQL fallback when a search outlives the recent p95 (at most the budget).
+    SEARCH_HEDGE_ENABLED: bool = False
+    SEARCH_HEDGE_BUDGET_SECONDS: float = 0.3
+    SEARCH_INDEX_BATCH_SIZE: int = 500
+    SEARCH_INDEX_FLUSH_INTERVAL_SECONDS: float = 1.0
+    SEARCH_INDEX_MAX_ATTEMPTS: int = 8
+    SEARCH_INDEX_RETRY_BASE_SECONDS: float = 2.0
+    SEARCH_INDEX_CLAIM_TIMEOUT_SECONDS: int = 120
+    SEARCH_INDEX_QUEUE_HIGH_WATER: int = 50000
+    SEARCH_INDEX_BACKPRESSURE_SECONDS: float = 2.0
+    # SQL fallback: trigram matching for queries with no full-text hit (needs pg_trgm).
+    SEARCH_TRIGRAM_ENABLED: bool = True
+
+    # Geo
+    GEO_EARTHDISTANCE_ENABLED: bool = True
+
+    # Delivery tracking
+    TRACKING_HISTORY_MAXLEN: int = 300
+    TRACKING_RETENTION_SECONDS: int = 86400
+    TRACKING_BATCH_MAX_POINTS: int = 500
+    TRACKING_MIN_DISTANCE_METERS: float = 10.0
+    TRACKING_MIN_INTERVAL_SECONDS: float = 2.0
+    TRACKING_HEARTBEAT_SECONDS: float = 30.0
+    TRACKING_CHANNEL_PREFIX: str = "tracking:order:"
+    TRACKING_STREAM_QUEUE_SIZE: int = 20
+    TRACKING_STREAM_KEEPALIVE_SECONDS: float = 15.0
+
+    # Dispatch
+    DISPATCH_POSITION_TTL_SECONDS: int = 900
+    DISPATCH_FEED_RADIUS_KM: float = 15.0
+    DISPATCH_FEED_CANDIDATES: int = 500
+    DISPATCH_MATCH_RADIUS_KM: float = 10.0
+    DISPATCH_MATCH_CANDIDATES: int = 10
+    DISPATCH_MATCH_MAX_ORDERS: int = 500
+    DISPATCH_MAX_ACTIVE_DELIVERIES: int = 1
+    # Ranking score in "pickup km": lower is better.
+    DISPATCH_EARNING_WEIGHT: float = 0.05
+    DISPATCH_AGE_WEIGHT: float = 0.1
 
     # ImageKit
     IMAGEKIT_PUBLIC_KEY: str = ""
@@ -5,7 +5,9 @@ from app.core.config import settings
 from app.db.base import Base
 import app.models  # noqa: F401 - ensures model metadata is registered before create_all
 from app.models.user_model import User, UserRole
+from app.utils.geohash import encode_location
 from app.utils.hashing import get_password_hashed
+from app.utils.slug import category_slug
 
 # Async engine
 engine: AsyncEngine = create_async_engine(
@@ -31,11 +33,23 @@ async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
 
+
+async def run_with_session(func, *args, **kwargs):
+    """Run ``func(session, ...)`` on a fresh session, for work that outlives a request."""
+    async with AsyncSessionLocal() as session:
+        return await func(session, *args, **kwargs)
+
 # Dependency
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
         await migrate_geo_columns(conn)
+        await migrate_seller_geohash(conn)
+        await migrate_delivery_feed_indexes(conn)
+        await migrate_search_vectors(conn)
+        await migrate_review_aggregates(conn)
+        await migrate_product_category_slug(conn)
+        await migrate_expired_statuses(conn)
     await seed_default_admin()
 
 
@@ -81,6 +95,173 @@ async def migrate_geo_columns(conn) -> None:
         )
 
 
+async def migrate_seller_geohash(conn) -> None:
+    await conn.execute(text("ALTER TABLE sellers ADD COLUMN IF NOT EXISTS geohash VARCHAR(12)"))
+    await conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_sellers_geohash ON sellers (geohash varchar_pattern_ops)")
+    )
+    await backfill_seller_geohash(conn)
+
+    has_earthdistance = await conn.execute(
+        text("SELECT 1 FROM pg_extension WHERE extname = 'earthdistance'")
+    )
+    if settings.GEO_EARTHDISTANCE_ENABLED and has_earthdistance.scalar():
+        await conn.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS ix_sellers_earth
+                ON sellers USING gist (ll_to_earth(latitude, longitude))
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                """
+            )
+        )
+
+
+async def backfill_seller_geohash(conn, batch_size: int = 1000) -> None:
+    """Fill ``sellers.geohash`` for located rows that have none.
+
+    Runs at every startup, so it only looks at rows missing a geohash; code that
+    changes coordinates outside the ORM must set ``geohash`` to NULL.
+    """
+    await conn.execute(
+        text(
+            """
+            UPDATE sellers SET geohash = NULL
+            WHERE geohash IS NOT NULL AND (latitude IS NULL OR longitude IS NULL)
+            """
+        )
+    )
+    missing = text(
+        """
+        SELECT id, latitude, longitude
+        FROM sellers
+        WHERE id > :last_id AND geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+        ORDER BY id
+        LIMIT :batch_size
+        """
+    )
+    last_id = 0
+    while True:
+        result = await conn.execute(missing, {"last_id": last_id, "batch_size": batch_size})
+        rows = result.all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        await conn.execute(
+            text("UPDATE sellers SET geohash = :geohash WHERE id = :id"),
+            [{"id": row.id, "geohash": encode_location(row.latitude, row.longitude)} for row in rows],
+        )
+
+
+async def migrate_delivery_feed_indexes(conn) -> None:
+    # Partner feed: deliveries of one partner, newest first.
+    await conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_deliveries_partner_created ON deliveries (partner_id, created_at DESC)")
+    )
+    # Open-order feed: unassigned packed/shipped orders, newest first.
+    await conn.execute(
+        text(
+            """
+            CREATE INDEX IF NOT EXISTS ix_orders_open_for_delivery ON orders (created_at DESC)
+            WHERE delivery_partner_id IS NULL AND status IN ('packed', 'shipped')
+            """
+        )
+    )
+
+
+async def migrate_search_vectors(conn) -> None:
+    # Full-text columns for the SQL search fallback (app.services.text_search);
+    # the name is weight A like the ^3 boost in the Elasticsearch queries.
+    await conn.execute(
+        text(
+            """
+            ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(category, '')), 'B')
+                || setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+            ) STORED
+            """
+        )
+    )
+    await conn.execute(
+        text(
+            """
+            ALTER TABLE sellers ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(store_name, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(city, '')), 'B')
+                || setweight(to_tsvector('simple', coalesce(description, '') || ' ' || coalesce(address, '')), 'C')
+            ) STORED
+            """
+        )
+    )
+    await conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)")
+    )
+    await conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_sellers_search_vector ON sellers USING gin (search_vector)")
+    )
+
+    has_trgm = await conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+    if settings.SEARCH_TRIGRAM_ENABLED and has_trgm.scalar():
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_products_title_trgm ON products USING gin (title gin_trgm_ops)")
+        )
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_sellers_store_name_trgm ON sellers USING gin (store_name gin_trgm_ops)")
+        )
+
+
+async def migrate_review_aggregates(conn) -> None:
+    # Denormalized review counts/averages, kept up to date by review_service.
+    existing = await conn.execute(
+        text(
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'products' AND column_name = 'rating_total'
+            """
+        )
+    )
+    if existing.scalar():
+        return
+
+    await conn.execute(text("ALTER TABLE products ALTER COLUMN average_rating TYPE double precision"))
+    await conn.execute(
+        text("ALTER TABLE products ADD COLUMN IF NOT EXISTS review_count INTEGER NOT NULL DEFAULT 0")
+    )
+    await conn.execute(
+        text("ALTER TABLE products ADD COLUMN IF NOT EXISTS rating_total INTEGER NOT NULL DEFAULT 0")
+    )
+    await conn.execute(
+        text("ALTER TABLE sellers ADD COLUMN IF NOT EXISTS rating_total INTEGER NOT NULL DEFAULT 0")
+    )
+    await conn.execute(
+        text(
+            """
+            UPDATE products p
+            SET review_count = r.n, rating_total = r.total, average_rating = r.total::float / r.n
+            FROM (SELECT product_id, count(*) AS n, sum(rating) AS total FROM reviews GROUP BY product_id) r
+            WHERE p.id = r.product_id
+            """
+        )
+    )
+    await conn.execute(
+        text(
+            """
+            UPDATE sellers s
+            SET total_reviews = r.n, rating_total = r.total, average_rating = r.total::float / r.n
+            FROM (
+                SELECT p.seller_id, count(*) AS n, sum(rv.rating) AS total
+                FROM reviews rv JOIN products p ON p.id = rv.product_id
+                GROUP BY p.seller_id
+            ) r
+            WHERE s.id = r.seller_id
+            """
+        )
+    )
+
+
 async def seed_default_admin():
     async with AsyncSessionLocal() as session:
         result = await session.execute(select(User).where(User.email == settings.ADMIN_EMAIL))
@@ -100,3 +281,54 @@ async def seed_default_admin():
         )
         session.add(admin)
         await session.commit()
+
+
+async def migrate_product_category_slug(conn) -> None:
+    await conn.execute(text("ALTER TABLE products ADD COLUMN IF NOT EXISTS category_slug VARCHAR(100)"))
+    await conn.execute(
+        text(
+            """
+            CREATE INDEX IF NOT EXISTS ix_products_category_slug_created
+            ON products (category_slug, created_at, id) WHERE is_active
+            """
+        )
+    )
+    await backfill_product_category_slug(conn)
+
+
+async def backfill_product_category_slug(conn, batch_size: int = 1000) -> None:
+    """Fill ``products.category_slug`` for rows written before the column existed or outside the ORM."""
+    last_id = 0
+    while True:
+        result = await conn.execute(
+            text(
+                """
+                SELECT id, category
+                FROM products
+                WHERE id > :last_id AND category IS NOT NULL AND category_slug IS NULL
+                ORDER BY id
+                LIMIT :batch_size
+                """
+            ),
+            {"last_id": last_id, "batch_size": batch_size},
+        )
+        rows = result.all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        # Slugs are computed in Python so they match category_slug() exactly.
+        updates = [
+            {"id": row.id, "category_slug": category_slug(row.category)}
+            for row in rows
+            if category_slug(row.category)
+        ]
+        if updates:
+            await conn.execute(
+                text("UPDATE products SET category_slug = :category_slug WHERE id = :id"), updates
+            )
+
+
+async def migrate_expired_statuses(conn) -> None:
+    # Enum types created before the "expired" values existed.
+    for type_name in ("orderstatus", "paymentstatus"):
+        await conn.execute(text(f"ALTER TYPE {type_name} ADD VALUE IF NOT EXISTS 'expired'"))
@@ -15,10 +15,15 @@ from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.api.api_v1 import api_router
 from app.db.redis import init_redis, close_redis
-from app.db.postgres import init_db
+from app.db.postgres import init_db, run_with_session
 from app.core.exceptions import AppException
 from app.core.logging import logger
+from app.services.category_service import sync_categories_from_products
 from app.services.search_service import close_search_client, ensure_search_indices
+from app.services.reservation_expirer import start_reservation_expirer, stop_reservation_expirer
+from app.services.search_indexer import start_search_indexer, stop_search_indexer
+from app.services.tracking_service import stop_tracking_listener
+from app.utils.cache import start_cache_listener, stop_cache_listener
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -32,8 +37,21 @@ async def lifespan(app: FastAPI):
         logger.warning("Elasticsearch initialization skipped: %s", str(exc))
     await init_redis()
     logger.info("Redis connected")
+    await start_cache_listener()
+    try:
+        added = await run_with_session(sync_categories_from_products)
+        if added:
+            logger.info("Created %s categories from product categories", added)
+    except Exception as exc:
+        logger.warning("Category sync skipped: %s", str(exc))
+    await start_search_indexer()
+    await start_reservation_expirer()
     yield
     logger.info("Shutting down RushCart backend...")
+    await stop_cache_listener()
+    await stop_tracking_listener()
+    await stop_search_indexer()
+    await stop_reservation_expirer()
     await close_redis()
     await close_search_client()
     logger.info("Redis connection closed")
@@ -10,6 +10,8 @@ class OrderStatus(str, enum.Enum):
     shipped = "shipped"
     delivered = "delivered"
     cancelled = "cancelled"
+    # Prepaid and never paid within INVENTORY_RESERVATION_TTL_SECONDS.
+    expired = "expired"
     
 class PaymentMethod(str, enum.Enum):
     prepaid = "prepaid"
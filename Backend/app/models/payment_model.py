@@ -7,6 +7,7 @@ class PaymentStatus(str, enum.Enum):
     completed = "completed"
     refunded = "refunded"
     failed = "failed"
+    expired = "expired"
     
 class Payment(Base):
     __tablename__ = "payments"
@@ -1,9 +1,19 @@
-from sqlalchemy import (Column, Integer, String, Boolean, ForeignKey, Text, DateTime, func)
+from sqlalchemy import (Column, Integer, String, Boolean, ForeignKey, Text, DateTime, Float, Index, func, text)
 from sqlalchemy.dialects.postgresql import JSONB
 from app.db.base import Base
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Category listings: active products of one category, newest first.
+        Index(
+            "ix_products_category_slug_created",
+            "category_slug",
+            "created_at",
+            "id",
+            postgresql_where=text("is_active"),
+        ),
+    )
     
     id = Column(Integer, primary_key=True)
     seller_id = Column(
@@ -18,8 +28,13 @@ class Product(Base):
     stock = Column(Integer, default=0)
     images = Column(JSONB, nullable=True)
     category = Column(String(100), index = True)
+    # slugify(category); set by product_service, backfilled by migrate_product_category_slug.
+    category_slug = Column(String(100), nullable=True)
     is_active = Column(Boolean, default=True)
-    average_rating = Column(Integer, default=0)
+    average_rating = Column(Float, default=0.0)
+    # Maintained incrementally by review_service.
+    review_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_total = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
\ No newline at end of file
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import (Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, func, Float)
+from sqlalchemy import (Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, func, Float, Index)
 from sqlalchemy.dialects.postgresql import JSONB
 from app.db.base import Base
 
@@ -10,6 +10,10 @@ class SellerKYCStatus(str, enum.Enum):
 
 class Seller(Base):
     __tablename__ = "sellers"
+    __table_args__ = (
+        # Pattern ops so "geohash LIKE 'tdr1%'" can use the index under any collation.
+        Index("ix_sellers_geohash", "geohash", postgresql_ops={"geohash": "varchar_pattern_ops"}),
+    )
     
     id = Column(Integer, primary_key = True)
     
@@ -33,11 +37,13 @@ class Seller(Base):
     pincode = Column(String(20), nullable=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True)
     delivery_radius_km = Column(Integer, default=5)
     
     # Rating and reviews
     total_reviews = Column(Integer, default=0)
     average_rating = Column(Float, default=0.0)
+    rating_total = Column(Integer, default=0, server_default="0", nullable=False)
     
     #Approval & KYC
     approved = Column(Boolean, default=False)
@@ -3,12 +3,18 @@ from pydantic import BaseModel, Field
 
 class CartItemIn(BaseModel):
     product_id: int
+    # Defaults to the cart's store_id; set per item for carts from several stores.
+    store_id: int | None = None
     title: str
     price: int
     image: str | None = None
     quantity: int = Field(default=1, ge=1)
 
 
+class CartQuantityIn(BaseModel):
+    quantity: int = Field(ge=1)
+
+
 class CartSyncIn(BaseModel):
     store_id: int | None = None
     items: list[CartItemIn] = Field(default_factory=list)
@@ -16,6 +22,7 @@ class CartSyncIn(BaseModel):
 
 class CartItemOut(BaseModel):
     product_id: int
+    store_id: int
     title: str
     price: int
     image: str | None = None
@@ -23,5 +30,6 @@ class CartItemOut(BaseModel):
 
 
 class CartOut(BaseModel):
+    # The store when every item comes from one, otherwise None.
     store_id: int | None = None
     items: list[CartItemOut]
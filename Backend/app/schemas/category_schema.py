@@ -31,6 +31,8 @@ class CategoryOut(CategoryBase):
     is_active: bool
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # Active products in the category; filled in by the public listing only.
+    product_count: int = 0
 
     class Config:
         from_attributes = True
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
 from app.models.delivery_model import DeliveryStatus
 
 class DeliveryAssign(BaseModel):
@@ -10,6 +10,10 @@ class DeliveryAssign(BaseModel):
 class DeliveryStatusUpdate(BaseModel):
     status: DeliveryStatus
     
+class DispatchMatchRequest(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1)
+    assign: bool = False
+
 class LocationPing(BaseModel):
     order_id: int
     coordinates: Dict
@@ -4,7 +4,7 @@ from app.models.order_model  import OrderStatus, PaymentMethod
 
 class CartItemIn(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(..., ge=1)
     
 class AddressSchema(BaseModel):
     name: str
@@ -23,6 +23,13 @@ class OrderCreate(BaseModel):
     address: AddressSchema
     payment_method: PaymentMethod
     
+class CheckoutCreate(BaseModel):
+    """A cart from any number of stores; it becomes one order per store."""
+    items: List[CartItemIn] = Field(..., min_length=1)
+    address: AddressSchema
+    payment_method: PaymentMethod
+
+
 class OrderStatusUpdate(BaseModel):
     status: OrderStatus
     
@@ -34,3 +41,12 @@ class OrderOut(BaseModel):
     order_id: int
     status: str
     total_amount: float
+
+
+class CheckoutOrderOut(OrderOut):
+    seller_id: int
+
+
+class CheckoutOut(BaseModel):
+    orders: List[CheckoutOrderOut]
+    total_amount: float
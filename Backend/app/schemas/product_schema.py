@@ -33,6 +33,7 @@ class ProductOut(BaseModel):
     category: Optional[str] = None
     is_active: bool = True
     average_rating: float = 0.0
+    review_count: int = 0
     
     class Config:
         from_attributes = True
@@ -9,10 +9,10 @@ from app.models.notification_model import NotificationType
 from app.services.refund_service import process_refund
 from app.services.order_service import get_order_items_map
 from app.core.exceptions import(NotFoundException, ConflictException)
-from app.core.logging import logger
 from app.services.notification_service import create_notification
-from app.services.search_service import upsert_store_document
-from app.utils.simple_cache import cache_delete_prefix
+from app.services.search_indexer import enqueue_store_index
+from app.services.store_service import seller_cache_tags, seller_location_tags
+from app.utils.cache import cache_invalidate_tags
 from app.utils.email_handler import send_email_background
 from app.utils.email_templates import order_status_email, seller_approval_email
 
@@ -57,12 +57,11 @@ async def decide_seller(db: AsyncSession, seller_id: int, approved: bool, commis
         )
         subject, body = seller_approval_email(user.name, approved)
         send_email_background(user.email, subject, body)
-    try:
-        await upsert_store_document(db, seller.id)
-    except Exception as exc:
-        logger.warning("Seller indexing failed for %s: %s", seller.id, str(exc))
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await enqueue_store_index(seller.id)
+    await cache_invalidate_tags(
+        *seller_cache_tags(seller),
+        *seller_location_tags(seller.latitude, seller.longitude),
+    )
     return seller
 
 async def decide_return(db: AsyncSession, order_id: int, approved: bool) -> Order:
@@ -239,7 +238,7 @@ async def get_revenue_analytics(db: AsyncSession) -> dict:
             .scalar_subquery()
             .label("delivered_orders"),
             select(func.coalesce(func.sum(Order.total_amount), 0))
-            .where(Order.status != OrderStatus.cancelled)
+            .where(Order.status.not_in([OrderStatus.cancelled, OrderStatus.expired]))
             .scalar_subquery()
             .label("gross_revenue"),
             select(func.coalesce(func.sum(Commission.commission_amount), 0))
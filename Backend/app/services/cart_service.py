@@ -1,109 +1,324 @@
+"""
+Cart persistence.
+
+Writes touch only the rows that change: item operations and the full-cart
+endpoints upsert on ``uq_cart_buyer_product`` (INSERT ... ON CONFLICT DO
+UPDATE) and delete just the products that left the cart. With
+CART_REDIS_ENABLED the cart is also kept in a Redis hash (product id -> item),
+written through after every commit, so reads skip the database; any Redis
+error drops the hash and the next read reloads it. Reads fill the hash only
+if no write happened while they loaded the rows, so a slow read never
+overwrites a newer cart.
+"""
+
+import json
+
 from fastapi import HTTPException
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.redis import get_redis
 from app.models.cart_item_model import CartItem
-from app.schemas.cart_schema import CartSyncIn
+from app.schemas.cart_schema import CartItemIn, CartSyncIn
+
+CART_KEY = "cart:{buyer_id}"
+# Bumped by every write, so a read-through fill can tell its rows went stale.
+CART_VERSION_KEY = "cart:{buyer_id}:version"
+# Marks a cached cart as loaded, so an empty cart is a cache hit too.
+_LOADED_FIELD = "_loaded"
+# Change the cart hash KEYS[1] (version counter KEYS[2]). ARGV: mode, ttl,
+# version read before loading (fill only), number of removed fields n, the n
+# removed product ids, then product id / item pairs. Modes:
+#   apply   - a committed write; skipped when the cart is not cached, so a
+#             partial hash is never marked loaded
+#   replace - a committed write that knows the whole cart
+#   fill    - a read-through load; skipped when the cart is already cached or
+#             any write happened since the version was read
+_CACHE_APPLY_SCRIPT = """
+local mode = ARGV[1]
+if mode == "fill" then
+    local version = redis.call("GET", KEYS[2]) or ""
+    if version ~= ARGV[3] or redis.call("HEXISTS", KEYS[1], "_loaded") == 1 then
+        return 0
+    end
+else
+    redis.call("INCR", KEYS[2])
+    redis.call("EXPIRE", KEYS[2], ARGV[2])
+    if mode == "apply" and redis.call("HEXISTS", KEYS[1], "_loaded") == 0 then
+        return 0
+    end
+end
+if mode ~= "apply" then
+    redis.call("DEL", KEYS[1])
+end
+local removed = tonumber(ARGV[4])
+for i = 5, 4 + removed do
+    redis.call("HDEL", KEYS[1], ARGV[i])
+end
+redis.call("HSET", KEYS[1], "_loaded", "1")
+for i = 5 + removed, #ARGV, 2 do
+    redis.call("HSET", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+return 1
+"""
+_ITEM_FIELDS = ("store_id", "title", "price", "image", "quantity")
+_COLUMNS = (CartItem.id, CartItem.product_id, *(getattr(CartItem, field) for field in _ITEM_FIELDS))
 
 
-def _serialize(items: list[CartItem]) -> dict:
+def _row(row) -> dict:
+    return {"id": row.id, "product_id": row.product_id, **{field: getattr(row, field) for field in _ITEM_FIELDS}}
+
+
+def _serialize(items: list[dict]) -> dict:
     if not items:
         return {"store_id": None, "items": []}
+    items = sorted(items, key=lambda i: i["id"])
+    stores = {i["store_id"] for i in items}
     return {
-        "store_id": items[0].store_id,
+        "store_id": items[0]["store_id"] if len(stores) == 1 else None,
         "items": [
             {
-                "product_id": i.product_id,
-                "title": i.title,
-                "price": i.price,
-                "image": i.image,
-                "quantity": i.quantity,
+                "product_id": i["product_id"],
+                "store_id": i["store_id"],
+                "title": i["title"],
+                "price": i["price"],
+                "image": i["image"],
+                "quantity": i["quantity"],
             }
             for i in items
         ],
     }
 
 
-async def get_user_cart(db: AsyncSession, buyer_id: int) -> dict:
-    q = await db.execute(select(CartItem).where(CartItem.buyer_id == buyer_id).order_by(CartItem.id.asc()))
-    items = q.scalars().all()
-    return _serialize(items)
+async def _cache_read(buyer_id: int) -> list[dict] | None:
+    if not settings.CART_REDIS_ENABLED:
+        return None
+    try:
+        redis = await get_redis()
+        cached = await redis.hgetall(CART_KEY.format(buyer_id=buyer_id))
+    except Exception as exc:
+        logger.warning("Cart cache read failed for buyer %s: %s", buyer_id, str(exc))
+        return None
+    if _LOADED_FIELD not in cached:
+        return None
+    return [json.loads(value) for field, value in cached.items() if field != _LOADED_FIELD]
 
 
-async def replace_user_cart(db: AsyncSession, buyer_id: int, payload: CartSyncIn) -> dict:
-    if payload.items and payload.store_id is None:
-        raise HTTPException(status_code=400, detail="store_id is required when cart has items")
+async def _cache_version(buyer_id: int) -> str | None:
+    """The cart's write counter, read before loading it for a ``fill``; None to skip the fill."""
+    if not settings.CART_REDIS_ENABLED:
+        return None
+    try:
+        redis = await get_redis()
+        return await redis.get(CART_VERSION_KEY.format(buyer_id=buyer_id)) or ""
+    except Exception as exc:
+        logger.warning("Cart cache version read failed for buyer %s: %s", buyer_id, str(exc))
+        return None
 
-    await db.execute(delete(CartItem).where(CartItem.buyer_id == buyer_id))
 
-    rows = []
-    for item in payload.items:
-        rows.append(
-            CartItem(
-                buyer_id=buyer_id,
-                store_id=payload.store_id,
-                product_id=item.product_id,
-                title=item.title,
-                price=item.price,
-                image=item.image,
-                quantity=item.quantity,
-            )
+async def _cache_write(
+    buyer_id: int,
+    upserted: list[dict],
+    removed: list[int],
+    *,
+    mode: str = "apply",
+    version: str = "",
+) -> None:
+    """Apply a change to the cached cart; see ``_CACHE_APPLY_SCRIPT`` for the modes."""
+    if not settings.CART_REDIS_ENABLED:
+        return
+    try:
+        redis = await get_redis()
+        await redis.eval(
+            _CACHE_APPLY_SCRIPT,
+            2,
+            CART_KEY.format(buyer_id=buyer_id),
+            CART_VERSION_KEY.format(buyer_id=buyer_id),
+            mode,
+            settings.CART_REDIS_TTL_SECONDS,
+            version,
+            len(removed),
+            *[str(product_id) for product_id in removed],
+            *[value for item in upserted for value in (str(item["product_id"]), json.dumps(item))],
         )
+    except Exception as exc:
+        logger.warning("Cart cache write failed for buyer %s: %s", buyer_id, str(exc))
+        await _cache_drop(buyer_id)
 
-    if rows:
-        db.add_all(rows)
 
-    await db.commit()
-    return await get_user_cart(db, buyer_id)
+async def _cache_drop(buyer_id: int) -> None:
+    if not settings.CART_REDIS_ENABLED:
+        return
+    try:
+        redis = await get_redis()
+        pipe = redis.pipeline(transaction=True)
+        pipe.delete(CART_KEY.format(buyer_id=buyer_id))
+        # Also counts as a write, so a fill loaded before it is dropped.
+        pipe.incr(CART_VERSION_KEY.format(buyer_id=buyer_id))
+        pipe.expire(CART_VERSION_KEY.format(buyer_id=buyer_id), settings.CART_REDIS_TTL_SECONDS)
+        await pipe.execute()
+    except Exception as exc:
+        logger.warning("Cart cache drop failed for buyer %s: %s", buyer_id, str(exc))
 
 
-async def sync_guest_cart(db: AsyncSession, buyer_id: int, payload: CartSyncIn) -> dict:
-    current = await get_user_cart(db, buyer_id)
-    server_items = current["items"]
-    server_store = current["store_id"]
+async def _load_rows(db: AsyncSession, buyer_id: int) -> list[dict]:
+    q = await db.execute(select(*_COLUMNS).where(CartItem.buyer_id == buyer_id).order_by(CartItem.id.asc()))
+    return [_row(row) for row in q.all()]
 
-    if not payload.items:
-        return current
 
-    if payload.store_id is None:
+async def _upsert(db: AsyncSession, buyer_id: int, items: list[dict], *, increment: bool = False) -> list[dict]:
+    """Insert or update ``items`` in one statement; ``increment`` adds to existing quantities."""
+    if not items:
+        return []
+    stmt = insert(CartItem).values(
+        [
+            {"buyer_id": buyer_id, "product_id": item["product_id"], **{field: item[field] for field in _ITEM_FIELDS}}
+            for item in items
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_cart_buyer_product",
+        set_={
+            "store_id": stmt.excluded.store_id,
+            "title": stmt.excluded.title,
+            "price": stmt.excluded.price,
+            "image": stmt.excluded.image,
+            "quantity": CartItem.quantity + stmt.excluded.quantity if increment else stmt.excluded.quantity,
+            "updated_at": func.now(),
+        },
+    ).returning(*_COLUMNS)
+    result = await db.execute(stmt)
+    return [_row(row) for row in result.all()]
+
+
+async def _delete(db: AsyncSession, buyer_id: int, product_ids: list[int]) -> None:
+    if product_ids:
+        await db.execute(
+            delete(CartItem).where(CartItem.buyer_id == buyer_id, CartItem.product_id.in_(product_ids))
+        )
+
+
+def _require_stores(payload: CartSyncIn) -> None:
+    if any(item.store_id is None for item in payload.items) and payload.store_id is None:
         raise HTTPException(status_code=400, detail="store_id is required when cart has items")
 
-    if server_store and payload.store_id and server_store != payload.store_id:
-        # Keep server cart authoritative if stores conflict.
-        return current
 
-    merged_store = server_store or payload.store_id
-    merged_map = {item["product_id"]: {**item} for item in server_items}
+def _wanted(payload: CartSyncIn) -> dict[int, dict]:
+    return {
+        item.product_id: {
+            "product_id": item.product_id,
+            "store_id": item.store_id or payload.store_id,
+            "title": item.title,
+            "price": item.price,
+            "image": item.image,
+            "quantity": item.quantity,
+        }
+        for item in payload.items
+    }
+
+
+async def _apply(db: AsyncSession, buyer_id: int, current: list[dict], wanted: dict[int, dict]) -> dict:
+    """Turn the cart from ``current`` rows into ``wanted`` (product id -> item) writing only the difference."""
+    by_product = {item["product_id"]: item for item in current}
+    removed = [product_id for product_id in by_product if product_id not in wanted]
+    changed = [
+        item
+        for product_id, item in wanted.items()
+        if product_id not in by_product
+        or any(by_product[product_id][field] != item[field] for field in _ITEM_FIELDS)
+    ]
+    if not removed and not changed:
+        return _serialize(current)
+
+    await _delete(db, buyer_id, removed)
+    upserted = await _upsert(db, buyer_id, changed)
+    await db.commit()
+    await _cache_write(buyer_id, upserted, removed)
+
+    for product_id in removed:
+        del by_product[product_id]
+    by_product.update({item["product_id"]: item for item in upserted})
+    return _serialize(list(by_product.values()))
 
-    for item in payload.items:
-        if item.product_id in merged_map:
-            merged_map[item.product_id]["quantity"] += item.quantity
+
+async def get_user_cart(db: AsyncSession, buyer_id: int) -> dict:
+    cached = await _cache_read(buyer_id)
+    if cached is not None:
+        return _serialize(cached)
+    # Read before loading: a write committed after this bumps it and the fill is dropped.
+    version = await _cache_version(buyer_id)
+    rows = await _load_rows(db, buyer_id)
+    if version is not None:
+        await _cache_write(buyer_id, rows, [], mode="fill", version=version)
+    return _serialize(rows)
+
+
+async def replace_user_cart(db: AsyncSession, buyer_id: int, payload: CartSyncIn) -> dict:
+    _require_stores(payload)
+    return await _apply(db, buyer_id, await _load_rows(db, buyer_id), _wanted(payload))
+
+
+async def sync_guest_cart(db: AsyncSession, buyer_id: int, payload: CartSyncIn) -> dict:
+    current = await _load_rows(db, buyer_id)
+    if not payload.items:
+        return _serialize(current)
+
+    _require_stores(payload)
+
+    server_store = _serialize(current)["store_id"]
+    legacy = any(item.store_id is None for item in payload.items)
+    if legacy and server_store and payload.store_id and server_store != payload.store_id:
+        # A single-store client: keep the server cart authoritative if stores conflict.
+        return _serialize(current)
+
+    # Items that carry their own store are merged across stores; checkout splits them per store.
+    merged = {item["product_id"]: {k: v for k, v in item.items() if k != "id"} for item in current}
+    for product_id, item in _wanted(payload).items():
+        if product_id in merged:
+            merged[product_id]["quantity"] += item["quantity"]
         else:
-            merged_map[item.product_id] = {
-                "product_id": item.product_id,
-                "title": item.title,
-                "price": item.price,
-                "image": item.image,
-                "quantity": item.quantity,
-            }
+            merged[product_id] = item
 
-    merged_payload = CartSyncIn(
-        store_id=merged_store,
-        items=[
-            {
-                "product_id": item["product_id"],
-                "title": item["title"],
-                "price": item["price"],
-                "image": item["image"],
-                "quantity": item["quantity"],
-            }
-            for item in merged_map.values()
-        ],
+    return await _apply(db, buyer_id, current, merged)
+
+
+async def add_cart_item(db: AsyncSession, buyer_id: int, item: CartItemIn) -> dict:
+    """Add ``item`` to the cart, or add its quantity to the line already there."""
+    if item.store_id is None:
+        raise HTTPException(status_code=400, detail="store_id is required")
+    upserted = await _upsert(db, buyer_id, [item.model_dump()], increment=True)
+    await db.commit()
+    await _cache_write(buyer_id, upserted, [])
+    return await get_user_cart(db, buyer_id)
+
+
+async def set_cart_item_quantity(db: AsyncSession, buyer_id: int, product_id: int, quantity: int) -> dict:
+    result = await db.execute(
+        update(CartItem)
+        .where(CartItem.buyer_id == buyer_id, CartItem.product_id == product_id)
+        .values(quantity=quantity, updated_at=func.now())
+        .returning(*_COLUMNS)
     )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Item not in cart")
+    await db.commit()
+    await _cache_write(buyer_id, [_row(row)], [])
+    return await get_user_cart(db, buyer_id)
 
-    return await replace_user_cart(db, buyer_id, merged_payload)
+
+async def remove_cart_item(db: AsyncSession, buyer_id: int, product_id: int) -> dict:
+    await _delete(db, buyer_id, [product_id])
+    await db.commit()
+    await _cache_write(buyer_id, [], [product_id])
+    return await get_user_cart(db, buyer_id)
 
 
 async def clear_user_cart(db: AsyncSession, buyer_id: int) -> None:
     await db.execute(delete(CartItem).where(CartItem.buyer_id == buyer_id))
     await db.commit()
+    await _cache_write(buyer_id, [], [], mode="replace")
@@ -1,25 +1,22 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.postgres import run_with_session
 from app.models.category_model import Category
 from app.models.product_model import Product
+from app.utils.cache import cache_get_or_set, cache_invalidate_tags
+from app.utils.slug import CATEGORY_SLUG_LENGTH, slugify
+
+# Tag of the cached public category list; product writes that change a
+# category's product count invalidate it too.
+CATEGORIES_CACHE_TAG = "categories"
+CATEGORIES_CACHE_TTL_SECONDS = 300
 
 
 def _slugify(value: str | None) -> str:
-    if not value:
-        return ""
-    text = value.strip().lower()
-    out = []
-    prev_dash = False
-    for ch in text:
-        if ch.isalnum():
-            out.append(ch)
-            prev_dash = False
-        else:
-            if not prev_dash:
-                out.append("-")
-                prev_dash = True
-    slug = "".join(out).strip("-")
-    return slug[:100]
+    return slugify(value, CATEGORY_SLUG_LENGTH)
 
 
 def _name_from_slug(slug: str) -> str:
@@ -28,13 +25,22 @@ def _name_from_slug(slug: str) -> str:
     return " ".join(part.capitalize() for part in slug.split("-"))[:100]
 
 
-async def _sync_categories_from_products(db: AsyncSession) -> None:
-    product_rows = await db.execute(
-        select(Product.category).where(Product.is_active.is_(True), Product.category.is_not(None))
-    )
-    product_categories = [str(row[0]).strip() for row in product_rows.all() if row[0] and str(row[0]).strip()]
-    if not product_categories:
-        return
+async def sync_categories_from_products(db: AsyncSession, slugs: set[str] | None = None) -> int:
+    """Create categories for product category slugs that have none; returns how many were added.
+
+    Called with the slug of a product being written, and once at startup for
+    every active product (rows written before this ran or outside the ORM).
+    """
+    if slugs is None:
+        product_rows = await db.execute(
+            select(Product.category_slug)
+            .where(Product.is_active.is_(True), Product.category_slug.is_not(None))
+            .distinct()
+        )
+        slugs = set(product_rows.scalars().all())
+    slugs = {slug for slug in slugs if slug}
+    if not slugs:
+        return 0
 
     existing_rows = await db.execute(select(Category.slug, Category.name))
     existing_slugs = set()
@@ -44,9 +50,8 @@ async def _sync_categories_from_products(db: AsyncSession) -> None:
             existing_slugs.add(normalized)
 
     to_add = []
-    for raw_category in sorted(set(product_categories)):
-        slug = _slugify(raw_category)
-        if not slug or slug in existing_slugs:
+    for slug in sorted(slugs):
+        if slug in existing_slugs:
             continue
         to_add.append(
             Category(
@@ -58,9 +63,18 @@ async def _sync_categories_from_products(db: AsyncSession) -> None:
         )
         existing_slugs.add(slug)
 
-    if to_add:
-        db.add_all(to_add)
+    if not to_add:
+        return 0
+    db.add_all(to_add)
+    try:
         await db.commit()
+    except IntegrityError as exc:
+        # A concurrent write added it first, or the derived name is taken.
+        await db.rollback()
+        logger.warning("Category sync for %s skipped: %s", ",".join(sorted(slugs)), str(exc))
+        return 0
+    await cache_invalidate_tags(CATEGORIES_CACHE_TAG)
+    return len(to_add)
 
 
 async def create_category(db: AsyncSession, data: dict):
@@ -69,6 +83,7 @@ async def create_category(db: AsyncSession, data: dict):
     db.add(category)
     await db.commit()
     await db.refresh(category)
+    await cache_invalidate_tags(CATEGORIES_CACHE_TAG)
     return category
 
 
@@ -80,10 +95,23 @@ async def get_category(db: AsyncSession, category_id: int):
     return result.scalar_one_or_none()
 
 
-async def get_categories(db: AsyncSession, skip: int = 0, limit: int = 100):
-    """Get all active categories"""
-    await _sync_categories_from_products(db)
+def _category_out(category: Category, product_count: int) -> dict:
+    return {
+        "id": category.id,
+        "name": category.name,
+        "slug": category.slug,
+        "description": category.description,
+        "image_url": category.image_url,
+        "parent_id": category.parent_id,
+        "display_order": category.display_order,
+        "is_active": category.is_active,
+        "created_at": category.created_at.isoformat() if category.created_at else None,
+        "updated_at": category.updated_at.isoformat() if category.updated_at else None,
+        "product_count": product_count,
+    }
 
+
+async def _load_categories(db: AsyncSession) -> list[dict]:
     categories_result = await db.execute(
         select(Category)
         .where(Category.is_active.is_(True))
@@ -93,20 +121,35 @@ async def get_categories(db: AsyncSession, skip: int = 0, limit: int = 100):
     if not categories:
         return []
 
-    product_rows = await db.execute(
-        select(Product.category).where(Product.is_active.is_(True), Product.category.is_not(None))
+    count_rows = await db.execute(
+        select(Product.category_slug, func.count())
+        .where(Product.is_active.is_(True), Product.category_slug.is_not(None))
+        .group_by(Product.category_slug)
     )
-    product_slugs = {_slugify(str(row[0])) for row in product_rows.all() if row[0]}
+    counts = dict(count_rows.all())
 
-    filtered = [
-        category
-        for category in categories
-        if _slugify(category.slug) in product_slugs or _slugify(category.name) in product_slugs
-    ]
-    if not filtered:
-        filtered = categories
+    listed = []
+    for category in categories:
+        # Same matching as get_category_products.
+        target_slugs = {_slugify(category.slug), _slugify(category.name)} - {""}
+        listed.append(_category_out(category, sum(counts.get(slug, 0) for slug in target_slugs)))
 
-    return filtered[skip : skip + limit]
+    with_products = [category for category in listed if category["product_count"]]
+    return with_products or listed
+
+
+async def get_categories(db: AsyncSession, skip: int = 0, limit: int = 100):
+    """Get active categories that have products (all of them if none do), with product counts"""
+    categories = await cache_get_or_set(
+        "categories:active",
+        lambda: _load_categories(db),
+        ttl_seconds=CATEGORIES_CACHE_TTL_SECONDS,
+        tags=(CATEGORIES_CACHE_TAG,),
+        stale_seconds=settings.CACHE_STALE_SECONDS,
+        refresher=lambda: run_with_session(_load_categories),
+        lock_seconds=settings.CACHE_LOCK_SECONDS,
+    )
+    return categories[skip : skip + limit]
 
 
 async def get_all_categories(db: AsyncSession, skip: int = 0, limit: int = 100):
@@ -140,6 +183,7 @@ async def update_category(db: AsyncSession, category_id: int, data: dict):
     
     await db.commit()
     await db.refresh(category)
+    await cache_invalidate_tags(CATEGORIES_CACHE_TAG)
     return category
 
 
@@ -151,6 +195,7 @@ async def delete_category(db: AsyncSession, category_id: int):
     
     category.is_active = False
     await db.commit()
+    await cache_invalidate_tags(CATEGORIES_CACHE_TAG)
     return True
 
 
@@ -171,15 +216,17 @@ async def get_category_products(db: AsyncSession, category_id: int, skip: int =
 
     target_slugs = {_slugify(category.slug), _slugify(category.name)}
     target_slugs = {slug for slug in target_slugs if slug}
+    if not target_slugs:
+        return []
 
     result = await db.execute(
         select(Product)
         .where(
             Product.is_active.is_(True),
-            Product.category.is_not(None),
+            Product.category_slug.in_(target_slugs),
         )
-        .order_by(Product.created_at.desc())
+        .order_by(Product.created_at.desc(), Product.id.desc())
+        .offset(skip)
+        .limit(limit)
     )
-    products = result.scalars().all()
-    filtered = [product for product in products if _slugify(product.category) in target_slugs]
-    return filtered[skip : skip + limit]
+    return result.scalars().all()
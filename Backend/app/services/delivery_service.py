@@ -1,18 +1,29 @@
 from datetime import datetime, timezone
+from math import isnan
 
 import httpx
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
+from sqlalchemy.orm import defer
 from app.models.delivery_model import Delivery, DeliveryStatus
 from app.models.order_model import Order, OrderStatus
 from app.models.notification_model import NotificationType
 from app.models.seller_model import Seller
 from app.models.user_model import User, UserRole
+from app.core.config import settings
 from app.core.exceptions import NotFoundException, ConflictException, PermissionDeniedException
 from app.services.notification_service import create_notification
+from app.services.tracking_service import (
+    append_location,
+    append_location_batches,
+    get_latest_location,
+    get_latest_locations,
+    get_location_history,
+)
+from app.utils.cache import cache_get_or_set, cache_invalidate_tags
 from app.utils.email_handler import send_email_background
 from app.utils.email_templates import order_status_email
-from app.utils.distance import calculate_distance_km
+from app.utils.distance import calculate_distance_km, distances_between
 
 async def assign_delivery_partner(db: AsyncSession, order_id: int, partner_id: int, distance_km: int) -> Delivery:
     order = await db.get(Order, order_id)
@@ -67,6 +78,19 @@ def _estimate_distance_km(seller: Seller | None, address: dict | None) -> int:
         return 5
 
 
+def _estimate_distances_km(pairs: list[tuple[Seller | None, dict | None]]) -> list[int]:
+    """Batch form of ``_estimate_distance_km`` for many (seller, address) pairs."""
+    pickup_lats, pickup_lngs, drop_lats, drop_lngs = [], [], [], []
+    for seller, address in pairs:
+        drop_lat, drop_lng = _extract_drop_coordinates(address)
+        pickup_lats.append(_coerce_float(getattr(seller, "latitude", None)))
+        pickup_lngs.append(_coerce_float(getattr(seller, "longitude", None)))
+        drop_lats.append(drop_lat)
+        drop_lngs.append(drop_lng)
+    distances = distances_between(pickup_lats, pickup_lngs, drop_lats, drop_lngs)
+    return [5 if isnan(d) else max(1, int(round(d))) for d in distances]
+
+
 async def claim_delivery_for_partner(db: AsyncSession, order_id: int, partner_id: int) -> Delivery:
     order = await db.get(Order, order_id)
     if not order:
@@ -121,6 +145,7 @@ async def update_delivery_status(db: AsyncSession, delivery_id: int, partner_id:
     delivery.status = status
     await db.commit()
     await db.refresh(delivery)
+    await cache_invalidate_tags(f"delivery:{delivery.id}")
     if order:
         user = await db.get(User, order.buyer_id)
         if user:
@@ -153,29 +178,30 @@ async def get_partner_deliveries(
     return result.scalars().all()
 
 
-async def list_open_orders_for_delivery(db: AsyncSession, partner_id: int, limit: int = 50) -> list[dict]:
-    assigned_result = await db.execute(select(Delivery.order_id))
-    assigned_order_ids = {row[0] for row in assigned_result.all()}
-
-    orders_result = await db.execute(
-        select(Order)
+def open_orders_query():
+    """Packed/shipped orders without a partner or delivery row, as ``(Order, Seller)`` rows."""
+    return (
+        select(Order, Seller)
+        .outerjoin(Seller, Seller.id == Order.seller_id)
         .where(
             Order.status.in_([OrderStatus.packed, OrderStatus.shipped]),
             Order.delivery_partner_id.is_(None),
+            ~select(Delivery.id).where(Delivery.order_id == Order.id).exists(),
         )
-        .order_by(Order.created_at.desc())
-        .limit(limit)
     )
-    orders = [o for o in orders_result.scalars().all() if o.id not in assigned_order_ids]
+
+
+def open_order_payloads(rows) -> list[dict]:
+    """Feed payloads for ``(Order, Seller | None)`` rows of claimable orders."""
+    orders = [order for order, _ in rows]
+    sellers = [seller for _, seller in rows]
+    distances = _estimate_distances_km(
+        [(seller, order.address if isinstance(order.address, dict) else {}) for order, seller in zip(orders, sellers)]
+    )
 
     payload = []
-    for order in orders:
-        seller = await db.get(Seller, order.seller_id)
-        address = order.address or {}
-        drop_lat, drop_lng = _extract_drop_coordinates(address if isinstance(address, dict) else {})
-        pickup_lat = _coerce_float(getattr(seller, "latitude", None))
-        pickup_lng = _coerce_float(getattr(seller, "longitude", None))
-        distance_km = _estimate_distance_km(seller, address if isinstance(address, dict) else {})
+    for order, seller, distance_km in zip(orders, sellers, distances):
+        context = _build_route_context(order, seller)
         delivery_fee = distance_km * 10
         partner_earning = int(delivery_fee * 0.8)
         payload.append(
@@ -189,26 +215,30 @@ async def list_open_orders_for_delivery(db: AsyncSession, partner_id: int, limit
                 "partner_earning": partner_earning,
                 "created_at": order.created_at.isoformat() if order.created_at else None,
                 "claim_required": True,
-                "pickup": {
-                    "name": getattr(seller, "store_name", None) or "Pickup Store",
-                    "address": getattr(seller, "address", None),
-                    "lat": pickup_lat,
-                    "lng": pickup_lng,
-                },
-                "drop": {
-                    "name": address.get("name") if isinstance(address, dict) else "Customer",
-                    "address": address.get("house_no") if isinstance(address, dict) else None,
-                    "city": address.get("city") if isinstance(address, dict) else None,
-                    "state": address.get("state") if isinstance(address, dict) else None,
-                    "pincode": address.get("pincode") if isinstance(address, dict) else None,
-                    "lat": drop_lat,
-                    "lng": drop_lng,
-                },
+                "pickup": context["pickup"],
+                "drop": context["drop"],
             }
         )
     return payload
 
 
+async def list_open_orders_for_delivery(db: AsyncSession, partner_id: int, limit: int = 50) -> list[dict]:
+    recent_open = (
+        select(Order.id)
+        .where(
+            Order.status.in_([OrderStatus.packed, OrderStatus.shipped]),
+            Order.delivery_partner_id.is_(None),
+        )
+        .order_by(Order.created_at.desc())
+        .limit(limit)
+        .subquery()
+    )
+    result = await db.execute(
+        open_orders_query().join(recent_open, recent_open.c.id == Order.id).order_by(Order.created_at.desc())
+    )
+    return open_order_payloads(result.all())
+
+
 async def get_partner_earnings_summary(db: AsyncSession, partner_id: int) -> dict:
     deliveries_result = await db.execute(
         select(func.count(Delivery.id)).where(
@@ -235,6 +265,28 @@ def _coerce_float(value):
         return None
 
 
+def _build_route_context(order: Order, seller: Seller | None) -> dict:
+    address = order.address or {}
+    drop_lat, drop_lng = _extract_drop_coordinates(address if isinstance(address, dict) else {})
+    return {
+        "pickup": {
+            "name": getattr(seller, "store_name", None) or "Pickup Store",
+            "address": getattr(seller, "address", None),
+            "lat": _coerce_float(getattr(seller, "latitude", None)),
+            "lng": _coerce_float(getattr(seller, "longitude", None)),
+        },
+        "drop": {
+            "name": address.get("name") if isinstance(address, dict) else "Customer",
+            "address": address.get("house_no") if isinstance(address, dict) else None,
+            "city": address.get("city") if isinstance(address, dict) else None,
+            "state": address.get("state") if isinstance(address, dict) else None,
+            "pincode": address.get("pincode") if isinstance(address, dict) else None,
+            "lat": drop_lat,
+            "lng": drop_lng,
+        },
+    }
+
+
 async def get_delivery_route_context(db: AsyncSession, delivery_id: int, partner_id: int) -> dict:
     delivery = await db.get(Delivery, delivery_id)
     if not delivery:
@@ -248,37 +300,11 @@ async def get_delivery_route_context(db: AsyncSession, delivery_id: int, partner
 
     seller = await db.get(Seller, order.seller_id)
 
-    address = order.address or {}
-    coordinates = address.get("coordinates") if isinstance(address, dict) else None
-
-    pickup_lat = _coerce_float(getattr(seller, "latitude", None))
-    pickup_lng = _coerce_float(getattr(seller, "longitude", None))
-
-    drop_lat = None
-    drop_lng = None
-    if isinstance(coordinates, dict):
-        drop_lat = _coerce_float(coordinates.get("lat") or coordinates.get("latitude"))
-        drop_lng = _coerce_float(coordinates.get("lng") or coordinates.get("longitude"))
-
     return {
         "delivery_id": delivery.id,
         "order_id": delivery.order_id,
         "status": delivery.status.value,
-        "pickup": {
-            "name": getattr(seller, "store_name", None) or "Pickup Store",
-            "address": getattr(seller, "address", None),
-            "lat": pickup_lat,
-            "lng": pickup_lng,
-        },
-        "drop": {
-            "name": address.get("name") if isinstance(address, dict) else "Customer",
-            "address": address.get("house_no") if isinstance(address, dict) else None,
-            "city": address.get("city") if isinstance(address, dict) else None,
-            "state": address.get("state") if isinstance(address, dict) else None,
-            "pincode": address.get("pincode") if isinstance(address, dict) else None,
-            "lat": drop_lat,
-            "lng": drop_lng,
-        },
+        **_build_route_context(order, seller),
     }
 
 
@@ -314,6 +340,90 @@ async def generate_delivery_route(from_lat: float, from_lng: float, to_lat: floa
     }
 
 
+async def _get_delivery_owner(db: AsyncSession, delivery_id: int) -> dict:
+    async def load() -> dict:
+        delivery = await db.get(Delivery, delivery_id)
+        if not delivery:
+            raise NotFoundException("Delivery not found")
+        return {
+            "id": delivery.id,
+            "order_id": delivery.order_id,
+            "partner_id": delivery.partner_id,
+            "status": delivery.status.value,
+        }
+
+    return await cache_get_or_set(
+        f"delivery:owner:{delivery_id}",
+        load,
+        ttl_seconds=300,
+        tags=(f"delivery:{delivery_id}",),
+    )
+
+
+def _build_tracking_row(
+    lat: float,
+    lng: float,
+    heading: float | None,
+    speed: float | None,
+    status: str,
+    recorded_at: str | None = None,
+) -> dict:
+    return {
+        "lat": float(lat),
+        "lng": float(lng),
+        "heading": float(heading) if heading is not None else None,
+        "speed": float(speed) if speed is not None else None,
+        "status": status,
+        "updated_at": recorded_at or datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _tracking_time(row: dict | None) -> float | None:
+    try:
+        return datetime.fromisoformat(row["updated_at"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _coalesce_tracking_rows(rows: list[dict], previous: dict | None) -> list[dict]:
+    """Drop near-duplicate points from time-ordered ``rows``.
+
+    A point is kept when the status changes, or when it is at least
+    TRACKING_MIN_INTERVAL_SECONDS after the last kept point and has either
+    moved TRACKING_MIN_DISTANCE_METERS or is due as a heartbeat.
+    """
+    min_km = settings.TRACKING_MIN_DISTANCE_METERS / 1000
+    kept: list[dict] = []
+    last = previous
+    last_time = _tracking_time(previous)
+    for row in rows:
+        row_time = _tracking_time(row)
+        if last is not None and last_time is not None and row.get("status") == last.get("status"):
+            elapsed = row_time - last_time
+            if elapsed < settings.TRACKING_MIN_INTERVAL_SECONDS:
+                continue
+            if (
+                elapsed < settings.TRACKING_HEARTBEAT_SECONDS
+                and calculate_distance_km(last["lat"], last["lng"], row["lat"], row["lng"]) < min_km
+            ):
+                continue
+        kept.append(row)
+        last = row
+        last_time = row_time
+    return kept
+
+
+async def _apply_tracking_status(db: AsyncSession, changes: dict[int, str]) -> None:
+    if not changes:
+        return
+    for delivery_id, status in changes.items():
+        await db.execute(
+            update(Delivery).where(Delivery.id == delivery_id).values(status=DeliveryStatus(status))
+        )
+    await db.commit()
+    await cache_invalidate_tags(*(f"delivery:{delivery_id}" for delivery_id in changes))
+
+
 async def upsert_delivery_tracking(
     db: AsyncSession,
     delivery_id: int,
@@ -325,53 +435,131 @@ async def upsert_delivery_tracking(
     speed: float | None = None,
     status: str | None = None,
 ) -> dict:
-    delivery = await db.get(Delivery, delivery_id)
-    if not delivery:
-        raise NotFoundException("Delivery not found")
-    if delivery.partner_id != partner_id:
+    delivery = await _get_delivery_owner(db, delivery_id)
+    if delivery["partner_id"] != partner_id:
         raise PermissionDeniedException("Not your delivery")
-    if order_id is not None and delivery.order_id != order_id:
+    if order_id is not None and delivery["order_id"] != order_id:
         raise ConflictException("Delivery and order mismatch")
 
-    now_iso = datetime.now(timezone.utc).isoformat()
-    tracking_row = {
-        "lat": float(lat),
-        "lng": float(lng),
-        "heading": float(heading) if heading is not None else None,
-        "speed": float(speed) if speed is not None else None,
-        "status": status or delivery.status.value,
-        "updated_at": now_iso,
+    tracking_row = _build_tracking_row(lat, lng, heading, speed, status or delivery["status"])
+    await append_location(delivery_id, tracking_row, order_id=delivery["order_id"], partner_id=partner_id)
+
+    if status in {s.value for s in DeliveryStatus} and status != delivery["status"]:
+        await _apply_tracking_status(db, {delivery_id: status})
+
+    return {
+        "delivery_id": delivery["id"],
+        "order_id": delivery["order_id"],
+        **tracking_row,
     }
 
-    history = delivery.location_history if isinstance(delivery.location_history, list) else []
-    history.append(tracking_row)
-    if len(history) > 300:
-        history = history[-300:]
-    delivery.location_history = history
 
-    if status in {s.value for s in DeliveryStatus}:
-        delivery.status = DeliveryStatus(status)
+async def ingest_delivery_tracking_batch(db: AsyncSession, *, partner_id: int, points: list[dict]) -> dict:
+    """Store buffered GPS points (``parse_tracking_payload`` output) for one or more deliveries.
 
-    await db.commit()
-    await db.refresh(delivery)
+    Ownership is checked once per delivery, near-duplicate points are
+    coalesced, and all surviving points are written in one pipeline.
+    """
+    grouped: dict[int, list[dict]] = {}
+    for point in points:
+        grouped.setdefault(point["delivery_id"], []).append(point)
+
+    owners: dict[int, dict] = {}
+    for delivery_id, group in grouped.items():
+        delivery = await _get_delivery_owner(db, delivery_id)
+        if delivery["partner_id"] != partner_id:
+            raise PermissionDeniedException("Not your delivery")
+        if any(p["order_id"] is not None and p["order_id"] != delivery["order_id"] for p in group):
+            raise ConflictException("Delivery and order mismatch")
+        owners[delivery_id] = delivery
+
+    valid_statuses = {s.value for s in DeliveryStatus}
+    now_iso = datetime.now(timezone.utc).isoformat()
+    stored = await get_latest_locations(list(grouped))
+    batches: dict[int, list[dict]] = {}
+    keep_latest: set[int] = set()
+    status_changes: dict[int, str] = {}
+    summary = []
+    for delivery_id, group in grouped.items():
+        delivery = owners[delivery_id]
+        current_status = delivery["status"]
+        rows = []
+        for p in sorted(group, key=lambda p: datetime.fromisoformat(p["recorded_at"] or now_iso)):
+            row_status = p["status"] or current_status
+            if row_status in valid_statuses:
+                current_status = row_status
+            rows.append(
+                _build_tracking_row(
+                    p["lat"], p["lng"], p["heading"], p["speed"], row_status, p["recorded_at"] or now_iso
+                )
+            )
+
+        previous = stored.get(delivery_id)
+        previous_time = _tracking_time(previous)
+        if previous_time is not None and _tracking_time(rows[0]) <= previous_time:
+            # Late flush of points older than what is already stored: keep them
+            # as history without moving the latest position backwards.
+            if _tracking_time(rows[-1]) <= previous_time:
+                keep_latest.add(delivery_id)
+            previous = None
+        kept = _coalesce_tracking_rows(rows, previous)
+
+        batches[delivery_id] = kept
+        if current_status != delivery["status"]:
+            status_changes[delivery_id] = current_status
+        summary.append(
+            {
+                "delivery_id": delivery_id,
+                "order_id": delivery["order_id"],
+                "accepted": len(kept),
+                "dropped": len(rows) - len(kept),
+                "tracking": kept[-1] if kept and delivery_id not in keep_latest else None,
+            }
+        )
+
+    accepted = await append_location_batches(
+        batches,
+        keep_latest=keep_latest,
+        order_ids={delivery_id: owner["order_id"] for delivery_id, owner in owners.items()},
+        partner_id=partner_id,
+    )
+    await _apply_tracking_status(db, status_changes)
     return {
-        "delivery_id": delivery.id,
-        "order_id": delivery.order_id,
-        **tracking_row,
+        "accepted": accepted,
+        "dropped": len(points) - accepted,
+        "deliveries": summary,
     }
 
 
-async def get_order_tracking(db: AsyncSession, order_id: int) -> dict | None:
+async def get_order_tracking(
+    db: AsyncSession,
+    order_id: int,
+    *,
+    include_history: bool = True,
+    history_limit: int = 100,
+    before: str | None = None,
+) -> dict | None:
     result = await db.execute(select(Delivery).where(Delivery.order_id == order_id))
     delivery = result.scalars().first()
     if not delivery:
         return None
 
-    history = delivery.location_history if isinstance(delivery.location_history, list) else []
-    if not history:
-        return None
+    latest = await get_latest_location(delivery.id)
+    history: list[dict] = []
+    next_cursor = None
+    if include_history:
+        history, next_cursor = await get_location_history(delivery.id, limit=history_limit, before=before)
 
-    latest = dict(history[-1])
+    if latest is None:
+        # Deliveries tracked before the stream store still carry their points in JSONB.
+        legacy = delivery.location_history if isinstance(delivery.location_history, list) else []
+        if not legacy:
+            return None
+        latest = dict(legacy[-1])
+        if include_history and before is None:
+            history = legacy[-history_limit:]
+
+    latest = dict(latest)
     latest["delivery_id"] = delivery.id
     latest["order_id"] = delivery.order_id
     latest["status"] = latest.get("status") or delivery.status.value
@@ -379,6 +567,7 @@ async def get_order_tracking(db: AsyncSession, order_id: int) -> dict | None:
     return {
         "tracking": latest,
         "history": history,
+        "next_cursor": next_cursor,
     }
 
 
@@ -404,19 +593,28 @@ def attach_route_context(delivery_payload: dict, context: dict | None) -> dict:
     return payload
 
 
-async def get_available_deliveries_feed(db: AsyncSession, partner_id: int) -> list[dict]:
-    rows = await get_partner_deliveries(db=db, partner_id=partner_id)
-    rows = [row for row in rows if row.status != DeliveryStatus.delivered]
+async def _partner_delivery_feed(db: AsyncSession, partner_id: int, *, include_delivered: bool) -> list[dict]:
+    """Partner deliveries with pickup/drop context, loaded in one joined query."""
+    query = (
+        select(Delivery, Order, Seller)
+        .outerjoin(Order, Order.id == Delivery.order_id)
+        .outerjoin(Seller, Seller.id == Order.seller_id)
+        .options(defer(Delivery.location_history))
+        .where(Delivery.partner_id == partner_id)
+    )
+    if not include_delivered:
+        query = query.where(Delivery.status != DeliveryStatus.delivered)
+    result = await db.execute(query.order_by(Delivery.created_at.desc()))
 
     payload = []
-    for row in rows:
-        base = serialize_delivery(row)
-        try:
-            context = await get_delivery_route_context(db=db, delivery_id=row.id, partner_id=partner_id)
-        except Exception:
-            context = None
-        payload.append(attach_route_context(base, context))
+    for delivery, order, seller in result.all():
+        context = _build_route_context(order, seller) if order is not None else None
+        payload.append(attach_route_context(serialize_delivery(delivery), context))
+    return payload
+
 
+async def get_available_deliveries_feed(db: AsyncSession, partner_id: int) -> list[dict]:
+    payload = await _partner_delivery_feed(db, partner_id, include_delivered=False)
     open_orders = await list_open_orders_for_delivery(db=db, partner_id=partner_id)
     return payload + open_orders
 
@@ -427,19 +625,7 @@ async def get_assigned_deliveries_feed(
     partner_id: int,
     include_delivered: bool = False,
 ) -> list[dict]:
-    rows = await get_partner_deliveries(db=db, partner_id=partner_id)
-    if not include_delivered:
-        rows = [row for row in rows if row.status != DeliveryStatus.delivered]
-
-    payload = []
-    for row in rows:
-        base = serialize_delivery(row)
-        try:
-            context = await get_delivery_route_context(db=db, delivery_id=row.id, partner_id=partner_id)
-        except Exception:
-            context = None
-        payload.append(attach_route_context(base, context))
-    return payload
+    return await _partner_delivery_feed(db, partner_id, include_delivered=include_delivered)
 
 
 async def claim_delivery_with_context(db: AsyncSession, *, order_id: int, partner_id: int) -> dict:
@@ -467,14 +653,45 @@ def parse_tracking_payload(payload: dict) -> dict:
             "heading": float(payload["heading"]) if payload.get("heading") is not None else None,
             "speed": float(payload["speed"]) if payload.get("speed") is not None else None,
             "status": str(payload.get("status")) if payload.get("status") is not None else None,
+            "recorded_at": _parse_recorded_at(payload.get("recorded_at")),
         }
     except ValueError as exc:
         raise ConflictException("Invalid numeric payload values") from exc
 
 
-async def get_tracking_for_order_access_checked(
-    db: AsyncSession, *, order_id: int, current_user: User
-) -> dict:
+def _parse_recorded_at(value) -> str | None:
+    """Client timestamp (ISO 8601 or epoch seconds) as a UTC ISO string, clamped to now."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            recorded = datetime.fromtimestamp(value, tz=timezone.utc)
+        else:
+            recorded = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            if recorded.tzinfo is None:
+                recorded = recorded.replace(tzinfo=timezone.utc)
+    except (OverflowError, OSError, ValueError) as exc:
+        raise ConflictException("Invalid recorded_at timestamp") from exc
+    return min(recorded.astimezone(timezone.utc), datetime.now(timezone.utc)).isoformat()
+
+
+def parse_tracking_batch_payload(payload: dict) -> list[dict]:
+    """Parse ``{"points": [...]}``; top-level delivery_id/order_id apply to every point."""
+    points = payload.get("points")
+    if not isinstance(points, list) or not points:
+        raise ConflictException("points must be a non-empty list")
+    if len(points) > settings.TRACKING_BATCH_MAX_POINTS:
+        raise ConflictException(f"At most {settings.TRACKING_BATCH_MAX_POINTS} points per batch")
+    defaults = {key: payload[key] for key in ("delivery_id", "order_id") if payload.get(key) is not None}
+    parsed = []
+    for point in points:
+        if not isinstance(point, dict):
+            raise ConflictException("Each point must be an object")
+        parsed.append(parse_tracking_payload({**defaults, **point}))
+    return parsed
+
+
+async def _check_order_tracking_access(db: AsyncSession, *, order_id: int, current_user: User) -> None:
     order = await db.get(Order, order_id)
     if not order:
         raise NotFoundException("Order not found")
@@ -495,7 +712,31 @@ async def get_tracking_for_order_access_checked(
         if not seller_id or seller_id != order.seller_id:
             raise PermissionDeniedException("Not allowed to view this tracking")
 
-    tracking = await get_order_tracking(db=db, order_id=order_id)
+
+async def get_tracking_for_order_access_checked(
+    db: AsyncSession,
+    *,
+    order_id: int,
+    current_user: User,
+    include_history: bool = True,
+    history_limit: int = 100,
+    before: str | None = None,
+) -> dict:
+    await _check_order_tracking_access(db, order_id=order_id, current_user=current_user)
+    tracking = await get_order_tracking(
+        db=db,
+        order_id=order_id,
+        include_history=include_history,
+        history_limit=history_limit,
+        before=before,
+    )
     if not tracking:
         raise NotFoundException("Tracking not found")
     return tracking
+
+
+async def get_tracking_snapshot_access_checked(db: AsyncSession, *, order_id: int, current_user: User) -> dict | None:
+    """Access check plus latest position for opening a live stream; None if nothing tracked yet."""
+    await _check_order_tracking_access(db, order_id=order_id, current_user=current_user)
+    tracking = await get_order_tracking(db=db, order_id=order_id, include_history=False)
+    return tracking["tracking"] if tracking else None
@@ -0,0 +1,195 @@
+"""
+Dispatch: ranking open orders for a partner and matching partners to orders.
+
+Partner positions come from the tracking flow (see ``tracking_service``); open
+orders are located through their seller's pickup point using the sellers
+geohash index.
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.exceptions import AppException
+from app.models.delivery_model import Delivery, DeliveryStatus
+from app.models.order_model import Order, OrderStatus
+from app.services.delivery_service import (
+    assign_delivery_partner,
+    list_open_orders_for_delivery,
+    open_order_payloads,
+    open_orders_query,
+)
+from app.services.store_service import seller_distance_km_expr, seller_radius_prefilter
+from app.services.tracking_service import find_partners_near, get_partner_position, record_partner_position
+
+
+def score_open_order(pickup_km: float, partner_earning: int, age_minutes: float) -> float:
+    """Lower is better: pickup distance, offset by what the job pays and how long it has waited."""
+    return (
+        pickup_km
+        - partner_earning * settings.DISPATCH_EARNING_WEIGHT
+        - age_minutes * settings.DISPATCH_AGE_WEIGHT
+    )
+
+
+def match_greedy(
+    candidates: list[tuple[int, int, float]], capacity: dict[int, int]
+) -> dict[int, tuple[int, float]]:
+    """Assign orders to partners by globally shortest pickup distance.
+
+    ``candidates`` are ``(order_id, partner_id, pickup_km)``; ``capacity`` is how
+    many more orders each partner may take. Returns ``{order_id: (partner_id, km)}``.
+    """
+    remaining = dict(capacity)
+    matches: dict[int, tuple[int, float]] = {}
+    for order_id, partner_id, km in sorted(candidates, key=lambda row: row[2]):
+        if order_id in matches or remaining.get(partner_id, 0) <= 0:
+            continue
+        matches[order_id] = (partner_id, km)
+        remaining[partner_id] -= 1
+    return matches
+
+
+async def get_ranked_open_orders(
+    db: AsyncSession,
+    *,
+    partner_id: int,
+    lat: float | None = None,
+    lng: float | None = None,
+    skip: int = 0,
+    limit: int = 20,
+) -> dict:
+    """Open orders near the partner ordered by ``score_open_order``.
+
+    Uses the supplied position (and records it) or the last tracked one. The
+    nearest DISPATCH_FEED_CANDIDATES pickups within DISPATCH_FEED_RADIUS_KM are
+    scored; without any position the newest open orders are returned unranked.
+    """
+    if lat is not None and lng is not None:
+        await record_partner_position(partner_id, lat, lng)
+        position = (lat, lng)
+    else:
+        position = await get_partner_position(partner_id)
+
+    if position is None:
+        items = await list_open_orders_for_delivery(db=db, partner_id=partner_id, limit=skip + limit)
+        return {"ranked": False, "position": None, "skip": skip, "limit": limit, "items": items[skip:]}
+
+    lat, lng = position
+    radius_km = settings.DISPATCH_FEED_RADIUS_KM
+    pickup_km = seller_distance_km_expr(lat, lng)
+    result = await db.execute(
+        open_orders_query()
+        .add_columns(pickup_km.label("pickup_km"))
+        .where(*seller_radius_prefilter(lat, lng, radius_km))
+        .where(pickup_km <= radius_km)
+        .order_by(pickup_km, Order.id)
+        .limit(settings.DISPATCH_FEED_CANDIDATES)
+    )
+    rows = result.all()
+
+    now = datetime.now(timezone.utc)
+    items = open_order_payloads([(order, seller) for order, seller, _ in rows])
+    for item, (order, _, km) in zip(items, rows):
+        age_minutes = (now - order.created_at).total_seconds() / 60 if order.created_at else 0.0
+        item["pickup_distance_km"] = round(float(km), 3)
+        item["score"] = round(score_open_order(float(km), item["partner_earning"], age_minutes), 3)
+    items.sort(key=lambda item: (item["score"], item["order_id"]))
+
+    return {
+        "ranked": True,
+        "position": {"lat": lat, "lng": lng},
+        "skip": skip,
+        "limit": limit,
+        "items": items[skip : skip + limit],
+    }
+
+
+async def _active_delivery_counts(db: AsyncSession, partner_ids: list[int]) -> dict[int, int]:
+    if not partner_ids:
+        return {}
+    result = await db.execute(
+        select(Delivery.partner_id, func.count(Delivery.id))
+        .where(Delivery.partner_id.in_(partner_ids), Delivery.status != DeliveryStatus.delivered)
+        .group_by(Delivery.partner_id)
+    )
+    return {partner_id: count for partner_id, count in result.all()}
+
+
+async def match_partners_for_orders(db: AsyncSession, order_ids: list[int], *, assign: bool = False) -> dict:
+    """Best available partner for each open order, optionally assigning them.
+
+    Candidates are fresh partner positions within DISPATCH_MATCH_RADIUS_KM of
+    the pickup; partners already carrying DISPATCH_MAX_ACTIVE_DELIVERIES are
+    skipped and each partner gets at most their remaining capacity from this
+    batch. Assignment goes through ``assign_delivery_partner``, which only
+    takes packed orders, so with ``assign`` shipped orders are reported as
+    ``not_ready`` instead of being matched.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    result = await db.execute(open_orders_query().where(Order.id.in_(order_ids)))
+    rows = result.all()
+    not_ready = set()
+    if assign:
+        not_ready = {order.id for order, _ in rows if order.status != OrderStatus.packed}
+        rows = [row for row in rows if row[0].id not in not_ready]
+    payloads = {item["order_id"]: item for item in open_order_payloads(rows)}
+
+    unmatched = [
+        {"order_id": oid, "reason": "not_ready" if oid in not_ready else "not_open"}
+        for oid in order_ids
+        if oid not in payloads
+    ]
+    locatable = [
+        item for item in payloads.values() if item["pickup"]["lat"] is not None and item["pickup"]["lng"] is not None
+    ]
+    unmatched += [
+        {"order_id": oid, "reason": "no_pickup_location"}
+        for oid in payloads
+        if oid not in {item["order_id"] for item in locatable}
+    ]
+
+    nearby = await find_partners_near(
+        [(item["pickup"]["lat"], item["pickup"]["lng"]) for item in locatable],
+        radius_km=settings.DISPATCH_MATCH_RADIUS_KM,
+        count=settings.DISPATCH_MATCH_CANDIDATES,
+    )
+    candidates = [
+        (item["order_id"], partner_id, km)
+        for item, partners in zip(locatable, nearby)
+        for partner_id, km in partners
+    ]
+    partner_ids = list({partner_id for _, partner_id, _ in candidates})
+    active = await _active_delivery_counts(db, partner_ids)
+    capacity = {pid: settings.DISPATCH_MAX_ACTIVE_DELIVERIES - active.get(pid, 0) for pid in partner_ids}
+    matches = match_greedy(candidates, capacity)
+
+    results = []
+    for item in locatable:
+        order_id = item["order_id"]
+        if order_id not in matches:
+            unmatched.append({"order_id": order_id, "reason": "no_partner_available"})
+            continue
+        partner_id, km = matches[order_id]
+        entry = {
+            "order_id": order_id,
+            "partner_id": partner_id,
+            "pickup_distance_km": round(km, 3),
+            "distance_km": item["distance_km"],
+            "assigned": False,
+            "error": None,
+        }
+        if assign:
+            try:
+                await assign_delivery_partner(
+                    db, order_id=order_id, partner_id=partner_id, distance_km=item["distance_km"]
+                )
+                entry["assigned"] = True
+            except AppException as exc:
+                await db.rollback()
+                entry["error"] = exc.message
+        results.append(entry)
+
+    return {"matches": results, "unmatched": unmatched}
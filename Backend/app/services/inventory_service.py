@@ -0,0 +1,234 @@
+"""
+Stock reservation for checkout.
+
+Stock is taken with one conditional UPDATE for all line items of an order
+(``stock = stock - q WHERE stock >= q``), so concurrent checkouts can never
+oversell; the rows are locked in id order first so multi-item orders cannot
+deadlock each other. The row locks are held until commit, so callers reserve
+as the last statement before committing.
+
+Flash sales: while a product is marked hot, a Redis counter mirrors its stock
+and checkouts are admitted against it before the database is touched. Once it
+runs out, buyers are turned away without queueing on the product row. Postgres
+stays the source of truth: the counter is seeded from it, given back when the
+database decrement fails or stock is restored, and re-seeded by marking the
+product again.
+
+Prepaid orders that are not paid yet are tracked in a Redis sorted set scored
+by when their reservation expires (INVENTORY_RESERVATION_TTL_SECONDS);
+payment or cancellation releases them.
+"""
+
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.exceptions import ConflictException, NotFoundException
+from app.core.logging import logger
+from app.db.redis import get_redis
+from app.models.product_model import Product
+
+HOT_STOCK_KEY = "inventory:hot:{product_id}"
+RESERVATIONS_KEY = "inventory:reservations"
+
+# Take ARGV[i] from every existing counter KEYS[i], or nothing if any is short.
+# Returns 0, or the 1-based index of the first short counter. Missing keys are
+# products that are not hot.
+_HOT_RESERVE_SCRIPT = """
+for i = 1, #KEYS do
+    local available = redis.call("GET", KEYS[i])
+    if available and tonumber(available) < tonumber(ARGV[i]) then
+        return i
+    end
+end
+for i = 1, #KEYS do
+    if redis.call("EXISTS", KEYS[i]) == 1 then
+        redis.call("DECRBY", KEYS[i], ARGV[i])
+    end
+end
+return 0
+"""
+
+# Give ARGV[i] back to every counter KEYS[i] that still exists.
+_HOT_RELEASE_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call("EXISTS", KEYS[i]) == 1 then
+        redis.call("INCRBY", KEYS[i], ARGV[i])
+    end
+end
+return 0
+"""
+
+_RESERVE_SQL = text(
+    """
+    WITH wanted AS (
+        SELECT id, sum(quantity) AS quantity
+        FROM unnest(CAST(:ids AS integer[]), CAST(:quantities AS integer[])) AS w(id, quantity)
+        GROUP BY id
+    ),
+    locked AS (
+        SELECT p.id FROM products p JOIN wanted w ON w.id = p.id
+        ORDER BY p.id
+        FOR NO KEY UPDATE OF p
+    )
+    UPDATE products p
+    SET stock = p.stock - w.quantity, updated_at = now()
+    FROM wanted w
+    WHERE p.id = w.id AND p.id IN (SELECT id FROM locked) AND p.stock >= w.quantity
+    RETURNING p.id, p.stock
+    """
+)
+
+_RELEASE_SQL = text(
+    """
+    WITH wanted AS (
+        SELECT id, sum(quantity) AS quantity
+        FROM unnest(CAST(:ids AS integer[]), CAST(:quantities AS integer[])) AS w(id, quantity)
+        GROUP BY id
+    ),
+    locked AS (
+        SELECT p.id FROM products p JOIN wanted w ON w.id = p.id
+        ORDER BY p.id
+        FOR NO KEY UPDATE OF p
+    )
+    UPDATE products p
+    SET stock = coalesce(p.stock, 0) + w.quantity, updated_at = now()
+    FROM wanted w
+    WHERE p.id = w.id AND p.id IN (SELECT id FROM locked)
+    RETURNING p.id, p.stock
+    """
+)
+
+
+def _params(quantities: dict[int, int]) -> dict:
+    ids = sorted(quantities)
+    return {"ids": ids, "quantities": [int(quantities[pid]) for pid in ids]}
+
+
+async def _hot_reserve(quantities: dict[int, int]) -> int | None:
+    """Take ``quantities`` from the hot counters; returns the id of a hot product that is short.
+
+    Redis being down only skips the gate: the database decrement still decides.
+    """
+    if not settings.INVENTORY_HOT_SKU_ENABLED:
+        return None
+    ids = sorted(quantities)
+    try:
+        redis = await get_redis()
+        short = await redis.eval(
+            _HOT_RESERVE_SCRIPT,
+            len(ids),
+            *[HOT_STOCK_KEY.format(product_id=pid) for pid in ids],
+            *[quantities[pid] for pid in ids],
+        )
+    except Exception as exc:
+        logger.warning("Hot stock check skipped: %s", str(exc))
+        return None
+    return ids[short - 1] if short else None
+
+
+async def _hot_release(quantities: dict[int, int]) -> None:
+    if not settings.INVENTORY_HOT_SKU_ENABLED or not quantities:
+        return
+    ids = sorted(quantities)
+    try:
+        redis = await get_redis()
+        await redis.eval(
+            _HOT_RELEASE_SCRIPT,
+            len(ids),
+            *[HOT_STOCK_KEY.format(product_id=pid) for pid in ids],
+            *[quantities[pid] for pid in ids],
+        )
+    except Exception as exc:
+        logger.warning("Hot stock release failed for %s: %s", ",".join(map(str, ids)), str(exc))
+
+
+async def reserve_stock(db: AsyncSession, quantities: dict[int, int]) -> dict[int, int]:
+    """Take ``quantities`` (product id -> units) from stock in one statement; returns the stock left.
+
+    Raises ConflictException if any product is short, after rolling the
+    session back so none of the order is kept. Does not commit; if the
+    caller's commit fails it must call ``abort_reserved_stock``.
+    """
+    if not quantities:
+        return {}
+    short = await _hot_reserve(quantities)
+    if short is not None:
+        raise ConflictException(f"Insufficient stock for product {short}")
+
+    try:
+        result = await db.execute(_RESERVE_SQL, _params(quantities))
+    except BaseException:
+        await _hot_release(quantities)
+        raise
+    remaining = {row.id: row.stock for row in result.all()}
+    if len(remaining) < len(quantities):
+        await db.rollback()
+        await _hot_release(quantities)
+        short = sorted(set(quantities) - set(remaining))
+        raise ConflictException(f"Insufficient stock for product {short[0]}")
+    return remaining
+
+
+async def abort_reserved_stock(quantities: dict[int, int]) -> None:
+    """Give back the hot counters taken by ``reserve_stock`` when its transaction did not commit."""
+    await _hot_release(quantities)
+
+
+async def release_stock(db: AsyncSession, quantities: dict[int, int]) -> dict[int, int]:
+    """Put ``quantities`` back into stock; returns the new stock. Does not commit."""
+    quantities = {pid: qty for pid, qty in quantities.items() if qty}
+    if not quantities:
+        return {}
+    result = await db.execute(_RELEASE_SQL, _params(quantities))
+    restored = {row.id: row.stock for row in result.all()}
+    await _hot_release({pid: quantities[pid] for pid in restored})
+    return restored
+
+
+async def mark_hot_product(db: AsyncSession, product_id: int, seconds: int | None = None) -> dict:
+    """Gate checkouts of ``product_id`` on a Redis counter seeded from its current stock."""
+    product = await db.get(Product, product_id)
+    if not product:
+        raise NotFoundException("Product not found")
+    seconds = seconds or settings.INVENTORY_HOT_SKU_DEFAULT_SECONDS
+    redis = await get_redis()
+    await redis.set(HOT_STOCK_KEY.format(product_id=product_id), int(product.stock or 0), ex=seconds)
+    return {"product_id": product_id, "stock": int(product.stock or 0), "seconds": seconds}
+
+
+async def unmark_hot_product(product_id: int) -> None:
+    redis = await get_redis()
+    await redis.delete(HOT_STOCK_KEY.format(product_id=product_id))
+
+
+async def sync_hot_stock(product_id: int, stock: int) -> None:
+    """Re-seed the counter of a hot product whose stock was set directly."""
+    if not settings.INVENTORY_HOT_SKU_ENABLED:
+        return
+    try:
+        redis = await get_redis()
+        await redis.set(HOT_STOCK_KEY.format(product_id=product_id), int(stock), xx=True, keepttl=True)
+    except Exception as exc:
+        logger.warning("Hot stock sync failed for product %s: %s", product_id, str(exc))
+
+
+async def track_reservation(order_id: int) -> None:
+    """Start the payment window of an unpaid prepaid order."""
+    try:
+        redis = await get_redis()
+        expires_at = time.time() + settings.INVENTORY_RESERVATION_TTL_SECONDS
+        await redis.zadd(RESERVATIONS_KEY, {str(order_id): expires_at})
+    except Exception as exc:
+        logger.warning("Reservation tracking failed for order %s: %s", order_id, str(exc))
+
+
+async def release_reservation(order_id: int) -> None:
+    """The order was paid or cancelled; its stock no longer needs to expire."""
+    try:
+        redis = await get_redis()
+        await redis.zrem(RESERVATIONS_KEY, str(order_id))
+    except Exception as exc:
+        logger.warning("Reservation release failed for order %s: %s", order_id, str(exc))
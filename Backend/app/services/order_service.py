@@ -1,6 +1,6 @@
 import logging
 from decimal import Decimal
-from sqlalchemy import case, func, select
+from sqlalchemy import case, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.exceptions import ConflictException, NotFoundException, PermissionDeniedException
@@ -10,19 +10,42 @@ from app.models.order_model import Order, OrderStatus, PaymentMethod, ReturnStat
 from app.models.payment_model import Payment, PaymentStatus
 from app.models.product_model import Product
 from app.models.user_model import User
+from app.services.inventory_service import (
+    abort_reserved_stock,
+    release_reservation,
+    release_stock,
+    reserve_stock,
+    track_reservation,
+)
 from app.services.notification_service import create_notification
 from app.services.payment_service import initiate_refund
+from app.services.search_indexer import enqueue_product_index
 from app.utils.email_handler import send_email_background
-from app.utils.email_templates import order_created_email, order_status_email
-from app.utils.simple_cache import cache_get, cache_set
-from app.utils.simple_cache import cache_delete_prefix
+from app.utils.email_templates import order_created_email, order_status_email, orders_created_email
+from app.utils.cache import cache_get_or_set, cache_invalidate_tags
 
 logger = logging.getLogger(__name__)
 
 
-async def create_order(db: AsyncSession, buyer_id: int, payload) -> Order:
-    total = Decimal("0.00")
-    order_items: list[OrderItem] = []
+def _delivery_address(buyer: User | None, address_payload: dict) -> dict:
+    name_value = str(address_payload.get("name") or "").strip()
+    if not name_value or name_value.lower() in {"customer", "buyer", "user"}:
+        if buyer and buyer.name:
+            address_payload["name"] = buyer.name
+    phone_value = str(address_payload.get("phone") or "").strip()
+    if (not phone_value or phone_value == "9999999999") and buyer and buyer.phone:
+        address_payload["phone"] = buyer.phone
+    return address_payload
+
+
+async def create_orders(db: AsyncSession, buyer_id: int, payload, *, seller_id: int | None = None) -> list[Order]:
+    """Place ``payload.items`` as one order per seller, all in one transaction.
+
+    Orders and items are bulk-inserted and the stock of every line is reserved
+    in one statement, so a cart from several stores costs about as much as a
+    single order. With ``seller_id`` every item must belong to that seller.
+    """
+    quantities: dict[int, int] = {}
     product_ids = [item.product_id for item in payload.items]
     if not product_ids:
         raise ConflictException("Order must include at least one item")
@@ -30,57 +53,80 @@ async def create_order(db: AsyncSession, buyer_id: int, payload) -> Order:
     products_result = await db.execute(select(Product).where(Product.id.in_(product_ids)))
     products = {product.id: product for product in products_result.scalars().all()}
 
+    lines_by_seller: dict[int, list[tuple[Product, int]]] = {}
+    totals: dict[int, Decimal] = {}
     for item in payload.items:
         product = products.get(item.product_id)
 
         if not product or not product.is_active:
             raise ConflictException("Invalid product")
-        if product.seller_id != payload.seller_id:
+        if seller_id is not None and product.seller_id != seller_id:
             raise ConflictException("All items must belong to the selected seller")
+        # Early out only; reserve_stock below is what guarantees the stock.
         if product.stock < item.quantity:
             raise ConflictException(f"Insufficient stock for product {product.id}")
 
-        product.stock -= item.quantity
-        total += Decimal(product.price) * item.quantity
-        order_items.append(
-            OrderItem(
-                product_id=product.id,
-                quantity=item.quantity,
-                price=product.price,
-            )
-        )
+        quantities[product.id] = quantities.get(product.id, 0) + item.quantity
+        lines_by_seller.setdefault(product.seller_id, []).append((product, item.quantity))
+        line_total = Decimal(product.price) * item.quantity
+        totals[product.seller_id] = totals.get(product.seller_id, Decimal("0.00")) + line_total
 
     buyer = await db.get(User, buyer_id)
-    address_payload = payload.address.model_dump()
-    name_value = str(address_payload.get("name") or "").strip()
-    if not name_value or name_value.lower() in {"customer", "buyer", "user"}:
-        if buyer and buyer.name:
-            address_payload["name"] = buyer.name
-    phone_value = str(address_payload.get("phone") or "").strip()
-    if (not phone_value or phone_value == "9999999999") and buyer and buyer.phone:
-        address_payload["phone"] = buyer.phone
+    address_payload = _delivery_address(buyer, payload.address.model_dump())
 
-    order = Order(
-        buyer_id=buyer_id,
-        seller_id=payload.seller_id,
-        total_amount=int(total),
-        payment_method=payload.payment_method,
-        address=address_payload,
+    sellers = sorted(lines_by_seller)
+    orders_result = await db.execute(
+        insert(Order).returning(Order, sort_by_parameter_order=True),
+        [
+            {
+                "buyer_id": buyer_id,
+                "seller_id": order_seller_id,
+                "total_amount": int(totals[order_seller_id]),
+                "payment_method": payload.payment_method,
+                "address": address_payload,
+            }
+            for order_seller_id in sellers
+        ],
+    )
+    orders = list(orders_result.scalars().all())
+    await db.execute(
+        insert(OrderItem),
+        [
+            {
+                "order_id": order.id,
+                "product_id": product.id,
+                "quantity": quantity,
+                "price": product.price,
+            }
+            for order in orders
+            for product, quantity in lines_by_seller[order.seller_id]
+        ],
     )
 
-    db.add(order)
-    await db.flush()
+    # Last statement before the commit: the product rows stay locked until then.
+    remaining = await reserve_stock(db, quantities)
+    try:
+        await db.commit()
+    except BaseException:
+        await abort_reserved_stock(quantities)
+        raise
+    if payload.payment_method == PaymentMethod.prepaid:
+        for order in orders:
+            await track_reservation(order.id)
+    await cache_invalidate_tags(
+        f"orders:buyer:{buyer_id}",
+        *(f"product:{product_id}" for product_id in products),
+    )
+    # The search index only tracks in/out of stock.
+    sold_out = [product_id for product_id, stock in remaining.items() if stock <= 0]
+    if sold_out:
+        await enqueue_product_index(*sold_out)
+    return orders
 
-    for oi in order_items:
-        oi.order_id = order.id
-        db.add(oi)
 
-    await db.commit()
-    await db.refresh(order)
-    await cache_delete_prefix(f"orders:buyer:{buyer_id}:")
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
-    return order
+async def create_order(db: AsyncSession, buyer_id: int, payload) -> Order:
+    orders = await create_orders(db, buyer_id, payload, seller_id=payload.seller_id)
+    return orders[0]
 
 
 async def list_buyer_orders(db: AsyncSession, buyer_id: int, offset: int = 0, limit: int = 50) -> list[Order]:
@@ -103,35 +149,35 @@ def can_cancel_order(status: OrderStatus) -> bool:
     return status in {OrderStatus.placed, OrderStatus.packed}
 
 
-async def _restore_order_stock(db: AsyncSession, order_id: int) -> None:
-    items_result = await db.execute(select(OrderItem).where(OrderItem.order_id == order_id))
+async def _restore_order_stock(db: AsyncSession, *order_ids: int) -> list[int]:
+    items_result = await db.execute(select(OrderItem).where(OrderItem.order_id.in_(order_ids)))
     items = items_result.scalars().all()
     if not items:
-        return
-
-    product_ids = list({item.product_id for item in items})
-    products_result = await db.execute(select(Product).where(Product.id.in_(product_ids)))
-    products = {p.id: p for p in products_result.scalars().all()}
+        return []
 
+    quantities: dict[int, int] = {}
     for item in items:
-        product = products.get(item.product_id)
-        if product:
-            product.stock = int(product.stock or 0) + int(item.quantity or 0)
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + int(item.quantity or 0)
+    await release_stock(db, quantities)
+    return list(quantities)
 
 
 async def cancel_order(db: AsyncSession, order_id: int, user_id: int) -> tuple[Order, str]:
     order = await get_order_for_user(db, order_id, user_id)
+    # Lock the order before checking its status: the reservation expirer and
+    # payment confirmation lock it too, so only one of them changes it.
+    await db.refresh(order, with_for_update=True)
     if order.status == OrderStatus.cancelled:
         raise ConflictException("Order already cancelled")
     if not can_cancel_order(order.status):
         raise ConflictException("Only placed or packed orders can be cancelled")
 
-    await _restore_order_stock(db, order.id)
+    restored_product_ids = await _restore_order_stock(db, order.id)
 
     refund_status = "not_applicable"
     if order.payment_method == PaymentMethod.prepaid:
         refund_status = "not_required"
-        payment_result = await db.execute(select(Payment).where(Payment.order_id == order.id))
+        payment_result = await db.execute(select(Payment).where(Payment.order_id == order.id).with_for_update())
         payment = payment_result.scalars().first()
         if payment and payment.status == PaymentStatus.completed:
             try:
@@ -147,9 +193,13 @@ async def cancel_order(db: AsyncSession, order_id: int, user_id: int) -> tuple[O
     order.status = OrderStatus.cancelled
     await db.commit()
     await db.refresh(order)
-    await cache_delete_prefix(f"orders:buyer:{user_id}:")
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await release_reservation(order.id)
+    await cache_invalidate_tags(
+        f"orders:buyer:{user_id}",
+        *(f"product:{product_id}" for product_id in restored_product_ids),
+    )
+    if restored_product_ids:
+        await enqueue_product_index(*restored_product_ids)
     return order, refund_status
 
 
@@ -159,7 +209,9 @@ async def get_buyer_order_summary(db: AsyncSession, buyer_id: int) -> dict:
             func.count(Order.id).label("total_orders"),
             func.sum(case((Order.status.in_([OrderStatus.placed, OrderStatus.packed, OrderStatus.shipped]), 1), else_=0)).label("active_orders"),
             func.sum(case((Order.status == OrderStatus.delivered, 1), else_=0)).label("delivered_orders"),
-            func.sum(case((Order.status == OrderStatus.cancelled, 1), else_=0)).label("cancelled_orders"),
+            func.sum(
+                case((Order.status.in_([OrderStatus.cancelled, OrderStatus.expired]), 1), else_=0)
+            ).label("cancelled_orders"),
         ).where(Order.buyer_id == buyer_id)
     )
     row = summary_q.one()
@@ -201,7 +253,7 @@ async def request_return(db: AsyncSession, order_id: int, user_id: int, reason:
     order.return_image = image
     await db.commit()
     await db.refresh(order)
-    await cache_delete_prefix(f"orders:buyer:{user_id}:")
+    await cache_invalidate_tags(f"orders:buyer:{user_id}")
     return order
 
 
@@ -242,7 +294,6 @@ def serialize_order_payload(order: Order, items: list[OrderItem]) -> dict:
 
 async def place_order_and_notify(db: AsyncSession, user: User, payload) -> dict:
     order = await create_order(db=db, buyer_id=user.id, payload=payload)
-    await cache_delete_prefix(f"orders:buyer:{user.id}:")
     await create_notification(
         db=db,
         user_id=user.id,
@@ -262,6 +313,37 @@ async def place_order_and_notify(db: AsyncSession, user: User, payload) -> dict:
     }
 
 
+async def checkout_and_notify(db: AsyncSession, user: User, payload) -> dict:
+    """Check out a cart from any number of stores: one order per store, one notification and one email."""
+    orders = await create_orders(db=db, buyer_id=user.id, payload=payload)
+    total = sum(int(order.total_amount) for order in orders)
+    if len(orders) == 1:
+        title, link = f"Order #{orders[0].id} placed", f"/buyer/order/{orders[0].id}/tracking"
+        message = "Your order has been placed successfully."
+    else:
+        title, link = f"{len(orders)} orders placed", "/buyer/orders"
+        message = f"Your orders {', '.join(f'#{order.id}' for order in orders)} have been placed successfully."
+    await create_notification(
+        db=db,
+        user_id=user.id,
+        data={"title": title, "message": message, "type": NotificationType.order, "link": link},
+    )
+    subject, body = orders_created_email(user.name, [order.id for order in orders], total)
+    send_email_background(user.email, subject, body)
+    return {
+        "orders": [
+            {
+                "order_id": order.id,
+                "seller_id": order.seller_id,
+                "status": order.status.value,
+                "total_amount": float(order.total_amount),
+            }
+            for order in orders
+        ],
+        "total_amount": float(total),
+    }
+
+
 async def get_buyer_orders_payload(
     db: AsyncSession,
     *,
@@ -270,48 +352,40 @@ async def get_buyer_orders_payload(
     size: int,
     include_items: bool,
 ) -> list[dict]:
-    cache_key = f"orders:buyer:{user_id}:list:p{page}:s{size}:items{int(include_items)}"
-    cached = await cache_get(cache_key)
-    if cached is not None:
-        return cached
+    async def load() -> list[dict]:
+        offset = (page - 1) * size
+        orders = await list_buyer_orders(db, user_id, offset=offset, limit=size)
+        items_map = {}
+        if include_items:
+            items_map = await get_order_items_map(db, [order.id for order in orders])
+        return [serialize_order_payload(order, items_map.get(order.id, [])) for order in orders]
 
-    offset = (page - 1) * size
-    orders = await list_buyer_orders(db, user_id, offset=offset, limit=size)
-    items_map = {}
-    if include_items:
-        items_map = await get_order_items_map(db, [order.id for order in orders])
-    payload = [serialize_order_payload(order, items_map.get(order.id, [])) for order in orders]
-    await cache_set(cache_key, payload, ttl_seconds=20)
-    return payload
+    cache_key = f"orders:buyer:{user_id}:list:p{page}:s{size}:items{int(include_items)}"
+    return await cache_get_or_set(cache_key, load, ttl_seconds=20, tags=(f"orders:buyer:{user_id}",))
 
 
 async def get_buyer_order_summary_payload(db: AsyncSession, user_id: int) -> dict:
     cache_key = f"orders:buyer:{user_id}:summary"
-    cached = await cache_get(cache_key)
-    if cached is not None:
-        return cached
-
-    payload = await get_buyer_order_summary(db, user_id)
-    await cache_set(cache_key, payload, ttl_seconds=20)
-    return payload
+    return await cache_get_or_set(
+        cache_key,
+        lambda: get_buyer_order_summary(db, user_id),
+        ttl_seconds=20,
+        tags=(f"orders:buyer:{user_id}",),
+    )
 
 
 async def get_buyer_order_detail_payload(db: AsyncSession, *, order_id: int, user_id: int) -> dict:
-    cache_key = f"orders:buyer:{user_id}:detail:{order_id}"
-    cached = await cache_get(cache_key)
-    if cached is not None:
-        return cached
+    async def load() -> dict:
+        order = await get_order_for_user(db, order_id, user_id)
+        items_map = await get_order_items_map(db, [order.id])
+        return serialize_order_payload(order, items_map.get(order.id, []))
 
-    order = await get_order_for_user(db, order_id, user_id)
-    items_map = await get_order_items_map(db, [order.id])
-    payload = serialize_order_payload(order, items_map.get(order.id, []))
-    await cache_set(cache_key, payload, ttl_seconds=20)
-    return payload
+    cache_key = f"orders:buyer:{user_id}:detail:{order_id}"
+    return await cache_get_or_set(cache_key, load, ttl_seconds=20, tags=(f"orders:buyer:{user_id}",))
 
 
 async def cancel_order_and_notify(db: AsyncSession, *, order_id: int, user: User) -> dict:
     order, refund_status = await cancel_order(db, order_id, user.id)
-    await cache_delete_prefix(f"orders:buyer:{user.id}:")
     await create_notification(
         db=db,
         user_id=user.id,
@@ -336,7 +410,6 @@ async def request_return_and_notify(
     image: str | None,
 ) -> dict:
     order = await request_return(db, order_id, user.id, reason, image)
-    await cache_delete_prefix(f"orders:buyer:{user.id}:")
     await create_notification(
         db=db,
         user_id=user.id,
@@ -10,10 +10,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.exceptions import ConflictException, NotFoundException, PermissionDeniedException
+from app.core.logging import logger
 from app.models.notification_model import NotificationType
 from app.models.order_model import Order, OrderStatus, PaymentMethod
 from app.models.payment_model import Payment, PaymentStatus
 from app.models.user_model import User
+from app.services.inventory_service import release_reservation
 from app.services.notification_service import create_notification
 from app.utils.email_handler import send_email_background
 from app.utils.email_templates import order_status_email
@@ -51,6 +53,16 @@ async def _notify_payment_success(db: AsyncSession, order: Order):
     send_email_background(user.email, subject, body)
 
 
+async def _refund_late_payment(db: AsyncSession, payment: Payment) -> None:
+    """The order expired or was cancelled before this payment was captured: give the money back."""
+    payment.status = PaymentStatus.completed
+    await db.commit()
+    try:
+        await initiate_refund(db, payment.order_id)
+    except Exception as exc:
+        logger.warning("Refund of late payment %s failed: %s", payment.id, str(exc))
+
+
 async def initiate_payment(db: AsyncSession, order_id: int, user_id: int) -> dict:
     order = await db.get(Order, order_id)
     if not order:
@@ -61,6 +73,8 @@ async def initiate_payment(db: AsyncSession, order_id: int, user_id: int) -> dic
         raise ConflictException("Order is not prepaid")
     if order.status == OrderStatus.cancelled:
         raise ConflictException("Cancelled order cannot be paid")
+    if order.status == OrderStatus.expired:
+        raise ConflictException("Order expired before payment, please order again")
 
     payment_row = await db.execute(select(Payment).where(Payment.order_id == order.id))
     payment = payment_row.scalars().first()
@@ -132,7 +146,13 @@ async def confirm_payment(
         raise NotFoundException("Order not found")
     if order.buyer_id != user_id:
         raise PermissionDeniedException("You are not allowed to confirm this payment")
-    if payment.status == PaymentStatus.completed:
+
+    # Lock the order (then the payment, in the same order as the reservation expirer
+    # and cancellation) so neither can change under us, nor a concurrent confirm.
+    await db.refresh(order, with_for_update=True)
+    await db.refresh(payment, with_for_update=True)
+    # Captured already, or captured late and refunded: a retry must not capture or refund again.
+    if payment.status in (PaymentStatus.completed, PaymentStatus.refunded):
         return {"payment_id": payment.id, "status": payment.status.value, "order_status": order.status.value}
 
     if payment.razorpay_order_id:
@@ -144,11 +164,19 @@ async def confirm_payment(
             raise ConflictException("Invalid Razorpay payment signature")
         payment.razorpay_payment_id = razorpay_payment_id
 
+    if order.status == OrderStatus.expired:
+        await _refund_late_payment(db, payment)
+        raise ConflictException("Order expired before payment; the amount will be refunded")
+    if order.status == OrderStatus.cancelled:
+        await _refund_late_payment(db, payment)
+        raise ConflictException("Order was cancelled before payment; the amount will be refunded")
+
     payment.status = PaymentStatus.completed
     if order.status == OrderStatus.placed:
         order.status = OrderStatus.packed
 
     await db.commit()
+    await release_reservation(order.id)
     await _notify_payment_success(db, order)
     return {"payment_id": payment.id, "status": payment.status.value, "order_status": order.status.value}
 
@@ -187,13 +215,18 @@ async def verify_payment(db: AsyncSession, payload: dict, signature: str):
         raise NotFoundException("Payment not found")
 
     payment.razorpay_payment_id = webhook_payment_id or payment.razorpay_payment_id
-    payment.status = PaymentStatus.completed
 
-    order = await db.get(Order, payment.order_id)
+    order = await db.get(Order, payment.order_id, with_for_update=True)
+    if order and order.status in (OrderStatus.expired, OrderStatus.cancelled):
+        if payment.status not in (PaymentStatus.completed, PaymentStatus.refunded):
+            await _refund_late_payment(db, payment)
+        return
+    payment.status = PaymentStatus.completed
     if order and order.status == OrderStatus.placed:
         order.status = OrderStatus.packed
 
     await db.commit()
+    await release_reservation(payment.order_id)
     if order:
         await _notify_payment_success(db, order)
 
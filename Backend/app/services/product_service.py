@@ -1,14 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import or_, select
+from sqlalchemy import Float, case, cast, select, update
 from datetime import datetime, timezone
 from app.models.product_model import Product
 from app.models.seller_model import Seller
 from app.models.subscription_model import Subscription
 from app.core.config import settings
-from app.core.exceptions import (PermissionDeniedException, NotFoundException, ConflictException)
-from app.core.logging import logger
-from app.services.search_service import upsert_product_document
-from app.utils.simple_cache import cache_delete_prefix
+from app.core.exceptions import (PermissionDeniedException, NotFoundException)
+from app.services.category_service import CATEGORIES_CACHE_TAG, sync_categories_from_products
+from app.services.inventory_service import reserve_stock, sync_hot_stock
+from app.services.search_indexer import enqueue_product_index, enqueue_store_index
+from app.services.text_search import rank_products
+from app.utils.cache import cache_invalidate_tags
+from app.utils.slug import category_slug
 
 
 async def get_approved_seller(db: AsyncSession, user_id: int) -> Seller:
@@ -61,15 +64,16 @@ async def create_product(db: AsyncSession, user_id: int, data: dict) -> Product:
         seller_id = seller.id,
         **data,
     )
+    product.category_slug = category_slug(product.category)
     db.add(product)
     await db.commit()
     await db.refresh(product)
-    try:
-        await upsert_product_document(db, product.id)
-    except Exception as exc:
-        logger.warning("Product indexing failed for %s: %s", product.id, str(exc))
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await enqueue_product_index(product.id)
+    if product.is_active and product.category_slug:
+        await sync_categories_from_products(db, {product.category_slug})
+    # A new product is not part of any cached entry yet (besides category
+    # counts); search pages pick it up when they expire.
+    await cache_invalidate_tags(CATEGORIES_CACHE_TAG)
     return product
 
 
@@ -85,17 +89,21 @@ async def update_product(db: AsyncSession, product_id: int, user_id: int, data:
     if product.seller_id != seller.id:
         raise PermissionDeniedException("Not your product")
     
+    listed_before = (product.category_slug, product.is_active)
     for key, value in data.items():
         setattr(product, key, value)
+    product.category_slug = category_slug(product.category)
+    listed_after = (product.category_slug, product.is_active)
         
     await db.commit()
     await db.refresh(product)
-    try:
-        await upsert_product_document(db, product.id)
-    except Exception as exc:
-        logger.warning("Product indexing failed for %s: %s", product.id, str(exc))
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await enqueue_product_index(product.id)
+    tags = [f"product:{product.id}"]
+    if listed_after != listed_before:
+        if product.is_active and product.category_slug:
+            await sync_categories_from_products(db, {product.category_slug})
+        tags.append(CATEGORIES_CACHE_TAG)
+    await cache_invalidate_tags(*tags)
     return product
 
 
@@ -114,29 +122,20 @@ async def update_stock(db: AsyncSession, product_id: int, user_id: int, new_stoc
     product.stock = new_stock
     await db.commit()
     await db.refresh(product)
-    try:
-        await upsert_product_document(db, product.id)
-    except Exception as exc:
-        logger.warning("Product indexing failed for %s: %s", product.id, str(exc))
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await sync_hot_stock(product.id, product.stock)
+    await enqueue_product_index(product.id)
+    await cache_invalidate_tags(f"product:{product.id}")
     return product
 
 
 async def reduce_stock(db: AsyncSession, product_id: int, quantity: int):
-    result = await db.execute(select(Product).where(Product.id == product_id))
-    product = result.scalars().first()
-    
-    if not product:
+    result = await db.execute(select(Product.id).where(Product.id == product_id))
+    if result.scalar() is None:
         raise NotFoundException("Product not found")
     
-    if product.stock < quantity:
-        raise ConflictException("Insufficient stock")
-    
-    product.stock -= quantity
+    await reserve_stock(db, {product_id: quantity})
     await db.commit()
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await cache_invalidate_tags(f"product:{product_id}")
 
 
 async def delete_product(db: AsyncSession, product_id: int, user_id: int) -> bool:
@@ -149,29 +148,37 @@ async def delete_product(db: AsyncSession, product_id: int, user_id: int) -> boo
     if product.seller_id != seller.id:
         raise PermissionDeniedException("Not your product")
 
+    seller_id, review_count = product.seller_id, product.review_count
+    listed = product.is_active and product.category_slug is not None
+    if review_count:
+        # Its reviews go with it (ON DELETE CASCADE); take them out of the store's rating.
+        await db.execute(
+            update(Seller)
+            .where(Seller.id == seller_id)
+            .values(
+                total_reviews=Seller.total_reviews - review_count,
+                rating_total=Seller.rating_total - product.rating_total,
+                average_rating=case(
+                    (
+                        Seller.total_reviews > review_count,
+                        (Seller.rating_total - product.rating_total)
+                        / cast(Seller.total_reviews - review_count, Float),
+                    ),
+                    else_=0.0,
+                ),
+            )
+        )
     await db.delete(product)
     await db.commit()
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await enqueue_product_index(product_id)
+    if review_count:
+        await enqueue_store_index(seller_id)
+    tags = [f"product:{product_id}", f"seller:{seller_id}"]
+    if listed:
+        tags.append(CATEGORIES_CACHE_TAG)
+    await cache_invalidate_tags(*tags)
     return True
 
-def _slugify_category(value: str | None) -> str:
-    if not value:
-        return ""
-    text = str(value).strip().lower()
-    out = []
-    prev_dash = False
-    for ch in text:
-        if ch.isalnum():
-            out.append(ch)
-            prev_dash = False
-        else:
-            if not prev_dash:
-                out.append("-")
-                prev_dash = True
-    return "".join(out).strip("-")
-
-
 async def get_products(
     db: AsyncSession,
     skip: int = 0,
@@ -183,16 +190,15 @@ async def get_products(
     if only_active:
         query = query.where(Product.is_active.is_(True))
     if category:
-        query = query.where(Product.category.is_not(None))
-
-    result = await db.execute(query.order_by(Product.created_at.desc()))
-    products = result.scalars().all()
+        slug = category_slug(category)
+        if slug is None:
+            return []
+        query = query.where(Product.category_slug == slug)
 
-    if category:
-        target = _slugify_category(category)
-        products = [p for p in products if _slugify_category(p.category) == target]
-
-    return products[skip : skip + limit]
+    result = await db.execute(
+        query.order_by(Product.created_at.desc(), Product.id.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
     """Get featured products - returns products with stock > 0"""
 
@@ -213,13 +219,9 @@ async def get_my_products(db: AsyncSession, user_id: int) -> list[Product]:
     return rows.scalars().all()
 
 
-async def search_products_by_query(db: AsyncSession, q: str) -> list[Product]:
-    result = await db.execute(
-        select(Product).where(
-            or_(Product.title.ilike(f"%{q}%"), Product.description.ilike(f"%{q}%"))
-        )
-    )
-    return result.scalars().all()
+async def search_products_by_query(db: AsyncSession, q: str, limit: int = 20) -> list[Product]:
+    ranked, _ = await rank_products(db, q, limit=limit)
+    return [product for product, _ in ranked]
 
 
 async def get_product_or_404(db: AsyncSession, product_id: int) -> Product:
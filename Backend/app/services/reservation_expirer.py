@@ -0,0 +1,190 @@
+"""
+Expiry of the stock held by unpaid prepaid orders.
+
+``create_order`` records every prepaid order in the ``inventory:reservations``
+sorted set, scored by when its payment window closes; payment and
+cancellation remove it. A background task in every worker claims due order
+ids in batches (the claim removes them, so each id goes to one worker) and, in
+one transaction per batch, marks the orders that are still unpaid and their
+payments as expired and puts their stock back through ``_restore_order_stock``.
+Only the claimed orders are read; the orders table is queried as a whole once
+at startup, to re-add unpaid orders missing from the set.
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.postgres import run_with_session
+from app.db.redis import get_redis
+from app.models.order_model import Order, OrderStatus, PaymentMethod
+from app.models.payment_model import Payment, PaymentStatus
+from app.services.inventory_service import RESERVATIONS_KEY
+from app.services.order_service import _restore_order_stock
+from app.services.search_indexer import enqueue_product_index
+from app.utils.cache import cache_invalidate_tags
+
+# Remove and return up to ARGV[2] members due by ARGV[1].
+_CLAIM_SCRIPT = """
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+if #due > 0 then
+    redis.call("ZREM", KEYS[1], unpack(due))
+end
+return due
+"""
+
+_PAID = (PaymentStatus.completed, PaymentStatus.refunded)
+
+_worker_task: asyncio.Task | None = None
+_stats: Counter = Counter()
+
+
+async def expire_orders(db: AsyncSession, order_ids: list[int]) -> list[int]:
+    """Expire the unpaid prepaid orders among ``order_ids`` and restock them; returns the expired ids."""
+    result = await db.execute(
+        select(Order)
+        .where(
+            Order.id.in_(order_ids),
+            Order.payment_method == PaymentMethod.prepaid,
+            Order.status == OrderStatus.placed,
+        )
+        .order_by(Order.id)
+        # Payment confirmation locks the order too, so one of them waits for the other.
+        .with_for_update()
+    )
+    orders = result.scalars().all()
+    payments_result = await db.execute(
+        select(Payment).where(Payment.order_id.in_([order.id for order in orders])).with_for_update()
+    )
+    payments = {payment.order_id: payment for payment in payments_result.scalars().all()}
+
+    expired = [
+        order
+        for order in orders
+        if order.id not in payments or payments[order.id].status not in _PAID
+    ]
+    if not expired:
+        await db.rollback()
+        return []
+
+    restored_product_ids = await _restore_order_stock(db, *[order.id for order in expired])
+    for order in expired:
+        order.status = OrderStatus.expired
+        payment = payments.get(order.id)
+        if payment:
+            payment.status = PaymentStatus.expired
+    await db.commit()
+
+    await cache_invalidate_tags(
+        *{f"orders:buyer:{order.buyer_id}" for order in expired},
+        *(f"product:{product_id}" for product_id in restored_product_ids),
+    )
+    if restored_product_ids:
+        await enqueue_product_index(*restored_product_ids)
+    return [order.id for order in expired]
+
+
+async def expire_due_reservations(limit: int | None = None) -> int:
+    """Expire one batch of due reservations; returns how many were claimed."""
+    redis = await get_redis()
+    due = await redis.eval(
+        _CLAIM_SCRIPT, 1, RESERVATIONS_KEY, time.time(), limit or settings.INVENTORY_RESERVATION_BATCH_SIZE
+    )
+    if not due:
+        return 0
+
+    order_ids = [int(member) for member in due]
+    try:
+        expired = await run_with_session(expire_orders, order_ids)
+    except Exception as exc:
+        # Put the batch back to be retried on a later tick.
+        retry_at = time.time() + settings.INVENTORY_RESERVATION_POLL_SECONDS
+        await redis.zadd(RESERVATIONS_KEY, {member: retry_at for member in due}, nx=True)
+        _stats["failed"] += len(due)
+        logger.warning("Reservation expiry failed for %s orders: %s", len(due), str(exc))
+        return len(due)
+
+    _stats["claimed"] += len(due)
+    _stats["expired"] += len(expired)
+    if expired:
+        logger.info("Expired %s unpaid prepaid orders", len(expired))
+    return len(due)
+
+
+async def requeue_unpaid_orders(db: AsyncSession) -> int:
+    """Re-add unpaid prepaid orders missing from the reservation set; returns how many were found."""
+    result = await db.execute(
+        select(Order.id, Order.created_at)
+        .outerjoin(Payment, Payment.order_id == Order.id)
+        .where(
+            Order.payment_method == PaymentMethod.prepaid,
+            Order.status == OrderStatus.placed,
+            or_(Payment.id.is_(None), Payment.status.not_in(_PAID)),
+        )
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+    ttl = settings.INVENTORY_RESERVATION_TTL_SECONDS
+    redis = await get_redis()
+    for start in range(0, len(rows), 1000):
+        chunk = rows[start : start + 1000]
+        await redis.zadd(
+            RESERVATIONS_KEY,
+            {str(row.id): (row.created_at.timestamp() if row.created_at else time.time()) + ttl for row in chunk},
+            nx=True,
+        )
+    return len(rows)
+
+
+async def _run_expirer() -> None:
+    while True:
+        try:
+            claimed = await expire_due_reservations()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Reservation expirer error: %s", str(exc))
+            claimed = 0
+        if claimed < settings.INVENTORY_RESERVATION_BATCH_SIZE:
+            await asyncio.sleep(settings.INVENTORY_RESERVATION_POLL_SECONDS)
+
+
+async def reservation_stats() -> dict:
+    """Reservations held and due now, plus this worker's counters."""
+    redis = await get_redis()
+    pipe = redis.pipeline(transaction=False)
+    pipe.zcard(RESERVATIONS_KEY)
+    pipe.zcount(RESERVATIONS_KEY, "-inf", time.time())
+    held, due = await pipe.execute()
+    return {"held": held, "due": due, "worker": dict(_stats)}
+
+
+async def start_reservation_expirer() -> None:
+    global _worker_task
+    if _worker_task is not None:
+        return
+    try:
+        requeued = await run_with_session(requeue_unpaid_orders)
+        if requeued:
+            logger.info("Tracking %s unpaid prepaid orders for expiry", requeued)
+    except Exception as exc:
+        logger.warning("Unpaid order requeue skipped: %s", str(exc))
+    _worker_task = asyncio.create_task(_run_expirer())
+
+
+async def stop_reservation_expirer() -> None:
+    global _worker_task
+    if _worker_task is None:
+        return
+    _worker_task.cancel()
+    try:
+        await _worker_task
+    except asyncio.CancelledError:
+        pass
+    _worker_task = None
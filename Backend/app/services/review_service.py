@@ -1,10 +1,52 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import Float, case, cast, delete, select, func, update
 from app.models.review_model import Review
 from app.models.order_item_model import OrderItem
 from app.models.order_model import Order, OrderStatus
 from app.models.product_model import Product
+from app.models.seller_model import Seller
 from app.core.exceptions import (ConflictException, PermissionDeniedException)
+from app.services.search_indexer import enqueue_product_index, enqueue_store_index
+from app.utils.cache import cache_invalidate_tags
+
+
+def _rating_values(count_column, total_column, count_delta: int, rating_delta: int) -> dict:
+    """SET clauses moving a (count, total, average) triple by one review, in a single UPDATE."""
+    new_count = func.coalesce(count_column, 0) + count_delta
+    new_total = func.coalesce(total_column, 0) + rating_delta
+    return {
+        count_column.key: new_count,
+        total_column.key: new_total,
+        "average_rating": case((new_count > 0, new_total / cast(new_count, Float)), else_=0.0),
+    }
+
+
+async def _apply_review_delta(db: AsyncSession, product_id: int, count_delta: int, rating_delta: int) -> int | None:
+    """Adjust the product's and its seller's denormalized rating; returns the seller id."""
+    result = await db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(**_rating_values(Product.review_count, Product.rating_total, count_delta, rating_delta))
+        .returning(Product.seller_id)
+    )
+    seller_id = result.scalar()
+    if seller_id is not None:
+        await db.execute(
+            update(Seller)
+            .where(Seller.id == seller_id)
+            .values(**_rating_values(Seller.total_reviews, Seller.rating_total, count_delta, rating_delta))
+        )
+    return seller_id
+
+
+async def _after_review_change(product_id: int, seller_id: int | None) -> None:
+    await enqueue_product_index(product_id)
+    tags = [f"product:{product_id}"]
+    if seller_id is not None:
+        await enqueue_store_index(seller_id)
+        tags.append(f"seller:{seller_id}")
+    await cache_invalidate_tags(*tags)
+
 
 async def create_review(db: AsyncSession, buyer_id: int, product_id: int, rating: int, comment: str | None) -> Review:
     result = await db.execute(
@@ -37,16 +79,10 @@ async def create_review(db: AsyncSession, buyer_id: int, product_id: int, rating
     )
     db.add(review)
     await db.flush()
-    
-    avg_rating = await db.execute(
-        select(func.avg(Review.rating)).where(
-            Review.product_id == product_id
-        )
-    )
-    product = await db.get(Product, product_id)
-    product.average_rating = int(avg_rating.scalar() or 0)
+    seller_id = await _apply_review_delta(db, product_id, 1, rating)
     await db.commit()
     await db.refresh(review)
+    await _after_review_change(product_id, seller_id)
     return review
 
 
@@ -74,12 +110,19 @@ async def list_store_reviews(db: AsyncSession, store_id: int, skip: int = 0, lim
 
 
 async def delete_review_by_owner(db: AsyncSession, review_id: int, buyer_id: int) -> bool:
-    result = await db.execute(select(Review).where(Review.id == review_id, Review.buyer_id == buyer_id))
-    review = result.scalars().first()
-    if not review:
+    # Delete first: of two concurrent deletes only one gets the row back and moves the counts.
+    result = await db.execute(
+        delete(Review)
+        .where(Review.id == review_id, Review.buyer_id == buyer_id)
+        .returning(Review.product_id, Review.rating)
+    )
+    row = result.first()
+    if row is None:
         return False
-    await db.delete(review)
+    product_id = row.product_id
+    seller_id = await _apply_review_delta(db, product_id, -1, -row.rating)
     await db.commit()
+    await _after_review_change(product_id, seller_id)
     return True
 
 
@@ -0,0 +1,184 @@
+"""
+Write-behind search indexing.
+
+Writes enqueue ``product:<id>`` / ``store:<id>`` members in a Redis sorted set
+scored by when they became due; re-enqueueing a pending id is a no-op, so a
+burst of updates to one product costs one index operation. A background task
+in every worker claims due ids in batches (moving them to an in-flight set so
+a crashed worker's claims are retried), loads their current rows and syncs
+them through ``bulk_sync_documents``. Failures are retried with exponential
+backoff up to SEARCH_INDEX_MAX_ATTEMPTS.
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.postgres import run_with_session
+from app.db.redis import get_redis
+from app.services.search_service import bulk_sync_documents
+
+PENDING_KEY = "search:index:pending"
+INFLIGHT_KEY = "search:index:inflight"
+ATTEMPTS_KEY = "search:index:attempts"
+
+# Move up to ARGV[2] members due by ARGV[1] from pending to in-flight.
+_CLAIM_SCRIPT = """
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "WITHSCORES", "LIMIT", 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call("ZREM", KEYS[1], due[i])
+    redis.call("ZADD", KEYS[2], ARGV[1], due[i])
+end
+return due
+"""
+
+_worker_task: asyncio.Task | None = None
+_stats: Counter = Counter()
+
+
+async def _enqueue(members: list[str]) -> None:
+    if not members:
+        return
+    try:
+        redis = await get_redis()
+        deadline = time.monotonic() + settings.SEARCH_INDEX_BACKPRESSURE_SECONDS
+        while await redis.zcard(PENDING_KEY) >= settings.SEARCH_INDEX_QUEUE_HIGH_WATER:
+            # Let the indexers catch up before adding more; never drop the write.
+            if time.monotonic() >= deadline:
+                _stats["backpressure_timeouts"] += 1
+                break
+            _stats["backpressure_waits"] += 1
+            await asyncio.sleep(0.05)
+        await redis.zadd(PENDING_KEY, {member: time.time() for member in members}, nx=True)
+        _stats["enqueued"] += len(members)
+    except Exception as exc:
+        _stats["enqueue_errors"] += len(members)
+        logger.warning("Search index enqueue failed for %s: %s", ",".join(members), str(exc))
+
+
+async def enqueue_product_index(*product_ids: int) -> None:
+    await _enqueue([f"product:{pid}" for pid in product_ids])
+
+
+async def enqueue_store_index(*seller_ids: int) -> None:
+    await _enqueue([f"store:{sid}" for sid in seller_ids])
+
+
+async def _claim(redis, limit: int) -> list[tuple[str, float]]:
+    now = time.time()
+    # Claims left in flight by a crashed or stopped worker become due again.
+    stale = await redis.zrangebyscore(INFLIGHT_KEY, "-inf", now - settings.SEARCH_INDEX_CLAIM_TIMEOUT_SECONDS)
+    if stale:
+        pipe = redis.pipeline(transaction=True)
+        pipe.zrem(INFLIGHT_KEY, *stale)
+        pipe.zadd(PENDING_KEY, {member: now for member in stale}, nx=True)
+        await pipe.execute()
+    due = await redis.eval(_CLAIM_SCRIPT, 2, PENDING_KEY, INFLIGHT_KEY, now, limit)
+    return [(due[i], float(due[i + 1])) for i in range(0, len(due), 2)]
+
+
+async def _retry(redis, members: list[str]) -> None:
+    pipe = redis.pipeline(transaction=False)
+    for member in members:
+        pipe.hincrby(ATTEMPTS_KEY, member, 1)
+    attempts = await pipe.execute()
+
+    now = time.time()
+    pipe = redis.pipeline(transaction=False)
+    for member, attempt in zip(members, attempts):
+        pipe.zrem(INFLIGHT_KEY, member)
+        if attempt >= settings.SEARCH_INDEX_MAX_ATTEMPTS:
+            pipe.hdel(ATTEMPTS_KEY, member)
+            _stats["dropped"] += 1
+            logger.error("Search indexing gave up on %s after %s attempts", member, attempt)
+            continue
+        delay = settings.SEARCH_INDEX_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+        pipe.zadd(PENDING_KEY, {member: now + delay}, nx=True)
+        _stats["retried"] += 1
+    await pipe.execute()
+
+
+async def flush_search_index_queue(limit: int | None = None) -> int:
+    """Index one batch of due ids; returns how many were claimed."""
+    redis = await get_redis()
+    claimed = await _claim(redis, limit or settings.SEARCH_INDEX_BATCH_SIZE)
+    if not claimed:
+        return 0
+
+    product_ids = {int(member.split(":", 1)[1]) for member, _ in claimed if member.startswith("product:")}
+    store_ids = {int(member.split(":", 1)[1]) for member, _ in claimed if member.startswith("store:")}
+    try:
+        failed_products, failed_stores = await run_with_session(bulk_sync_documents, product_ids, store_ids)
+    except Exception as exc:
+        logger.warning("Search index flush failed: %s", str(exc))
+        failed_products, failed_stores = product_ids, store_ids
+
+    failed = [f"product:{pid}" for pid in failed_products] + [f"store:{sid}" for sid in failed_stores]
+    failed_set = set(failed)
+    done = [member for member, _ in claimed if member not in failed_set]
+    if done:
+        pipe = redis.pipeline(transaction=False)
+        pipe.zrem(INFLIGHT_KEY, *done)
+        pipe.hdel(ATTEMPTS_KEY, *done)
+        await pipe.execute()
+    if failed:
+        await _retry(redis, failed)
+
+    _stats["indexed"] += len(done)
+    _stats["failed"] += len(failed)
+    _stats["last_lag_ms"] = int(max(0.0, time.time() - min(score for _, score in claimed)) * 1000)
+    return len(claimed)
+
+
+async def _run_indexer() -> None:
+    while True:
+        try:
+            claimed = await flush_search_index_queue()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Search indexer error: %s", str(exc))
+            claimed = 0
+        # A full batch means more is probably waiting; otherwise let ids accumulate.
+        if claimed < settings.SEARCH_INDEX_BATCH_SIZE:
+            await asyncio.sleep(settings.SEARCH_INDEX_FLUSH_INTERVAL_SECONDS)
+
+
+async def search_index_stats() -> dict:
+    """Queue depth and lag (age of the oldest due id) plus this worker's counters."""
+    redis = await get_redis()
+    now = time.time()
+    pipe = redis.pipeline(transaction=False)
+    pipe.zcard(PENDING_KEY)
+    pipe.zcount(PENDING_KEY, "-inf", now)
+    pipe.zcard(INFLIGHT_KEY)
+    pipe.zrange(PENDING_KEY, 0, 0, withscores=True)
+    pending, due, inflight, oldest = await pipe.execute()
+    return {
+        "pending": pending,
+        "due": due,
+        "inflight": inflight,
+        "lag_seconds": round(max(0.0, now - oldest[0][1]), 3) if due and oldest else 0.0,
+        "worker": dict(_stats),
+    }
+
+
+async def start_search_indexer() -> None:
+    global _worker_task
+    if _worker_task is not None:
+        return
+    _worker_task = asyncio.create_task(_run_indexer())
+
+
+async def stop_search_indexer() -> None:
+    global _worker_task
+    if _worker_task is None:
+        return
+    _worker_task.cancel()
+    try:
+        await _worker_task
+    except asyncio.CancelledError:
+        pass
+    _worker_task = None
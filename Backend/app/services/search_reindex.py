@@ -0,0 +1,253 @@
+"""
+Full rebuild of the search indices behind their aliases.
+
+Rows are streamed from Postgres over a server-side cursor in id order, so a
+checkpoint is just the highest id whose chunk (and every chunk before it) has
+been loaded. Chunks are bulk-loaded into a fresh versioned index by parallel
+workers; once everything is in, the alias is swapped atomically and rows
+changed while the rebuild ran are pushed through the write-behind queue.
+Rows deleted during the rebuild were only deleted from the old index, so after
+the swap every document of the new index is checked against the table and the
+ones without a live row are queued too (the indexer deletes them).
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.postgres import AsyncSessionLocal
+from app.db.redis import get_redis
+from app.models.product_model import Product
+from app.models.seller_model import Seller
+from app.services.search_indexer import enqueue_product_index, enqueue_store_index
+from app.services.search_service import (
+    bulk_index,
+    create_versioned_index,
+    delete_index,
+    finish_bulk_load,
+    index_document_ids,
+    product_to_doc,
+    seller_to_doc,
+    swap_alias,
+)
+
+CHECKPOINT_KEY = "search:reindex:{target}"
+BULK_ATTEMPTS = 3
+
+
+@dataclass
+class ReindexTarget:
+    alias: str
+    model: Any
+    enqueue: Callable
+    # Rows with id greater than the argument, in id order; the first entity is the indexed one.
+    query: Callable[[int], Any]
+    to_doc: Callable[[Any], dict[str, Any]]
+    # Ids among the argument that should be in the index.
+    live: Callable[[list[int]], Any]
+
+
+def _targets() -> dict[str, ReindexTarget]:
+    return {
+        "products": ReindexTarget(
+            alias=settings.ELASTICSEARCH_PRODUCTS_INDEX,
+            model=Product,
+            enqueue=enqueue_product_index,
+            query=lambda after_id: select(Product, Seller)
+            .outerjoin(Seller, Seller.id == Product.seller_id)
+            .where(Product.id > after_id, Product.is_active == True)
+            .order_by(Product.id),
+            to_doc=lambda row: product_to_doc(row[0], row[1]),
+            live=lambda ids: select(Product.id).where(Product.id.in_(ids), Product.is_active == True),
+        ),
+        "stores": ReindexTarget(
+            alias=settings.ELASTICSEARCH_STORES_INDEX,
+            model=Seller,
+            enqueue=enqueue_store_index,
+            query=lambda after_id: select(Seller).where(Seller.id > after_id).order_by(Seller.id),
+            to_doc=lambda row: seller_to_doc(row[0]),
+            live=lambda ids: select(Seller.id).where(Seller.id.in_(ids)),
+        ),
+    }
+
+
+REINDEX_TARGETS = ("products", "stores")
+
+
+async def _load_checkpoint(target: str) -> dict | None:
+    redis = await get_redis()
+    raw = await redis.get(CHECKPOINT_KEY.format(target=target))
+    return json.loads(raw) if raw else None
+
+
+async def _save_checkpoint(target: str, checkpoint: dict) -> None:
+    redis = await get_redis()
+    await redis.set(CHECKPOINT_KEY.format(target=target), json.dumps(checkpoint))
+
+
+async def _clear_checkpoint(target: str) -> None:
+    redis = await get_redis()
+    await redis.delete(CHECKPOINT_KEY.format(target=target))
+
+
+async def _load_chunk(index: str, docs: list[tuple[int, dict[str, Any]]]) -> None:
+    pending = docs
+    for attempt in range(1, BULK_ATTEMPTS + 1):
+        failed = set(await bulk_index(index, pending))
+        if not failed:
+            return
+        pending = [(doc_id, doc) for doc_id, doc in pending if doc_id in failed]
+        await asyncio.sleep(attempt)
+    raise RuntimeError(f"{len(pending)} documents failed to index into {index} (first id {pending[0][0]})")
+
+
+async def _catch_up(db: AsyncSession, spec: ReindexTarget, since: datetime) -> int:
+    """Queue rows written during the rebuild; they may have missed the new index."""
+    result = await db.execute(select(spec.model.id).where(spec.model.updated_at >= since))
+    ids = list(result.scalars().all())
+    for start in range(0, len(ids), 1000):
+        await spec.enqueue(*ids[start : start + 1000])
+    return len(ids)
+
+
+async def _prune(db: AsyncSession, spec: ReindexTarget, index: str) -> int:
+    """Queue documents of ``index`` whose row is gone or inactive; the indexer deletes them."""
+    stale = 0
+    async for ids in index_document_ids(index):
+        result = await db.execute(spec.live(ids))
+        gone = sorted(set(ids) - set(result.scalars().all()))
+        if gone:
+            await spec.enqueue(*gone)
+            stale += len(gone)
+    return stale
+
+
+async def reindex(
+    target: str,
+    *,
+    chunk_size: int = 1000,
+    workers: int = 4,
+    resume: bool = False,
+    delete_old: bool = False,
+    report: Callable[[str], None] = print,
+) -> dict:
+    """Rebuild ``target`` ("products" or "stores") into a new index and swap its alias."""
+    spec = _targets()[target]
+    checkpoint = await _load_checkpoint(target) if resume else None
+    if checkpoint:
+        report(f"[{target}] resuming {checkpoint['index']} after id {checkpoint['last_id']}")
+    else:
+        index = await create_versioned_index(spec.alias, bulk_load=True)
+        checkpoint = {
+            "index": index,
+            "last_id": 0,
+            "loaded": 0,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        }
+        await _save_checkpoint(target, checkpoint)
+        report(f"[{target}] loading into {index}")
+    index = checkpoint["index"]
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    # seq -> (last_id, count) for finished chunks not yet covered by the checkpoint.
+    finished: dict[int, tuple[int, int]] = {}
+    next_seq = 0
+    started = time.monotonic()
+    loaded_this_run = 0
+    errors: list[BaseException] = []
+
+    async def advance_checkpoint() -> None:
+        nonlocal next_seq
+        moved = False
+        while next_seq in finished:
+            last_id, count = finished.pop(next_seq)
+            checkpoint["last_id"] = last_id
+            checkpoint["loaded"] += count
+            next_seq += 1
+            moved = True
+        if moved:
+            await _save_checkpoint(target, checkpoint)
+
+    async def worker() -> None:
+        nonlocal loaded_this_run
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if errors:
+                # Keep draining so the reader never blocks on a full queue.
+                continue
+            seq, docs = item
+            try:
+                await _load_chunk(index, docs)
+            except Exception as exc:
+                errors.append(exc)
+                continue
+            finished[seq] = (docs[-1][0], len(docs))
+            loaded_this_run += len(docs)
+            await advance_checkpoint()
+            elapsed = time.monotonic() - started
+            report(
+                f"[{target}] {checkpoint['loaded']} docs, checkpoint id {checkpoint['last_id']}, "
+                f"{loaded_this_run / elapsed if elapsed else 0:.0f} docs/s"
+            )
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        async with AsyncSessionLocal() as db:
+            stream = await db.stream(
+                spec.query(checkpoint["last_id"]).execution_options(yield_per=chunk_size)
+            )
+            seq = 0
+            async for rows in stream.partitions(chunk_size):
+                docs = [(row[0].id, spec.to_doc(row)) for row in rows]
+                await queue.put((seq, docs))
+                seq += 1
+                if errors:
+                    break
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+        if errors:
+            raise errors[0]
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        logger.error("Reindex of %s stopped; resume from id %s with --resume", target, checkpoint["last_id"])
+        raise
+
+    await finish_bulk_load(index)
+    previous = await swap_alias(spec.alias, index)
+    report(f"[{target}] alias {spec.alias} -> {index} (was {', '.join(previous) or 'none'})")
+
+    async with AsyncSessionLocal() as db:
+        requeued = await _catch_up(db, spec, datetime.fromisoformat(checkpoint["started_at"]))
+        # After the swap, so deletes from here on reach the new index through the alias.
+        pruned = await _prune(db, spec, index)
+    if requeued:
+        report(f"[{target}] queued {requeued} rows changed during the rebuild")
+    if pruned:
+        report(f"[{target}] queued {pruned} documents deleted during the rebuild")
+    await _clear_checkpoint(target)
+
+    if delete_old:
+        for name in previous:
+            await delete_index(name)
+            report(f"[{target}] deleted {name}")
+
+    elapsed = time.monotonic() - started
+    return {
+        "target": target,
+        "index": index,
+        "documents": checkpoint["loaded"],
+        "seconds": round(elapsed, 1),
+        "previous": previous,
+    }
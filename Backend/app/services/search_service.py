@@ -1,18 +1,41 @@
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import astuple, dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
 
 import httpx
-from sqlalchemy import or_, select
+from fastapi import HTTPException
+from sqlalchemy import and_, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.exceptions import ValidationException
 from app.core.logging import logger
+from app.db.postgres import run_with_session
 from app.models.product_model import Product
 from app.models.seller_model import Seller
-from app.utils.simple_cache import cache_get, cache_set
+from app.services.store_service import seller_distance_km_expr, seller_radius_prefilter
+from app.services.text_search import prefix_products, prefix_stores, product_match, rank_products, rank_stores
+from app.utils.cache import cache_get_or_set
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.slug import category_slug, slugify
 
 _es_client: httpx.AsyncClient | None = None
+_breaker = CircuitBreaker(
+    "elasticsearch",
+    failure_threshold=settings.ELASTICSEARCH_BREAKER_FAILURES,
+    slow_call_seconds=settings.ELASTICSEARCH_BREAKER_SLOW_SECONDS,
+    reset_seconds=settings.ELASTICSEARCH_BREAKER_RESET_SECONDS,
+)
+_search_stats: Counter = Counter()
+# Hedged Elasticsearch calls left running after SQL answered; they still feed the breaker.
+_background: set[asyncio.Task] = set()
 
 
 def _base_url() -> str:
@@ -34,64 +57,214 @@ async def close_search_client() -> None:
         _es_client = None
 
 
-async def _es_request(method: str, path: str, **kwargs) -> httpx.Response | None:
+async def _es_request(
+    method: str, path: str, *, track_latency: bool = False, **kwargs
+) -> httpx.Response | None:
+    """Call Elasticsearch through the breaker; None when it is open or the call fails.
+
+    ``track_latency`` feeds the call into the breaker's latency window and
+    slow-call check; only searches do, bulk writes are expected to be slow.
+    """
+    if not _breaker.allow():
+        return None
     url = f"{_base_url()}{path}"
+    started = time.monotonic()
     try:
         client = _get_es_client()
-        return await client.request(method, url, **kwargs)
+        response = await client.request(method, url, **kwargs)
     except Exception as exc:
+        _breaker.record_failure()
         logger.warning("Elasticsearch request failed (%s %s): %s", method, path, str(exc))
         return None
+    if response.status_code >= 500 or response.status_code == 429:
+        _breaker.record_failure()
+    else:
+        _breaker.record_success(time.monotonic() - started if track_latency else None)
+    return response
 
 
-async def ensure_search_indices() -> None:
-    product_mapping = {
-        "mappings": {
-            "properties": {
-                "id": {"type": "integer"},
-                "seller_id": {"type": "integer"},
-                "title": {"type": "text"},
-                "description": {"type": "text"},
-                "category": {"type": "text"},
-                "price": {"type": "integer"},
-                "image_url": {"type": "keyword"},
-                "store_name": {"type": "text"},
-                "is_active": {"type": "boolean"},
-            }
-        }
+def search_backend_stats() -> dict[str, Any]:
+    """Breaker state, search latency and how often this worker answered from SQL."""
+    searches = _search_stats["searches"]
+    return {
+        "breaker": _breaker.stats(),
+        "searches": dict(_search_stats),
+        "fallback_rate": round(_search_stats["db_fallbacks"] / searches, 4) if searches else 0.0,
     }
-    store_mapping = {
-        "mappings": {
-            "properties": {
-                "id": {"type": "integer"},
-                "store_name": {"type": "text"},
-                "description": {"type": "text"},
-                "logo_url": {"type": "keyword"},
-                "banner_url": {"type": "keyword"},
-                "city": {"type": "text"},
-                "address": {"type": "text"},
-                "approved": {"type": "boolean"},
-                "rating": {"type": "float"},
-                "total_reviews": {"type": "integer"},
-            }
-        }
+
+
+PRODUCT_MAPPING = {
+    "properties": {
+        "id": {"type": "integer"},
+        "seller_id": {"type": "integer"},
+        "title": {"type": "text"},
+        "description": {"type": "text"},
+        "category": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+        "category_slug": {"type": "keyword"},
+        "price": {"type": "integer"},
+        "in_stock": {"type": "boolean"},
+        "image_url": {"type": "keyword", "index": False},
+        "store_name": {"type": "text"},
+        # The seller's pickup point, for distance filters and facets.
+        "location": {"type": "geo_point"},
+        "is_active": {"type": "boolean"},
+        "rating": {"type": "float"},
+        "review_count": {"type": "integer"},
+        "suggest": {"type": "completion"},
+    }
+}
+STORE_MAPPING = {
+    "properties": {
+        "id": {"type": "integer"},
+        "store_name": {"type": "text"},
+        "description": {"type": "text"},
+        "logo_url": {"type": "keyword", "index": False},
+        "banner_url": {"type": "keyword", "index": False},
+        "city": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+        "address": {"type": "text"},
+        "approved": {"type": "boolean"},
+        "rating": {"type": "float"},
+        "total_reviews": {"type": "integer"},
+        # Unapproved stores are indexed too; typeahead filters on this context.
+        "suggest": {"type": "completion", "contexts": [{"name": "approved", "type": "category"}]},
     }
+}
+
+
+def search_mappings() -> dict[str, dict[str, Any]]:
+    """Alias name -> mapping. Searches and writes always go through the alias."""
+    return {
+        settings.ELASTICSEARCH_PRODUCTS_INDEX: PRODUCT_MAPPING,
+        settings.ELASTICSEARCH_STORES_INDEX: STORE_MAPPING,
+    }
+
+
+def versioned_index_name(alias: str) -> str:
+    return f"{alias}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}"
+
+
+async def create_versioned_index(alias: str, *, bulk_load: bool = False, with_alias: bool = False) -> str:
+    """Create a new concrete index for ``alias`` and return its name.
+
+    ``bulk_load`` disables refresh and replicas until ``finish_bulk_load``.
+    """
+    name = versioned_index_name(alias)
+    body: dict[str, Any] = {"mappings": search_mappings()[alias]}
+    if bulk_load:
+        body["settings"] = {"index": {"refresh_interval": "-1", "number_of_replicas": 0}}
+    if with_alias:
+        body["aliases"] = {alias: {}}
+    response = await _es_request("PUT", f"/{name}", json=body)
+    if response is None or response.status_code not in (200, 201):
+        detail = response.text if response is not None else "no response"
+        raise RuntimeError(f"Failed to create Elasticsearch index '{name}': {detail}")
+    return name
+
+
+async def finish_bulk_load(index: str, replicas: int | None = None) -> None:
+    """Restore refresh and replicas (cluster default when ``replicas`` is None) and refresh."""
+    await _es_request(
+        "PUT",
+        f"/{index}/_settings",
+        json={"index": {"refresh_interval": None, "number_of_replicas": replicas}},
+    )
+    await _es_request("POST", f"/{index}/_refresh")
+
+
+async def swap_alias(alias: str, index: str) -> list[str]:
+    """Atomically point ``alias`` at ``index``; returns the indices it was moved off.
+
+    A concrete index still named like the alias (pre-alias deployments) is
+    deleted in the same request, since an alias cannot share its name.
+    """
+    actions: list[dict[str, Any]] = []
+    previous: list[str] = []
+    current = await _es_request("GET", f"/_alias/{alias}")
+    if current is not None and current.status_code == 200:
+        previous = [name for name in current.json() if name != index]
+        actions.extend({"remove": {"index": name, "alias": alias}} for name in previous)
+    else:
+        legacy = await _es_request("HEAD", f"/{alias}")
+        if legacy is not None and legacy.status_code == 200:
+            actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": index, "alias": alias, "is_write_index": True}})
+    response = await _es_request("POST", "/_aliases", json={"actions": actions})
+    if response is None or response.status_code != 200:
+        detail = response.text if response is not None else "no response"
+        raise RuntimeError(f"Failed to swap alias '{alias}' to '{index}': {detail}")
+    return previous
+
 
-    for index_name, mapping in (
-        (settings.ELASTICSEARCH_PRODUCTS_INDEX, product_mapping),
-        (settings.ELASTICSEARCH_STORES_INDEX, store_mapping),
-    ):
-        head = await _es_request("HEAD", f"/{index_name}")
+async def delete_index(index: str) -> None:
+    response = await _es_request("DELETE", f"/{index}")
+    if response is not None and response.status_code not in (200, 404):
+        logger.warning("Failed to delete Elasticsearch index '%s': %s", index, response.text)
+
+
+async def index_document_ids(index: str, batch_size: int = 5000) -> AsyncIterator[list[int]]:
+    """Yield the ids of every document in ``index``, a scroll page at a time."""
+    response = await _es_request(
+        "POST",
+        f"/{index}/_search",
+        params={"scroll": "2m"},
+        json={"size": batch_size, "_source": False, "sort": ["_doc"]},
+    )
+    scroll_id = None
+    try:
+        while True:
+            if response is None or response.status_code != 200:
+                detail = response.text if response is not None else "no response"
+                raise RuntimeError(f"Failed to list documents of '{index}': {detail}")
+            body = response.json()
+            scroll_id = body.get("_scroll_id")
+            ids = [int(hit["_id"]) for hit in _hits(body)]
+            if not ids:
+                return
+            yield ids
+            response = await _es_request("POST", "/_search/scroll", json={"scroll": "2m", "scroll_id": scroll_id})
+    finally:
+        if scroll_id:
+            await _es_request("DELETE", "/_search/scroll", json={"scroll_id": scroll_id})
+
+
+async def ensure_search_indices() -> None:
+    for alias, mapping in search_mappings().items():
+        head = await _es_request("HEAD", f"/{alias}")
         if head is None:
             continue
         if head.status_code == 200:
+            # Add new fields in place; existing documents pick them up on reindex.
+            response = await _es_request("PUT", f"/{alias}/_mapping", json=mapping)
+            if response is not None and response.status_code != 200:
+                logger.warning("Failed to update mapping of '%s': %s", alias, response.text)
             continue
+        try:
+            await create_versioned_index(alias, with_alias=True)
+        except RuntimeError as exc:
+            logger.warning("%s", str(exc))
 
-        put = await _es_request("PUT", f"/{index_name}", json=mapping)
-        if put is None:
-            continue
-        if put.status_code not in (200, 201):
-            logger.warning("Failed to create Elasticsearch index '%s': %s", index_name, put.text)
+
+async def bulk_index(index: str, docs: list[tuple[int, dict[str, Any]]]) -> list[int]:
+    """Index ``(id, doc)`` pairs into ``index`` with one ``_bulk`` request; returns failed ids."""
+    if not docs:
+        return []
+    lines = []
+    for doc_id, doc in docs:
+        lines.append(json.dumps({"index": {"_index": index, "_id": str(doc_id)}}))
+        lines.append(json.dumps(doc))
+    response = await _es_request(
+        "POST",
+        "/_bulk",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    if response is None or response.status_code != 200:
+        return [doc_id for doc_id, _ in docs]
+    return [
+        doc_id
+        for (doc_id, _), item in zip(docs, response.json().get("items", []))
+        if item.get("index", {}).get("status", 500) >= 300
+    ]
 
 
 async def _upsert_document(index: str, doc_id: int, payload: dict[str, Any]) -> None:
@@ -125,7 +298,7 @@ async def _delete_document(index: str, doc_id: int) -> None:
     logger.warning("Elasticsearch delete failed for %s/%s: %s", index, doc_id, response.text)
 
 
-def _product_to_doc(product: Product, seller: Seller | None) -> dict[str, Any]:
+def product_to_doc(product: Product, seller: Seller | None) -> dict[str, Any]:
     image_url = product.images[0] if isinstance(product.images, list) and product.images else None
     return {
         "id": product.id,
@@ -133,14 +306,24 @@ def _product_to_doc(product: Product, seller: Seller | None) -> dict[str, Any]:
         "title": product.title,
         "description": product.description,
         "category": product.category,
+        "category_slug": category_slug(product.category),
         "price": int(product.price),
+        "in_stock": int(product.stock or 0) > 0,
         "image_url": image_url,
         "store_name": seller.store_name if seller else None,
+        "location": (
+            {"lat": seller.latitude, "lon": seller.longitude}
+            if seller and seller.latitude is not None and seller.longitude is not None
+            else None
+        ),
         "is_active": bool(product.is_active),
+        "rating": float(product.average_rating or 0),
+        "review_count": int(product.review_count or 0),
+        "suggest": {"input": [product.title]},
     }
 
 
-def _seller_to_doc(seller: Seller) -> dict[str, Any]:
+def seller_to_doc(seller: Seller) -> dict[str, Any]:
     return {
         "id": seller.id,
         "store_name": seller.store_name,
@@ -152,6 +335,10 @@ def _seller_to_doc(seller: Seller) -> dict[str, Any]:
         "approved": bool(seller.approved),
         "rating": float(seller.average_rating or 0),
         "total_reviews": int(seller.total_reviews or 0),
+        "suggest": {
+            "input": [seller.store_name],
+            "contexts": {"approved": ["true" if seller.approved else "false"]},
+        },
     }
 
 
@@ -169,7 +356,7 @@ async def upsert_product_document(db: AsyncSession, product_id: int) -> None:
     await _upsert_document(
         settings.ELASTICSEARCH_PRODUCTS_INDEX,
         product_id,
-        _product_to_doc(product, seller),
+        product_to_doc(product, seller),
     )
 
 
@@ -179,26 +366,142 @@ async def upsert_store_document(db: AsyncSession, seller_id: int) -> None:
         await _delete_document(settings.ELASTICSEARCH_STORES_INDEX, seller_id)
         return
 
-    await _upsert_document(settings.ELASTICSEARCH_STORES_INDEX, seller_id, _seller_to_doc(seller))
+    await _upsert_document(settings.ELASTICSEARCH_STORES_INDEX, seller_id, seller_to_doc(seller))
 
 
-async def _search_es(index: str, query: dict[str, Any]) -> list[dict[str, Any]] | None:
-    response = await _es_request("POST", f"/{index}/_search", json=query)
+async def bulk_sync_documents(
+    db: AsyncSession, product_ids: Iterable[int] = (), store_ids: Iterable[int] = ()
+) -> tuple[set[int], set[int]]:
+    """Bring the given products and stores in line with the database in one ``_bulk`` request.
+
+    Active products and existing stores are indexed, everything else deleted.
+    Returns the ``(product_ids, store_ids)`` that Elasticsearch did not accept.
+    """
+    product_ids = set(product_ids)
+    store_ids = set(store_ids)
+    if not product_ids and not store_ids:
+        return set(), set()
+
+    products_index = settings.ELASTICSEARCH_PRODUCTS_INDEX
+    stores_index = settings.ELASTICSEARCH_STORES_INDEX
+    actions: list[tuple[str, str, int, dict[str, Any] | None]] = []
+    if product_ids:
+        result = await db.execute(
+            select(Product, Seller)
+            .outerjoin(Seller, Seller.id == Product.seller_id)
+            .where(Product.id.in_(product_ids))
+        )
+        found = set()
+        for product, seller in result.all():
+            found.add(product.id)
+            if product.is_active:
+                actions.append(("index", products_index, product.id, product_to_doc(product, seller)))
+            else:
+                actions.append(("delete", products_index, product.id, None))
+        actions.extend(("delete", products_index, pid, None) for pid in product_ids - found)
+    if store_ids:
+        result = await db.execute(select(Seller).where(Seller.id.in_(store_ids)))
+        found = set()
+        for seller in result.scalars().all():
+            found.add(seller.id)
+            actions.append(("index", stores_index, seller.id, seller_to_doc(seller)))
+        actions.extend(("delete", stores_index, sid, None) for sid in store_ids - found)
+
+    lines = []
+    for op, index, doc_id, doc in actions:
+        lines.append(json.dumps({op: {"_index": index, "_id": str(doc_id)}}))
+        if doc is not None:
+            lines.append(json.dumps(doc))
+    response = await _es_request(
+        "POST",
+        "/_bulk",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    if response is None or response.status_code != 200:
+        if response is not None:
+            logger.warning("Elasticsearch bulk request failed: %s", response.text[:500])
+        return product_ids, store_ids
+
+    failed_products: set[int] = set()
+    failed_stores: set[int] = set()
+    missing_index = False
+    for (op, index, doc_id, _), item in zip(actions, response.json().get("items", [])):
+        outcome = item.get(op, {})
+        status = outcome.get("status", 500)
+        if status < 300 or (op == "delete" and status == 404):
+            continue
+        error = outcome.get("error") or {}
+        if isinstance(error, dict) and error.get("type") == "index_not_found_exception":
+            missing_index = True
+        (failed_products if index == products_index else failed_stores).add(doc_id)
+    if missing_index:
+        await ensure_search_indices()
+    return failed_products, failed_stores
+
+
+async def _search_es(index: str, query: dict[str, Any]) -> dict[str, Any] | None:
+    """Response body (``hits`` and any ``aggregations``) or None when Elasticsearch is unusable."""
+    response = await _es_request("POST", f"/{index}/_search", track_latency=True, json=query)
     if response is None:
         return None
+    if response.status_code == 400 and "search_after" in query:
+        # The cursor got past _es_after but ES still rejects it; SQL cannot continue it either.
+        raise ValidationException("Invalid cursor")
     if response.status_code != 200:
         logger.warning("Elasticsearch search failed for %s: %s", index, response.text)
         return None
 
     try:
-        body = response.json()
-        hits = body.get("hits", {}).get("hits", [])
-        return [h.get("_source", {}) for h in hits]
+        return response.json()
     except Exception as exc:
         logger.warning("Failed parsing Elasticsearch response for %s: %s", index, str(exc))
         return None
 
 
+def _hits(body: dict[str, Any]) -> list[dict[str, Any]]:
+    """Raw hits (``_source`` plus ``sort`` values) of a search response body."""
+    return body.get("hits", {}).get("hits", [])
+
+
+async def _msearch(searches: list[tuple[str, dict[str, Any]]]) -> list[dict[str, Any] | None] | None:
+    """Run ``(index, body)`` searches in one ``_msearch`` round trip.
+
+    Returns each search's response body (None for one that failed on its own),
+    or None when Elasticsearch is unusable.
+    """
+    lines = []
+    for index, body in searches:
+        lines.append(json.dumps({"index": index}))
+        lines.append(json.dumps(body))
+    response = await _es_request(
+        "POST",
+        "/_msearch",
+        track_latency=True,
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    if response is None:
+        return None
+    if response.status_code != 200:
+        logger.warning("Elasticsearch msearch failed: %s", response.text[:500])
+        return None
+
+    try:
+        bodies = response.json().get("responses", [])
+    except Exception as exc:
+        logger.warning("Failed parsing Elasticsearch msearch response: %s", str(exc))
+        return None
+    results: list[dict[str, Any] | None] = []
+    for body in bodies:
+        if "error" in body:
+            logger.warning("Elasticsearch msearch item failed: %s", str(body["error"])[:500])
+            results.append(None)
+        else:
+            results.append(body)
+    return results if len(results) == len(searches) else None
+
+
 def _product_brief(source: dict[str, Any]) -> dict[str, Any]:
     return {
         "id": source.get("id"),
@@ -217,8 +520,8 @@ def _product_full(source: dict[str, Any]) -> dict[str, Any]:
         "price": source.get("price"),
         "original_price": source.get("price"),
         "image_url": source.get("image_url"),
-        "rating": 0,
-        "review_count": 0,
+        "rating": source.get("rating") or 0,
+        "review_count": source.get("review_count") or 0,
     }
 
 
@@ -234,25 +537,228 @@ def _store_full(source: dict[str, Any]) -> dict[str, Any]:
     }
 
 
-async def _search_products_db(db: AsyncSession, q: str, page: int, size: int) -> list[dict[str, Any]]:
-    offset = (page - 1) * size
+@dataclass(frozen=True)
+class ProductFilters:
+    """Structured product search filters; ``radius_km`` needs ``lat``/``lng``."""
+
+    min_price: int | None = None
+    max_price: int | None = None
+    category: str | None = None
+    seller_id: int | None = None
+    in_stock: bool = False
+    lat: float | None = None
+    lng: float | None = None
+    radius_km: float | None = None
+
+    def __post_init__(self):
+        if (self.lat is None) != (self.lng is None):
+            raise ValidationException("lat and lng must be given together")
+        if self.radius_km is not None and self.lat is None:
+            raise ValidationException("radius_km needs lat and lng")
+        if self.min_price is not None and self.max_price is not None and self.min_price > self.max_price:
+            raise ValidationException("min_price cannot exceed max_price")
+
+    def cache_key(self) -> str:
+        return ",".join("" if value is None else str(value) for value in astuple(self))
+
+
+# Facet buckets as [from, to) pairs; None is open-ended.
+PRICE_FACET_RANGES = ((None, 100), (100, 500), (500, 1000), (1000, 5000), (5000, None))
+DISTANCE_FACET_KM = ((0, 2), (2, 5), (5, 10), (10, 25))
+FACET_SIZE = 20
+
+
+def _product_es_filters(filters: ProductFilters | None) -> list[dict[str, Any]]:
+    clauses: list[dict[str, Any]] = [{"term": {"is_active": True}}]
+    if filters is None:
+        return clauses
+    price = {op: value for op, value in (("gte", filters.min_price), ("lte", filters.max_price)) if value is not None}
+    if price:
+        clauses.append({"range": {"price": price}})
+    if filters.category:
+        clauses.append({"term": {"category_slug": slugify(filters.category)}})
+    if filters.seller_id is not None:
+        clauses.append({"term": {"seller_id": filters.seller_id}})
+    if filters.in_stock:
+        clauses.append({"term": {"in_stock": True}})
+    if filters.radius_km is not None:
+        clauses.append(
+            {
+                "geo_distance": {
+                    "distance": f"{filters.radius_km}km",
+                    "location": {"lat": filters.lat, "lon": filters.lng},
+                }
+            }
+        )
+    return clauses
+
+
+def _product_sql_filters(filters: ProductFilters | None) -> list:
+    """``_product_es_filters`` as SQL conditions on products."""
+    if filters is None:
+        return []
+    conditions = []
+    if filters.min_price is not None:
+        conditions.append(Product.price >= filters.min_price)
+    if filters.max_price is not None:
+        conditions.append(Product.price <= filters.max_price)
+    if filters.category:
+        conditions.append(Product.category_slug == slugify(filters.category))
+    if filters.seller_id is not None:
+        conditions.append(Product.seller_id == filters.seller_id)
+    if filters.in_stock:
+        conditions.append(Product.stock > 0)
+    if filters.radius_km is not None:
+        distance = seller_distance_km_expr(filters.lat, filters.lng)
+        nearby = select(Seller.id).where(
+            *seller_radius_prefilter(filters.lat, filters.lng, filters.radius_km),
+            distance <= filters.radius_km,
+        )
+        conditions.append(Product.seller_id.in_(nearby))
+    return conditions
+
+
+def _es_ranges(ranges) -> list[dict[str, Any]]:
+    return [
+        {"key": str(i), **{bound: value for bound, value in (("from", lo), ("to", hi)) if value is not None}}
+        for i, (lo, hi) in enumerate(ranges)
+    ]
+
+
+def _product_aggs(filters: ProductFilters | None) -> dict[str, Any]:
+    aggs: dict[str, Any] = {
+        "price": {"range": {"field": "price", "ranges": _es_ranges(PRICE_FACET_RANGES)}},
+        "category": {"terms": {"field": "category_slug", "size": FACET_SIZE}},
+        "seller": {"terms": {"field": "seller_id", "size": FACET_SIZE}},
+        "in_stock": {"filter": {"term": {"in_stock": True}}},
+    }
+    if filters is not None and filters.lat is not None:
+        aggs["distance"] = {
+            "geo_distance": {
+                "field": "location",
+                "origin": {"lat": filters.lat, "lon": filters.lng},
+                "unit": "km",
+                "ranges": _es_ranges(DISTANCE_FACET_KM),
+            }
+        }
+    return aggs
+
+
+def _range_facet(ranges, counts: list[int], low: str, high: str) -> list[dict[str, Any]]:
+    return [{low: lo, high: hi, "count": count} for (lo, hi), count in zip(ranges, counts)]
+
+
+def _facets_from_aggs(aggs: dict[str, Any]) -> dict[str, Any]:
+    def range_counts(name: str, ranges) -> list[int]:
+        counts = {bucket.get("key"): bucket.get("doc_count", 0) for bucket in aggs.get(name, {}).get("buckets", [])}
+        return [counts.get(str(i), 0) for i in range(len(ranges))]
+
+    facets = {
+        "price": _range_facet(PRICE_FACET_RANGES, range_counts("price", PRICE_FACET_RANGES), "from", "to"),
+        "category": [
+            {"value": bucket["key"], "count": bucket["doc_count"]}
+            for bucket in aggs.get("category", {}).get("buckets", [])
+        ],
+        "seller": [
+            {"seller_id": int(bucket["key"]), "count": bucket["doc_count"]}
+            for bucket in aggs.get("seller", {}).get("buckets", [])
+        ],
+        "in_stock": aggs.get("in_stock", {}).get("doc_count", 0),
+    }
+    if "distance" in aggs:
+        facets["distance"] = _range_facet(
+            DISTANCE_FACET_KM, range_counts("distance", DISTANCE_FACET_KM), "from_km", "to_km"
+        )
+    return facets
+
+
+def _count_between(column, lo, hi):
+    bounds = []
+    if lo is not None:
+        bounds.append(column >= lo)
+    if hi is not None:
+        bounds.append(column < hi)
+    return func.count().filter(and_(*bounds))
+
+
+async def _product_facets_db(db: AsyncSession, q: str, filters: ProductFilters | None) -> dict[str, Any]:
+    """The ``_product_aggs`` facets computed in SQL over the same matches."""
+    conditions = await product_match(db, q, _product_sql_filters(filters))
     result = await db.execute(
-        select(Product)
-        .where(
-            Product.is_active == True,
-            or_(
-                Product.title.ilike(f"%{q}%"),
-                Product.description.ilike(f"%{q}%"),
-                Product.category.ilike(f"%{q}%"),
-            ),
+        select(
+            func.count().filter(Product.stock > 0),
+            *[_count_between(Product.price, lo, hi) for lo, hi in PRICE_FACET_RANGES],
+        ).where(*conditions)
+    )
+    in_stock, *price_counts = result.one()
+
+    result = await db.execute(
+        select(Product.category_slug, func.count())
+        .where(*conditions, Product.category_slug.is_not(None))
+        .group_by(Product.category_slug)
+    )
+    categories: Counter = Counter(dict(result.all()))
+
+    seller_count = func.count().label("count")
+    result = await db.execute(
+        select(Product.seller_id, seller_count)
+        .where(*conditions)
+        .group_by(Product.seller_id)
+        .order_by(seller_count.desc(), Product.seller_id)
+        .limit(FACET_SIZE)
+    )
+
+    facets = {
+        "price": _range_facet(PRICE_FACET_RANGES, list(price_counts), "from", "to"),
+        "category": [{"value": slug, "count": count} for slug, count in categories.most_common(FACET_SIZE)],
+        "seller": [{"seller_id": seller_id, "count": count} for seller_id, count in result.all()],
+        "in_stock": in_stock,
+    }
+    if filters is not None and filters.lat is not None:
+        distance = seller_distance_km_expr(filters.lat, filters.lng)
+        result = await db.execute(
+            select(*[_count_between(distance, lo, hi) for lo, hi in DISTANCE_FACET_KM])
+            .select_from(Product)
+            .join(Seller, Seller.id == Product.seller_id)
+            .where(*conditions)
         )
-        .offset(offset)
-        .limit(size)
+        facets["distance"] = _range_facet(DISTANCE_FACET_KM, list(result.one()), "from_km", "to_km")
+    return facets
+
+
+async def _name_seller_facets(db: AsyncSession, facets: dict[str, Any]) -> None:
+    buckets = facets.get("seller") or []
+    if not buckets:
+        return
+    result = await db.execute(
+        select(Seller.id, Seller.store_name).where(Seller.id.in_([bucket["seller_id"] for bucket in buckets]))
+    )
+    names = dict(result.all())
+    for bucket in buckets:
+        bucket["store_name"] = names.get(bucket["seller_id"])
+
+
+async def _search_products_db(
+    db: AsyncSession,
+    q: str,
+    page: int,
+    size: int,
+    after: list | None = None,
+    filters: ProductFilters | None = None,
+    sort: str = "relevance",
+) -> tuple[list[dict[str, Any]], list | None]:
+    ranked, next_after = await rank_products(
+        db,
+        q,
+        limit=size,
+        offset=(page - 1) * size,
+        after=after,
+        filters=_product_sql_filters(filters),
+        by_rating=sort == "rating",
     )
-    products = result.scalars().all()
 
     rows: list[dict[str, Any]] = []
-    for p in products:
+    for p, _ in ranked:
         image_url = p.images[0] if isinstance(p.images, list) and p.images else None
         rows.append(
             {
@@ -263,31 +769,19 @@ async def _search_products_db(db: AsyncSession, q: str, page: int, size: int) ->
                 "price": p.price,
                 "original_price": p.price,
                 "image_url": image_url,
-                "rating": p.average_rating,
-                "review_count": 0,
+                "rating": p.average_rating or 0,
+                "review_count": p.review_count or 0,
             }
         )
-    return rows
+    return rows, next_after
 
 
-async def _search_stores_db(db: AsyncSession, q: str, page: int, size: int) -> list[dict[str, Any]]:
-    offset = (page - 1) * size
-    result = await db.execute(
-        select(Seller)
-        .where(
-            Seller.approved == True,
-            or_(
-                Seller.store_name.ilike(f"%{q}%"),
-                Seller.description.ilike(f"%{q}%"),
-                Seller.city.ilike(f"%{q}%"),
-            ),
-        )
-        .offset(offset)
-        .limit(size)
-    )
-    stores = result.scalars().all()
+async def _search_stores_db(
+    db: AsyncSession, q: str, page: int, size: int, after: list | None = None
+) -> tuple[list[dict[str, Any]], list | None]:
+    ranked, next_after = await rank_stores(db, q, limit=size, offset=(page - 1) * size, after=after)
 
-    return [
+    stores = [
         {
             "id": s.id,
             "store_name": s.store_name,
@@ -297,100 +791,323 @@ async def _search_stores_db(db: AsyncSession, q: str, page: int, size: int) -> l
             "rating": s.average_rating,
             "total_reviews": s.total_reviews,
         }
-        for s in stores
+        for s, _ in ranked
     ]
+    return stores, next_after
+
+
+# Sort orders, each ending with ``id`` as tiebreaker so ``search_after`` is stable.
+SEARCH_SORTS = {
+    "relevance": [{"_score": "desc"}, {"id": "asc"}],
+    "rating": [{"rating": {"order": "desc", "missing": "_last"}}, {"id": "asc"}],
+}
+
+
+def _paging(query: dict[str, Any], page: int, after: list | None, sort: str = "relevance") -> dict[str, Any]:
+    query["sort"] = list(SEARCH_SORTS[sort])
+    query["track_total_hits"] = False
+    if after is not None:
+        query["search_after"] = after
+    else:
+        query["from"] = (page - 1) * query["size"]
+    return query
+
+
+def _es_after(after: list, sort: str = "relevance") -> list:
+    """Check the sort values of an Elasticsearch cursor before they reach ``search_after``."""
+    if len(after) != len(SEARCH_SORTS[sort]):
+        raise ValidationException("Invalid cursor")
+    *values, last_id = after
+    if any(value is not None and not isinstance(value, (int, float, str)) for value in values):
+        raise ValidationException("Invalid cursor")
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValidationException("Invalid cursor")
+    return after
+
+
+async def _es_cursor_unavailable(db: AsyncSession) -> dict[str, Any]:
+    """Fallback for an Elasticsearch cursor: SQL cannot continue it, and restarting would repeat pages."""
+    raise HTTPException(status_code=503, detail="Search is temporarily unavailable; retry this page")
+
+
+def _next_cursor(backend: str, rows: list, size: int, key) -> str | None:
+    if len(rows) < size:
+        return None
+    return encode_cursor(backend, key(rows[-1]))
 
 
-async def search_products(db: AsyncSession, q: str, page: int = 1, size: int = 20) -> dict[str, Any]:
-    cache_key = f"search:products:{q.strip().lower()}:{page}:{size}"
-    cached = await cache_get(cache_key)
-    if cached is not None:
-        return cached
-
-    offset = (page - 1) * size
-    query = {
-        "from": offset,
-        "size": size,
-        "query": {
-            "bool": {
-                "must": [
-                    {
-                        "multi_match": {
-                            "query": q,
-                            "fields": ["title^3", "description", "category", "store_name^2"],
-                            "fuzziness": "AUTO",
-                        }
+def _product_query(q: str, filters: ProductFilters | None = None) -> dict[str, Any]:
+    return {
+        "bool": {
+            "must": [
+                {
+                    "multi_match": {
+                        "query": q,
+                        "fields": ["title^3", "description", "category", "store_name^2"],
+                        "fuzziness": "AUTO",
                     }
-                ],
-                "filter": [{"term": {"is_active": True}}],
-            }
-        },
+                }
+            ],
+            "filter": _product_es_filters(filters),
+        }
     }
-    hits = await _search_es(settings.ELASTICSEARCH_PRODUCTS_INDEX, query)
-    if hits:
-        payload = {"products": [_product_full(h) for h in hits]}
-        await cache_set(cache_key, payload, ttl_seconds=30)
-        return payload
-
-    payload = {"products": await _search_products_db(db, q, page, size)}
-    await cache_set(cache_key, payload, ttl_seconds=30)
-    return payload
 
 
-async def search_stores(db: AsyncSession, q: str, page: int = 1, size: int = 20) -> dict[str, Any]:
-    cache_key = f"search:stores:{q.strip().lower()}:{page}:{size}"
-    cached = await cache_get(cache_key)
-    if cached is not None:
-        return cached
-
-    offset = (page - 1) * size
-    query = {
-        "from": offset,
-        "size": size,
-        "query": {
-            "bool": {
-                "must": [
-                    {
-                        "multi_match": {
-                            "query": q,
-                            "fields": ["store_name^3", "description", "city", "address"],
-                            "fuzziness": "AUTO",
-                        }
+def _store_query(q: str) -> dict[str, Any]:
+    return {
+        "bool": {
+            "must": [
+                {
+                    "multi_match": {
+                        "query": q,
+                        "fields": ["store_name^3", "description", "city", "address"],
+                        "fuzziness": "AUTO",
                     }
-                ],
-                "filter": [{"term": {"approved": True}}],
-            }
-        },
+                }
+            ],
+            "filter": [{"term": {"approved": True}}],
+        }
+    }
+
+
+async def _search_with_fallback(
+    db: AsyncSession,
+    index: str,
+    query: dict[str, Any],
+    from_body: Callable[[dict[str, Any]], dict[str, Any]],
+    from_db: Callable[[AsyncSession], Awaitable[dict[str, Any]]],
+    *,
+    hedge: bool = True,
+) -> dict[str, Any]:
+    """Answer from Elasticsearch, or from ``from_db`` when it errors or the breaker is open.
+
+    An empty hit list is a real answer. With SEARCH_HEDGE_ENABLED, a search
+    still running after the recent p95 (capped at SEARCH_HEDGE_BUDGET_SECONDS)
+    also starts ``from_db`` on its own session and takes whichever answers first.
+    """
+    _search_stats["searches"] += 1
+    es = asyncio.ensure_future(_search_es(index, query))
+    if hedge and settings.SEARCH_HEDGE_ENABLED:
+        budget = settings.SEARCH_HEDGE_BUDGET_SECONDS
+        delay = min(_breaker.latency_percentile(0.95) or budget, budget)
+        done, _ = await asyncio.wait({es}, timeout=delay)
+        if not done:
+            _search_stats["hedged"] += 1
+            sql = asyncio.ensure_future(run_with_session(from_db))
+            done, _ = await asyncio.wait({es, sql}, return_when=asyncio.FIRST_COMPLETED)
+            if es in done and es.result() is not None:
+                sql.cancel()
+                _search_stats["hedge_es_wins"] += 1
+                return from_body(es.result())
+            if not es.done():
+                # Let it finish so its latency still reaches the breaker.
+                _background.add(es)
+                es.add_done_callback(_background.discard)
+            _search_stats["hedge_db_wins"] += 1
+            _search_stats["db_fallbacks"] += 1
+            return await sql
+
+    body = await es
+    if body is not None:
+        _search_stats["es_hits" if _hits(body) else "es_empty"] += 1
+        return from_body(body)
+    _search_stats["db_fallbacks"] += 1
+    return await from_db(db)
+
+
+async def _products_page_db(
+    db: AsyncSession,
+    q: str,
+    page: int,
+    size: int,
+    after: list | None = None,
+    *,
+    filters: ProductFilters | None = None,
+    sort: str = "relevance",
+    with_facets: bool = False,
+) -> dict[str, Any]:
+    products, next_after = await _search_products_db(db, q, page, size, after, filters, sort)
+    return {
+        "products": products,
+        "next_cursor": encode_cursor("db", next_after) if next_after else None,
+        "facets": await _product_facets_db(db, q, filters) if with_facets else None,
     }
-    hits = await _search_es(settings.ELASTICSEARCH_STORES_INDEX, query)
-    if hits:
-        payload = {"stores": [_store_full(h) for h in hits]}
-        await cache_set(cache_key, payload, ttl_seconds=30)
-        return payload
-
-    payload = {"stores": await _search_stores_db(db, q, page, size)}
-    await cache_set(cache_key, payload, ttl_seconds=30)
+
+
+async def _load_search_products(
+    db: AsyncSession,
+    q: str,
+    page: int,
+    size: int,
+    cursor: str | None = None,
+    filters: ProductFilters | None = None,
+    sort: str = "relevance",
+) -> dict[str, Any]:
+    backend, after = decode_cursor(cursor) if cursor else (None, None)
+    if cursor and backend not in ("db", "es"):
+        raise ValidationException("Invalid cursor")
+    # Facets describe the whole result set; continuation pages leave them out.
+    with_facets = cursor is None
+    if backend == "db":
+        return await _products_page_db(db, q, page, size, after, filters=filters, sort=sort)
+
+    es_after = _es_after(after, sort) if backend == "es" else None
+    body: dict[str, Any] = {"size": size, "query": _product_query(q, filters)}
+    if with_facets:
+        body["aggs"] = _product_aggs(filters)
+    payload = await _search_with_fallback(
+        db,
+        settings.ELASTICSEARCH_PRODUCTS_INDEX,
+        _paging(body, page, es_after, sort),
+        lambda body: {
+            "products": [_product_full(h.get("_source", {})) for h in _hits(body)],
+            "next_cursor": _next_cursor("es", _hits(body), size, lambda h: h["sort"]),
+            "facets": _facets_from_aggs(body.get("aggregations", {})) if with_facets else None,
+        },
+        lambda session: _products_page_db(
+            session, q, page, size, filters=filters, sort=sort, with_facets=with_facets
+        )
+        if es_after is None
+        else _es_cursor_unavailable(session),
+        hedge=es_after is None,
+    )
+    if payload.get("facets"):
+        await _name_seller_facets(db, payload["facets"])
     return payload
 
 
-async def global_search(db: AsyncSession, q: str) -> dict[str, Any]:
-    cache_key = f"search:global:{q.strip().lower()}"
-    cached = await cache_get(cache_key)
-    if cached is not None:
-        return cached
+def _product_dependencies(payload: dict[str, Any]) -> list[str]:
+    tags = []
+    for product in payload.get("products", []):
+        tags.append(f"product:{product.get('id')}")
+        if product.get("seller_id") is not None:
+            tags.append(f"seller:{product.get('seller_id')}")
+    return tags
+
+
+def _store_dependencies(payload: dict[str, Any]) -> list[str]:
+    return [f"seller:{store.get('id')}" for store in payload.get("stores", [])]
+
+
+def _global_dependencies(payload: dict[str, Any]) -> list[str]:
+    return _product_dependencies(payload) + _store_dependencies(payload)
+
+
+async def search_products(
+    db: AsyncSession,
+    q: str,
+    page: int = 1,
+    size: int = 20,
+    cursor: str | None = None,
+    filters: ProductFilters | None = None,
+    sort: str = "relevance",
+) -> dict[str, Any]:
+    if sort not in SEARCH_SORTS:
+        raise ValidationException(f"Unknown sort '{sort}'")
+    if cursor:
+        # Continuation pages are cheap with search_after and rarely shared; don't cache them.
+        return await _load_search_products(db, q, page, size, cursor, filters, sort)
+    cache_key = f"search:products:{q.strip().lower()}:{page}:{size}:{sort}"
+    if filters is not None:
+        cache_key += f":{filters.cache_key()}"
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_search_products(db, q, page, size, None, filters, sort),
+        ttl_seconds=30,
+        tags=("search",),
+        dependencies=_product_dependencies,
+        stale_seconds=settings.CACHE_STALE_SECONDS,
+        refresher=lambda: run_with_session(_load_search_products, q, page, size, None, filters, sort),
+        lock_seconds=settings.CACHE_LOCK_SECONDS,
+    )
+
+
+async def _stores_page_db(
+    db: AsyncSession, q: str, page: int, size: int, after: list | None = None
+) -> dict[str, Any]:
+    stores, next_after = await _search_stores_db(db, q, page, size, after)
+    return {"stores": stores, "next_cursor": encode_cursor("db", next_after) if next_after else None}
+
 
-    products = await search_products(db=db, q=q, page=1, size=10)
-    stores = await search_stores(db=db, q=q, page=1, size=10)
+async def _load_search_stores(
+    db: AsyncSession, q: str, page: int, size: int, cursor: str | None = None
+) -> dict[str, Any]:
+    backend, after = decode_cursor(cursor) if cursor else (None, None)
+    if cursor and backend not in ("db", "es"):
+        raise ValidationException("Invalid cursor")
+    if backend == "db":
+        return await _stores_page_db(db, q, page, size, after)
 
-    payload = {
+    es_after = _es_after(after) if backend == "es" else None
+    query = _paging({"size": size, "query": _store_query(q)}, page, es_after)
+    return await _search_with_fallback(
+        db,
+        settings.ELASTICSEARCH_STORES_INDEX,
+        query,
+        lambda body: {
+            "stores": [_store_full(h.get("_source", {})) for h in _hits(body)],
+            "next_cursor": _next_cursor("es", _hits(body), size, lambda h: h["sort"]),
+        },
+        lambda session: _stores_page_db(session, q, page, size)
+        if es_after is None
+        else _es_cursor_unavailable(session),
+        hedge=es_after is None,
+    )
+
+
+async def search_stores(
+    db: AsyncSession, q: str, page: int = 1, size: int = 20, cursor: str | None = None
+) -> dict[str, Any]:
+    if cursor:
+        return await _load_search_stores(db, q, page, size, cursor)
+    cache_key = f"search:stores:{q.strip().lower()}:{page}:{size}"
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_search_stores(db, q, page, size),
+        ttl_seconds=30,
+        tags=("search",),
+        dependencies=_store_dependencies,
+        stale_seconds=settings.CACHE_STALE_SECONDS,
+        refresher=lambda: run_with_session(_load_search_stores, q, page, size),
+        lock_seconds=settings.CACHE_LOCK_SECONDS,
+    )
+
+
+async def _load_global_search(db: AsyncSession, q: str) -> dict[str, Any]:
+    _search_stats["searches"] += 1
+    bodies = await _msearch(
+        [
+            (settings.ELASTICSEARCH_PRODUCTS_INDEX, _paging({"size": 10, "query": _product_query(q)}, 1, None)),
+            (settings.ELASTICSEARCH_STORES_INDEX, _paging({"size": 10, "query": _store_query(q)}, 1, None)),
+        ]
+    ) or [None, None]
+
+    async def products() -> list[dict[str, Any]]:
+        if bodies[0] is not None:
+            return [_product_full(h.get("_source", {})) for h in _hits(bodies[0])]
+        _search_stats["db_fallbacks"] += 1
+        rows, _ = await _search_products_db(db, q, 1, 10)
+        return rows
+
+    async def stores() -> list[dict[str, Any]]:
+        if bodies[1] is not None:
+            return [_store_full(h.get("_source", {})) for h in _hits(bodies[1])]
+        _search_stats["db_fallbacks"] += 1
+        # Own session so both fallbacks can run at once.
+        rows, _ = await run_with_session(_search_stores_db, q, 1, 10)
+        return rows
+
+    found_products, found_stores = await asyncio.gather(products(), stores())
+    return {
         "products": [
             {
                 "id": p.get("id"),
+                "seller_id": p.get("seller_id"),
                 "name": p.get("name"),
                 "price": p.get("price"),
                 "image_url": p.get("image_url"),
             }
-            for p in products.get("products", [])
+            for p in found_products
         ],
         "stores": [
             {
@@ -398,8 +1115,93 @@ async def global_search(db: AsyncSession, q: str) -> dict[str, Any]:
                 "store_name": s.get("store_name"),
                 "logo_url": s.get("logo_url"),
             }
-            for s in stores.get("stores", [])
+            for s in found_stores
         ],
     }
-    await cache_set(cache_key, payload, ttl_seconds=20)
-    return payload
+
+
+async def global_search(db: AsyncSession, q: str) -> dict[str, Any]:
+    cache_key = f"search:global:{q.strip().lower()}"
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_global_search(db, q),
+        ttl_seconds=20,
+        tags=("search",),
+        dependencies=_global_dependencies,
+        stale_seconds=settings.CACHE_STALE_SECONDS,
+        refresher=lambda: run_with_session(_load_global_search, q),
+    )
+
+
+def _completion(prefix: str, size: int, **extra: Any) -> dict[str, Any]:
+    completion = {"field": "suggest", "size": size, "skip_duplicates": True, **extra}
+    return {"suggest": {"names": {"prefix": prefix, "completion": completion}}}
+
+
+async def _load_suggestions(db: AsyncSession, prefix: str, size: int) -> dict[str, Any]:
+    bodies = await _msearch(
+        [
+            (
+                settings.ELASTICSEARCH_PRODUCTS_INDEX,
+                {"size": 0, "_source": ["id", "seller_id", "title", "image_url"], **_completion(prefix, size)},
+            ),
+            (
+                settings.ELASTICSEARCH_STORES_INDEX,
+                {
+                    "size": 0,
+                    "_source": ["id", "store_name", "logo_url"],
+                    **_completion(prefix, size, contexts={"approved": ["true"]}),
+                },
+            ),
+        ]
+    )
+    if bodies is not None and None not in bodies:
+        options = [(body.get("suggest", {}).get("names") or [{}])[0].get("options", []) for body in bodies]
+        return {
+            "products": [
+                {
+                    "id": source.get("id"),
+                    "seller_id": source.get("seller_id"),
+                    "name": source.get("title"),
+                    "image_url": source.get("image_url"),
+                }
+                for source in (option.get("_source", {}) for option in options[0])
+            ],
+            "stores": [
+                {"id": source.get("id"), "store_name": source.get("store_name"), "logo_url": source.get("logo_url")}
+                for source in (option.get("_source", {}) for option in options[1])
+            ],
+        }
+
+    _search_stats["suggest_db_fallbacks"] += 1
+    products = await prefix_products(db, prefix, limit=size)
+    stores = await prefix_stores(db, prefix, limit=size)
+    return {
+        "products": [
+            {
+                "id": p.id,
+                "seller_id": p.seller_id,
+                "name": p.title,
+                "image_url": p.images[0] if isinstance(p.images, list) and p.images else None,
+            }
+            for p in products
+        ],
+        "stores": [{"id": s.id, "store_name": s.store_name, "logo_url": s.logo_url} for s in stores],
+    }
+
+
+async def suggest(db: AsyncSession, q: str, size: int = 5) -> dict[str, Any]:
+    """Typeahead completions of ``q`` from product titles and store names."""
+    prefix = " ".join(q.lower().split())
+    if not prefix:
+        return {"products": [], "stores": []}
+    cache_key = f"search:suggest:{prefix}:{size}"
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_suggestions(db, prefix, size),
+        ttl_seconds=60,
+        tags=("search",),
+        dependencies=_global_dependencies,
+        stale_seconds=settings.CACHE_STALE_SECONDS,
+        refresher=lambda: run_with_session(_load_suggestions, prefix, size),
+    )
@@ -5,16 +5,18 @@ from app.models.commission_model import Commission
 from app.models.notification_model import NotificationType
 from app.models.order_item_model import OrderItem
 from app.models.order_model import Order, OrderStatus
+from app.models.product_model import Product
 from app.models.seller_model import Seller
 from app.models.user_model import User
 from app.core.exceptions import ConflictException, NotFoundException, PermissionDeniedException
-from app.core.logging import logger
 from app.services.notification_service import create_notification
 from app.services.order_service import get_order_items_map
-from app.services.search_service import upsert_store_document
+from app.services.search_indexer import enqueue_product_index, enqueue_store_index
+from app.services.store_service import seller_cache_tags, seller_location_tags
 from app.utils.email_handler import send_email_background
 from app.utils.email_templates import order_status_email
-from app.utils.simple_cache import cache_delete_prefix
+from app.utils.geohash import encode_location
+from app.utils.cache import cache_invalidate_tags
 
 
 def _normalize_location_fields(data: dict | None) -> dict:
@@ -43,16 +45,13 @@ async def create_seller_profile(
         approved=False,
         **_normalize_location_fields(data),
     )
-    
+    seller.geohash = encode_location(seller.latitude, seller.longitude)
+
     db.add(seller)
     await db.commit()
     await db.refresh(seller)
-    try:
-        await upsert_store_document(db, seller.id)
-    except Exception as exc:
-        logger.warning("Seller indexing failed for %s: %s", seller.id, str(exc))
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await enqueue_store_index(seller.id)
+    await cache_invalidate_tags(*seller_cache_tags(seller))
     return seller
 
 
@@ -66,18 +65,28 @@ async def update_seller_profile(db: AsyncSession, user_id: int, data: dict) -> S
     if not seller:
         raise NotFoundException("Seller not found")
 
+    previous_location = (seller.latitude, seller.longitude)
+    previous_store_name = seller.store_name
     normalized_data = _normalize_location_fields(data)
     for key, value in normalized_data.items():
         setattr(seller, key, value)
+    seller.geohash = encode_location(seller.latitude, seller.longitude)
 
     await db.commit()
     await db.refresh(seller)
-    try:
-        await upsert_store_document(db, seller.id)
-    except Exception as exc:
-        logger.warning("Seller indexing failed for %s: %s", seller.id, str(exc))
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await enqueue_store_index(seller.id)
+    moved = previous_location != (seller.latitude, seller.longitude)
+    if moved or previous_store_name != seller.store_name:
+        # Product documents carry the store name and pickup location.
+        result = await db.execute(select(Product.id).where(Product.seller_id == seller.id))
+        product_ids = list(result.scalars().all())
+        for start in range(0, len(product_ids), 1000):
+            await enqueue_product_index(*product_ids[start : start + 1000])
+    tags = seller_cache_tags(seller)
+    if moved:
+        tags += seller_location_tags(*previous_location)
+        tags += seller_location_tags(seller.latitude, seller.longitude)
+    await cache_invalidate_tags(*tags)
     return seller
 
 
@@ -89,8 +98,7 @@ async def upload_kyc_for_user(db: AsyncSession, user_id: int, kyc_data: dict) ->
     seller.kyc_docs = kyc_data
     await db.commit()
     await db.refresh(seller)
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await cache_invalidate_tags(*seller_cache_tags(seller))
     return seller
 
 
@@ -108,8 +116,7 @@ async def upload_kyc_document_for_user(
 
     await db.commit()
     await db.refresh(seller)
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await cache_invalidate_tags(*seller_cache_tags(seller))
     return seller
 
 async def upload_kyc(db: AsyncSession, seller_id: int, kyc_data: dict, user_id: int) -> Seller:
@@ -125,8 +132,7 @@ async def upload_kyc(db: AsyncSession, seller_id: int, kyc_data: dict, user_id:
     seller.kyc_docs = kyc_data
     await db.commit()
     await db.refresh(seller)
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await cache_invalidate_tags(*seller_cache_tags(seller))
     return seller
 
 async def approve_seller(db: AsyncSession, seller_id: int, commission_percent: int) -> Seller:
@@ -140,12 +146,11 @@ async def approve_seller(db: AsyncSession, seller_id: int, commission_percent: i
     seller.commission_percent = commission_percent
     await db.commit()
     await db.refresh(seller)
-    try:
-        await upsert_store_document(db, seller.id)
-    except Exception as exc:
-        logger.warning("Seller indexing failed for %s: %s", seller.id, str(exc))
-    await cache_delete_prefix("search:")
-    await cache_delete_prefix("stores:")
+    await enqueue_store_index(seller.id)
+    await cache_invalidate_tags(
+        *seller_cache_tags(seller),
+        *seller_location_tags(seller.latitude, seller.longitude),
+    )
     return seller
 
 
@@ -283,7 +288,7 @@ async def update_seller_order_status(
     if not order or order.seller_id != seller.id:
         raise NotFoundException("Order not found")
 
-    if order.status in (OrderStatus.cancelled, OrderStatus.delivered):
+    if order.status in (OrderStatus.cancelled, OrderStatus.expired, OrderStatus.delivered):
         raise ConflictException("Finalized orders cannot be updated")
 
     allowed_statuses = {OrderStatus.packed, OrderStatus.shipped}
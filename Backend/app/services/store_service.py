@@ -1,11 +1,61 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, or_, select, text
 from app.models.seller_model import Seller
 from app.models.product_model import Product
-from app.utils.distance import calculate_distance_km
-from app.utils.simple_cache import cache_get, cache_set
+from app.utils import geohash
+from app.utils.distance import estimate_delivery_minutes
+from app.core.config import settings
+from app.db.postgres import run_with_session
+from app.utils.cache import cache_get_or_set
 from typing import List, Optional
 
+# Geohash precisions (~156km, ~39km, ~4.9km cells) used to tag nearby-store
+# cache entries. A seller write invalidates its cell at each of them.
+GEO_TAG_PRECISIONS = (3, 4, 5)
+NEARBY_MAX_TAG_CELLS = 25
+
+# Geohash precisions tried for the nearby prefilter, finest first that keeps
+# the cover under NEARBY_MAX_SCAN_CELLS prefixes.
+NEARBY_SCAN_PRECISIONS = (3, 4, 5, 6, 7)
+NEARBY_MAX_SCAN_CELLS = 40
+NEARBY_FALLBACK_FACTORS = (4, 16, 64)
+NEARBY_FALLBACK_MAX_KM = 2500
+EARTH_RADIUS_KM = 6371
+
+_earthdistance: bool | None = None
+
+
+def seller_cache_tags(seller: Seller) -> list[str]:
+    """Tags for entries that display this seller."""
+    return [f"seller:{seller.id}"]
+
+
+def seller_location_tags(lat, lng) -> list[str]:
+    """Tags for nearby queries that could gain or lose a seller at this point."""
+    # Entries that fell back to "nearest anywhere" depend on every seller.
+    tags = ["stores:fallback"]
+    if lat is None or lng is None:
+        return tags
+    cell = geohash.encode(float(lat), float(lng), max(GEO_TAG_PRECISIONS))
+    tags.extend(f"geo:{p}:{cell[:p]}" for p in GEO_TAG_PRECISIONS)
+    return tags
+
+
+def _nearby_query_tags(lat: float, lng: float, radius_km: float) -> list[str]:
+    bbox = geohash.bounding_box(lat, lng, radius_km)
+    precision = geohash.covering_precision(*bbox, NEARBY_MAX_TAG_CELLS, GEO_TAG_PRECISIONS)
+    return ["stores"] + [f"geo:{precision}:{cell}" for cell in geohash.cells_covering(*bbox, precision)]
+
+
+def _nearby_dependencies(radius_km: float):
+    def dependencies(stores) -> list[str]:
+        tags = [f"seller:{store['id']}" for store in stores]
+        if not stores or any(store["distance_km"] >= radius_km for store in stores):
+            tags.append("stores:fallback")
+        return tags
+
+    return dependencies
+
 
 async def get_nearby_stores(
     db: AsyncSession,
@@ -20,50 +70,141 @@ async def get_nearby_stores(
     Returns stores sorted by distance.
     """
     cache_key = f"stores:nearby:{round(lat,4)}:{round(lng,4)}:{radius_km}:{skip}:{limit}"
-    cached = await cache_get(cache_key)
-    if cached is not None:
-        return cached
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_nearby_stores(db, lat, lng, radius_km, skip, limit),
+        ttl_seconds=30,
+        tags=_nearby_query_tags(lat, lng, radius_km),
+        dependencies=_nearby_dependencies(radius_km),
+        stale_seconds=settings.CACHE_STALE_SECONDS,
+        refresher=lambda: run_with_session(_load_nearby_stores, lat, lng, radius_km, skip, limit),
+        lock_seconds=settings.CACHE_LOCK_SECONDS,
+    )
 
-    result = await db.execute(
-        select(Seller)
+
+def seller_distance_km_expr(lat: float, lng: float):
+    """SQL haversine distance in km from (lat, lng) to the seller's location."""
+    half_dlat = func.radians(Seller.latitude - lat) / 2
+    half_dlng = func.radians(Seller.longitude - lng) / 2
+    a = func.power(func.sin(half_dlat), 2) + func.cos(func.radians(lat)) * func.cos(
+        func.radians(Seller.latitude)
+    ) * func.power(func.sin(half_dlng), 2)
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(a, 1.0)))
+
+
+def seller_radius_prefilter(lat: float, lng: float, radius_km: float) -> list:
+    """Index-backed clauses (geohash prefixes + bounding box) for sellers near a point.
+
+    Coarse: callers still compare the exact distance against ``radius_km``.
+    """
+    bbox = geohash.bounding_box(lat, lng, radius_km)
+    min_lat, min_lng, max_lat, max_lng = bbox
+    precision = geohash.covering_precision(*bbox, NEARBY_MAX_SCAN_CELLS, NEARBY_SCAN_PRECISIONS)
+    cells = geohash.cells_covering(*bbox, precision)
+    return [
+        or_(*[Seller.geohash.like(f"{cell}%") for cell in cells]),
+        Seller.latitude.between(min_lat, max_lat),
+        Seller.longitude.between(min_lng, max_lng),
+    ]
+
+
+async def _earthdistance_available(db: AsyncSession) -> bool:
+    global _earthdistance
+    if _earthdistance is None:
+        if not settings.GEO_EARTHDISTANCE_ENABLED:
+            _earthdistance = False
+        else:
+            result = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'earthdistance'"))
+            _earthdistance = bool(result.scalar())
+    return _earthdistance
+
+
+async def _nearby_rows(
+    db: AsyncSession,
+    lat: float,
+    lng: float,
+    radius_km: float | None,
+    skip: int,
+    limit: int,
+):
+    """Approved sellers ordered by distance, optionally limited to ``radius_km``.
+
+    The radius filter is a geohash-prefix + bounding-box prefilter (or an
+    earthdistance GiST lookup when the extension is installed), so the exact
+    distance is only computed for sellers in the surrounding cells.
+    """
+    use_earth = await _earthdistance_available(db)
+    if use_earth:
+        origin = func.ll_to_earth(lat, lng)
+        distance = func.earth_distance(origin, func.ll_to_earth(Seller.latitude, Seller.longitude)) / 1000
+    else:
+        distance = seller_distance_km_expr(lat, lng)
+
+    query = (
+        select(
+            Seller.id,
+            Seller.store_name,
+            Seller.logo_url,
+            Seller.description,
+            Seller.city,
+            Seller.total_reviews,
+            Seller.average_rating,
+            distance.label("distance_km"),
+        )
         .where(Seller.approved == True)
         .where(Seller.latitude.is_not(None), Seller.longitude.is_not(None))
-        .limit(1000)
     )
-    sellers = result.scalars().all()
-    
-    stores_with_distance = []
-    candidate_stores = []
-    for seller in sellers:
-        if seller.latitude is not None and seller.longitude is not None:
-            try:
-                seller_lat = float(seller.latitude)
-                seller_lng = float(seller.longitude)
-                distance = calculate_distance_km(lat, lng, seller_lat, seller_lng)
-                
-                store_payload = {
-                    "id": seller.id,
-                    "store_name": seller.store_name,
-                    "logo_url": seller.logo_url,
-                    "description": seller.description,
-                    "city": seller.city,
-                    "distance_km": round(distance, 2),
-                    "total_reviews": seller.total_reviews,
-                    "average_rating": seller.average_rating,
-                    "delivery_time_minutes": _estimate_delivery_time(distance),
-                }
-                candidate_stores.append(store_payload)
-                if distance <= radius_km:
-                    stores_with_distance.append(store_payload)
-            except (ValueError, TypeError):
-                continue
-    
-    # If no stores are inside radius, fallback to nearest stores so the section isn't empty.
-    source = stores_with_distance if stores_with_distance else candidate_stores
-    source.sort(key=lambda x: x["distance_km"])
-    payload = source[skip : skip + limit]
-    await cache_set(cache_key, payload, ttl_seconds=30)
-    return payload
+    if radius_km is not None:
+        if use_earth:
+            query = query.where(
+                func.earth_box(origin, radius_km * 1000).op("@>")(
+                    func.ll_to_earth(Seller.latitude, Seller.longitude)
+                )
+            )
+        else:
+            query = query.where(*seller_radius_prefilter(lat, lng, radius_km))
+        query = query.where(distance <= radius_km)
+
+    result = await db.execute(query.order_by(distance, Seller.id).offset(skip).limit(limit))
+    return result.all()
+
+
+async def _load_nearby_stores(
+    db: AsyncSession,
+    lat: float,
+    lng: float,
+    radius_km: float,
+    skip: int,
+    limit: int,
+) -> List[dict]:
+    rows = await _nearby_rows(db, lat, lng, radius_km, skip, limit)
+    if not rows and (skip == 0 or not await _nearby_rows(db, lat, lng, radius_km, 0, 1)):
+        # If no stores are inside radius, fallback to nearest stores so the section isn't empty.
+        # Widen the ring until it holds the page; stores beyond the widest ring are not
+        # worth an unbounded scan of every seller, so a short page is returned as is.
+        rows = []
+        for factor in NEARBY_FALLBACK_FACTORS:
+            ring_km = radius_km * factor
+            if ring_km > NEARBY_FALLBACK_MAX_KM:
+                break
+            rows = await _nearby_rows(db, lat, lng, ring_km, skip, limit)
+            if len(rows) == limit:
+                break
+
+    return [
+        {
+            "id": row.id,
+            "store_name": row.store_name,
+            "logo_url": row.logo_url,
+            "description": row.description,
+            "city": row.city,
+            "distance_km": round(float(row.distance_km), 2),
+            "total_reviews": row.total_reviews,
+            "average_rating": row.average_rating,
+            "delivery_time_minutes": _estimate_delivery_time(float(row.distance_km)),
+        }
+        for row in rows
+    ]
 
 
 async def get_store_by_id(db: AsyncSession, store_id: int) -> Optional[Seller]:
@@ -128,8 +269,4 @@ def _estimate_delivery_time(distance_km: float) -> int:
     Estimate delivery time in minutes based on distance.
     Assumes average speed of 20 km/h for urban delivery.
     """
-    # Base time for preparation: 15 minutes
-    # Travel time: distance / speed * 60
-    travel_time = (distance_km / 20) * 60
-    total_time = int(15 + travel_time)
-    return min(total_time, 120)  # Cap at 2 hours
+    return estimate_delivery_minutes(distance_km)
@@ -0,0 +1,195 @@
+"""
+Ranked Postgres search, the fallback when Elasticsearch is unavailable.
+
+``products.search_vector`` and ``sellers.search_vector`` are generated tsvector
+columns with GIN indexes (see ``migrate_search_vectors``). The name field is
+weight A and the other fields B/C, ranked so a name hit counts about three
+times a hit elsewhere, like the ``^3`` boosts of the Elasticsearch queries.
+When a query matches no document and pg_trgm is installed, a trigram match on
+the name stands in for Elasticsearch's fuzziness.
+
+Results are ordered by score then id; ``after`` is the ``[mode, score, id]``
+of the last row served, so pages continue with a keyset instead of OFFSET.
+Typeahead prefixes are matched against the weight-A (name) lexemes only.
+"""
+
+import re
+from typing import Any
+
+from sqlalchemy import and_, exists, func, literal, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.exceptions import ValidationException
+from app.models.product_model import Product
+from app.models.seller_model import Seller
+
+# Must match the configuration the generated columns are built with; "simple"
+# lowercases without stemming, like the Elasticsearch standard analyzer.
+_TS_CONFIG = literal_column("'simple'::regconfig")
+# ts_rank weights for {D, C, B, A}.
+_RANK_WEIGHTS = literal_column("'{0.1, 0.33, 0.33, 1.0}'::float4[]")
+# Divide by 1 + log(document length) so long descriptions don't dominate.
+_RANK_NORMALIZATION = 1
+
+_PRODUCT_VECTOR = literal_column("products.search_vector")
+_STORE_VECTOR = literal_column("sellers.search_vector")
+
+_trigram: bool | None = None
+
+
+async def _trigram_available(db: AsyncSession) -> bool:
+    global _trigram
+    if _trigram is None:
+        if not settings.SEARCH_TRIGRAM_ENABLED:
+            _trigram = False
+        else:
+            result = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+            _trigram = bool(result.scalar())
+    return _trigram
+
+
+def _parse_after(after: list | None) -> tuple[str, list | None]:
+    if after is None:
+        return "fts", None
+    if (
+        len(after) != 3
+        or after[0] not in ("fts", "trgm")
+        or not isinstance(after[1], (int, float))
+        or not isinstance(after[2], int)
+    ):
+        raise ValidationException("Invalid cursor")
+    return after[0], after[1:]
+
+
+async def _ranked(
+    db: AsyncSession,
+    entity,
+    vector,
+    name,
+    filters: list,
+    q: str,
+    *,
+    limit: int,
+    offset: int,
+    after: list | None,
+    sort_key=None,
+) -> tuple[list[tuple[Any, float]], list | None]:
+    """``sort_key`` replaces the relevance score as the (descending) sort value."""
+    mode, keyset = _parse_after(after)
+    tsquery = func.websearch_to_tsquery(_TS_CONFIG, q)
+    matches = vector.op("@@")(tsquery)
+
+    async def run(match, score) -> list[tuple[Any, float]]:
+        query = select(entity, score.label("score")).where(*filters, match)
+        if keyset is not None:
+            query = query.where(or_(score < keyset[0], and_(score == keyset[0], entity.id > keyset[1])))
+        else:
+            query = query.offset(offset)
+        result = await db.execute(query.order_by(score.desc(), entity.id).limit(limit))
+        return [(row[0], float(row[1])) for row in result.all()]
+
+    rows: list[tuple[Any, float]] = []
+    if mode == "fts":
+        relevance = func.ts_rank(_RANK_WEIGHTS, vector, tsquery, _RANK_NORMALIZATION)
+        rows = await run(matches, sort_key if sort_key is not None else relevance)
+        if not rows and keyset is None and await _trigram_available(db):
+            # Past the last page of real matches is just an empty page.
+            if not offset or not await db.scalar(select(exists().where(*filters, matches))):
+                mode = "trgm"
+    if mode == "trgm":
+        similarity = func.word_similarity(q, name)
+        rows = await run(literal(q).op("<%")(name), sort_key if sort_key is not None else similarity)
+
+    if len(rows) < limit:
+        return rows, None
+    last, score = rows[-1]
+    return rows, [mode, score, last.id]
+
+
+async def rank_products(
+    db: AsyncSession,
+    q: str,
+    *,
+    limit: int,
+    offset: int = 0,
+    after: list | None = None,
+    filters: list | None = None,
+    by_rating: bool = False,
+) -> tuple[list[tuple[Product, float]], list | None]:
+    """Active products matching ``q`` (and ``filters``) best first, and the ``after`` value for the next page.
+
+    ``by_rating`` orders by average rating instead of relevance.
+    """
+    return await _ranked(
+        db,
+        Product,
+        _PRODUCT_VECTOR,
+        Product.title,
+        [Product.is_active == True, *(filters or [])],
+        q,
+        limit=limit,
+        offset=offset,
+        after=after,
+        sort_key=func.coalesce(Product.average_rating, 0.0) if by_rating else None,
+    )
+
+
+async def rank_stores(
+    db: AsyncSession, q: str, *, limit: int, offset: int = 0, after: list | None = None
+) -> tuple[list[tuple[Seller, float]], list | None]:
+    """Approved stores matching ``q`` best first, and the ``after`` value for the next page."""
+    return await _ranked(
+        db,
+        Seller,
+        _STORE_VECTOR,
+        Seller.store_name,
+        [Seller.approved == True],
+        q,
+        limit=limit,
+        offset=offset,
+        after=after,
+    )
+
+
+async def product_match(db: AsyncSession, q: str, filters: list | None = None) -> list:
+    """WHERE clauses selecting every product ``rank_products`` can return for ``q``, for aggregations."""
+    conditions = [Product.is_active == True, *(filters or [])]
+    matches = _PRODUCT_VECTOR.op("@@")(func.websearch_to_tsquery(_TS_CONFIG, q))
+    if await _trigram_available(db) and not await db.scalar(select(exists().where(*conditions, matches))):
+        return [*conditions, literal(q).op("<%")(Product.title)]
+    return [*conditions, matches]
+
+
+def _prefix_tsquery(prefix: str) -> str | None:
+    """``"red sho"`` -> ``"red:A & sho:*A"``; None when nothing searchable is left."""
+    words = re.findall(r"\w+", prefix.lower())
+    if not words:
+        return None
+    return " & ".join([f"{word}:A" for word in words[:-1]] + [f"{words[-1]}:*A"])
+
+
+async def _prefixed(db: AsyncSession, entity, vector, name, filters: list, prefix: str, limit: int) -> list:
+    tsquery = _prefix_tsquery(prefix)
+    if tsquery is None:
+        return []
+    result = await db.execute(
+        select(entity)
+        .where(*filters, vector.op("@@")(func.to_tsquery(_TS_CONFIG, tsquery)))
+        # Shortest names first: the closest completions of what was typed.
+        .order_by(func.length(name), entity.id)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def prefix_products(db: AsyncSession, prefix: str, *, limit: int) -> list[Product]:
+    return await _prefixed(
+        db, Product, _PRODUCT_VECTOR, Product.title, [Product.is_active == True], prefix, limit
+    )
+
+
+async def prefix_stores(db: AsyncSession, prefix: str, *, limit: int) -> list[Seller]:
+    return await _prefixed(
+        db, Seller, _STORE_VECTOR, Seller.store_name, [Seller.approved == True], prefix, limit
+    )
@@ -0,0 +1,370 @@
+"""
+Append-only delivery location store.
+
+Every delivery gets a Redis stream (``tracking:stream:<delivery_id>``) capped at
+TRACKING_HISTORY_MAXLEN entries plus a ``tracking:latest:<delivery_id>`` key
+holding the newest point, so a GPS ping is one pipelined round trip and never
+rewrites earlier points. Both keys expire after TRACKING_RETENTION_SECONDS of
+inactivity.
+
+The newest point of each write is also published on
+``tracking:order:<order_id>``. Each worker subscribes only to the channels of
+orders that have a local watcher (subscribing on the first, unsubscribing after
+the last) and fans messages out to them, so live viewers never touch the
+database after connecting and pings for unwatched orders never reach a worker.
+
+Pings also refresh the partner's position in a Redis GEO set
+(``dispatch:partners:geo``) with last-seen times in ``dispatch:partners:seen``,
+which dispatch uses to find riders near a pickup point.
+"""
+
+import asyncio
+import json
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Collection
+
+from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+
+from app.core.config import settings
+from app.core.exceptions import ValidationException
+from app.core.logging import logger
+from app.db.redis import get_redis
+
+PARTNER_GEO_KEY = "dispatch:partners:geo"
+PARTNER_SEEN_KEY = "dispatch:partners:seen"
+# Redis GEO cannot index the polar caps.
+_GEO_MAX_LAT = 85.05112878
+
+_watchers: dict[int, set[asyncio.Queue]] = {}
+_listener_task: asyncio.Task | None = None
+# The listener's connection, for watchers to (un)subscribe their order's channel on.
+_pubsub: PubSub | None = None
+# Wakes a listener that has no connection yet because nothing was watched.
+_watch_added = asyncio.Event()
+
+
+def _stream_key(delivery_id: int) -> str:
+    return f"tracking:stream:{delivery_id}"
+
+
+def _latest_key(delivery_id: int) -> str:
+    return f"tracking:latest:{delivery_id}"
+
+
+def _order_channel(order_id: int) -> str:
+    return f"{settings.TRACKING_CHANNEL_PREFIX}{order_id}"
+
+
+def _decode_entry(entry_id: str, fields: dict) -> dict:
+    point = json.loads(fields["p"])
+    point["cursor"] = entry_id
+    return point
+
+
+def _queue_append(
+    pipe, delivery_id: int, points: list[dict], *, set_latest: bool = True, order_id: int | None = None
+) -> None:
+    stream_key = _stream_key(delivery_id)
+    for point in points:
+        pipe.xadd(
+            stream_key,
+            {"p": json.dumps(point, separators=(",", ":"))},
+            maxlen=settings.TRACKING_HISTORY_MAXLEN,
+            approximate=True,
+        )
+    pipe.expire(stream_key, settings.TRACKING_RETENTION_SECONDS)
+    if set_latest:
+        pipe.set(
+            _latest_key(delivery_id),
+            json.dumps(points[-1], separators=(",", ":")),
+            ex=settings.TRACKING_RETENTION_SECONDS,
+        )
+        if order_id is not None:
+            delta = {"delivery_id": delivery_id, "order_id": order_id, **points[-1]}
+            pipe.publish(_order_channel(order_id), json.dumps(delta, separators=(",", ":")))
+
+
+def _queue_partner_position(pipe, partner_id: int, lat: float, lng: float) -> None:
+    if abs(lat) > _GEO_MAX_LAT or abs(lng) > 180:
+        return
+    pipe.geoadd(PARTNER_GEO_KEY, [lng, lat, partner_id])
+    pipe.zadd(PARTNER_SEEN_KEY, {partner_id: time.time()})
+
+
+async def append_locations(
+    delivery_id: int,
+    points: list[dict],
+    *,
+    order_id: int | None = None,
+    partner_id: int | None = None,
+) -> list[str]:
+    """Append points (oldest first) and return their stream ids."""
+    if not points:
+        return []
+    redis: Redis = await get_redis()
+    pipe = redis.pipeline(transaction=False)
+    _queue_append(pipe, delivery_id, points, order_id=order_id)
+    if partner_id is not None:
+        _queue_partner_position(pipe, partner_id, points[-1]["lat"], points[-1]["lng"])
+    results = await pipe.execute()
+    return list(results[: len(points)])
+
+
+async def append_location_batches(
+    batches: dict[int, list[dict]],
+    *,
+    keep_latest: Collection[int] = (),
+    order_ids: dict[int, int] | None = None,
+    partner_id: int | None = None,
+) -> int:
+    """Append points for many deliveries in one pipelined round trip.
+
+    Deliveries listed in ``keep_latest`` only get history appended; their
+    latest point is left alone (used when a flushed batch is older than
+    what is already stored). Returns the number of points written.
+    """
+    batches = {delivery_id: points for delivery_id, points in batches.items() if points}
+    if not batches:
+        return 0
+    redis: Redis = await get_redis()
+    pipe = redis.pipeline(transaction=False)
+    for delivery_id, points in batches.items():
+        _queue_append(
+            pipe,
+            delivery_id,
+            points,
+            set_latest=delivery_id not in keep_latest,
+            order_id=(order_ids or {}).get(delivery_id),
+        )
+    if partner_id is not None:
+        newest = max(
+            (points[-1] for delivery_id, points in batches.items() if delivery_id not in keep_latest),
+            key=lambda point: point["updated_at"],
+            default=None,
+        )
+        if newest is not None:
+            _queue_partner_position(pipe, partner_id, newest["lat"], newest["lng"])
+    await pipe.execute()
+    return sum(len(points) for points in batches.values())
+
+
+async def append_location(
+    delivery_id: int, point: dict, *, order_id: int | None = None, partner_id: int | None = None
+) -> str:
+    ids = await append_locations(delivery_id, [point], order_id=order_id, partner_id=partner_id)
+    return ids[0]
+
+
+async def record_partner_position(partner_id: int, lat: float, lng: float) -> None:
+    redis: Redis = await get_redis()
+    pipe = redis.pipeline(transaction=False)
+    _queue_partner_position(pipe, partner_id, lat, lng)
+    await pipe.execute()
+
+
+async def get_partner_position(partner_id: int) -> tuple[float, float] | None:
+    """Last known (lat, lng) of a partner, or None if unknown or older than DISPATCH_POSITION_TTL_SECONDS."""
+    redis: Redis = await get_redis()
+    pipe = redis.pipeline(transaction=False)
+    pipe.geopos(PARTNER_GEO_KEY, partner_id)
+    pipe.zscore(PARTNER_SEEN_KEY, partner_id)
+    positions, seen = await pipe.execute()
+    if not positions or positions[0] is None or seen is None:
+        return None
+    if seen < time.time() - settings.DISPATCH_POSITION_TTL_SECONDS:
+        return None
+    lng, lat = positions[0]
+    return float(lat), float(lng)
+
+
+async def find_partners_near(
+    points: list[tuple[float, float]], *, radius_km: float, count: int
+) -> list[list[tuple[int, float]]]:
+    """For each (lat, lng), up to ``count`` fresh partners within ``radius_km`` as (partner_id, km), nearest first."""
+    if not points:
+        return []
+    redis: Redis = await get_redis()
+    cutoff = time.time() - settings.DISPATCH_POSITION_TTL_SECONDS
+    pipe = redis.pipeline(transaction=False)
+    for lat, lng in points:
+        pipe.geosearch(
+            PARTNER_GEO_KEY,
+            longitude=lng,
+            latitude=lat,
+            radius=radius_km,
+            unit="km",
+            sort="ASC",
+            # Over-fetch a little so stale riders filtered below do not empty the list.
+            count=count * 2,
+            withdist=True,
+        )
+    found = await pipe.execute()
+
+    partner_ids = list({int(member) for rows in found for member, _ in rows})
+    fresh: set[int] = set()
+    if partner_ids:
+        scores = await redis.zmscore(PARTNER_SEEN_KEY, partner_ids)
+        fresh = {pid for pid, seen in zip(partner_ids, scores) if seen is not None and seen >= cutoff}
+        if len(fresh) < len(partner_ids):
+            await _prune_stale_partners(redis, cutoff)
+
+    return [
+        [(int(member), float(km)) for member, km in rows if int(member) in fresh][:count]
+        for rows in found
+    ]
+
+
+async def _prune_stale_partners(redis: Redis, cutoff: float) -> None:
+    stale = await redis.zrangebyscore(PARTNER_SEEN_KEY, "-inf", cutoff)
+    if stale:
+        pipe = redis.pipeline(transaction=False)
+        pipe.zrem(PARTNER_GEO_KEY, *stale)
+        pipe.zrem(PARTNER_SEEN_KEY, *stale)
+        await pipe.execute()
+
+
+async def get_latest_location(delivery_id: int) -> dict | None:
+    redis: Redis = await get_redis()
+    raw = await redis.get(_latest_key(delivery_id))
+    return json.loads(raw) if raw else None
+
+
+async def get_latest_locations(delivery_ids: list[int]) -> dict[int, dict | None]:
+    if not delivery_ids:
+        return {}
+    redis: Redis = await get_redis()
+    raws = await redis.mget([_latest_key(delivery_id) for delivery_id in delivery_ids])
+    return {delivery_id: json.loads(raw) if raw else None for delivery_id, raw in zip(delivery_ids, raws)}
+
+
+_STREAM_ID = re.compile(r"\d+(-\d+)?")
+
+
+async def get_location_history(
+    delivery_id: int, *, limit: int = 100, before: str | None = None
+) -> tuple[list[dict], str | None]:
+    """Page backwards through history.
+
+    Returns up to ``limit`` points older than the ``before`` cursor, oldest
+    first, and the cursor for the next (older) page or None at the start.
+    """
+    if before and not _STREAM_ID.fullmatch(before):
+        raise ValidationException("Invalid history cursor")
+    redis: Redis = await get_redis()
+    max_id = f"({before}" if before else "+"
+    rows = await redis.xrevrange(_stream_key(delivery_id), max=max_id, min="-", count=limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    points = [_decode_entry(entry_id, fields) for entry_id, fields in reversed(rows)]
+    next_cursor = points[0]["cursor"] if has_more and points else None
+    return points, next_cursor
+
+
+def _dispatch(message: dict) -> None:
+    channel = message.get("channel") or ""
+    try:
+        order_id = int(channel[len(settings.TRACKING_CHANNEL_PREFIX):])
+    except ValueError:
+        return
+    for queue in _watchers.get(order_id, ()):
+        if queue.full():
+            # Slow consumer: positions supersede each other, drop the oldest.
+            queue.get_nowait()
+        queue.put_nowait(message["data"])
+
+
+async def _listen_for_updates() -> None:
+    global _pubsub
+    while True:
+        pubsub = None
+        try:
+            redis = await get_redis()
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            _pubsub = pubsub
+            while True:
+                if pubsub.connection is None:
+                    # (Re)connecting: subscribe to everything watched so far, or wait for a watcher.
+                    channels = [_order_channel(order_id) for order_id in _watchers]
+                    if channels:
+                        await pubsub.subscribe(*channels)
+                    else:
+                        _watch_added.clear()
+                        await _watch_added.wait()
+                    continue
+                message = await pubsub.get_message(timeout=1.0)
+                if message and message.get("type") == "message":
+                    _dispatch(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Tracking listener error: %s", str(exc))
+            await asyncio.sleep(1)
+        finally:
+            _pubsub = None
+            if pubsub is not None:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+
+async def _subscribe(order_id: int) -> None:
+    _watch_added.set()
+    pubsub = _pubsub
+    if pubsub is None or pubsub.connection is None:
+        # The listener subscribes to every watched order once it connects.
+        return
+    try:
+        await pubsub.subscribe(_order_channel(order_id))
+    except Exception as exc:
+        logger.warning("Tracking subscribe failed for order %s: %s", order_id, str(exc))
+
+
+async def _unsubscribe(order_id: int) -> None:
+    pubsub = _pubsub
+    if pubsub is None or pubsub.connection is None:
+        return
+    try:
+        await pubsub.unsubscribe(_order_channel(order_id))
+    except Exception as exc:
+        logger.warning("Tracking unsubscribe failed for order %s: %s", order_id, str(exc))
+    if order_id in _watchers:
+        # A watcher arrived while we were unsubscribing; its subscribe may have gone first.
+        await _subscribe(order_id)
+
+
+@asynccontextmanager
+async def watch_order(order_id: int) -> AsyncIterator[asyncio.Queue]:
+    """Queue of JSON-encoded location deltas for ``order_id`` while the context is open."""
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_for_updates())
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.TRACKING_STREAM_QUEUE_SIZE)
+    first = order_id not in _watchers
+    _watchers.setdefault(order_id, set()).add(queue)
+    if first:
+        await _subscribe(order_id)
+    try:
+        yield queue
+    finally:
+        watchers = _watchers.get(order_id)
+        if watchers is not None:
+            watchers.discard(queue)
+            if not watchers:
+                del _watchers[order_id]
+                await _unsubscribe(order_id)
+
+
+async def stop_tracking_listener() -> None:
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    try:
+        await _listener_task
+    except asyncio.CancelledError:
+        pass
+    _listener_task = None
@@ -0,0 +1,552 @@
+"""
+Two-tier response cache.
+
+L1 is a bounded in-process LRU with per-entry TTL. Values are frozen on the
+way in (dicts become read-only ``FrozenDict``, lists become tuples), so reads
+hand out the stored object directly instead of deep-copying it.
+
+L2 is the shared Redis instance from ``app.db.redis``. Entries are grouped by
+tags; invalidating a tag drops the L2 keys and broadcasts the tag over Redis
+pub/sub so every worker evicts its own L1 entries.
+
+Tags describe what an entry depends on: coarse ones such as ``search:products``
+and entity ones such as ``product:12``, ``seller:3`` or ``geo:5:tdr1w``. Writes
+invalidate the entity tags they touch, so only entries that include the changed
+entity are dropped.
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from typing import Any, Awaitable, Callable, Iterable
+from uuid import uuid4
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.redis import get_redis
+
+
+class FrozenDict(dict):
+    """Read-only dict. Still a ``dict`` so FastAPI/pydantic serialize it as-is."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached values are read-only; copy with dict() before mutating")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+
+def freeze(value: Any) -> Any:
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class LRUCache:
+    """Bounded LRU with TTL and a tag -> keys index.
+
+    Every method is synchronous and never awaits, so it is safe to call from
+    any coroutine on the event loop without a lock. Entries stay resident
+    until ``stale_until`` so ``peek`` can serve them while they are refreshed.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, int(max_entries))
+        self._data: OrderedDict[str, tuple[float, float, Any, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        row = self.peek(key)
+        if row is None or not row[1]:
+            return None
+        return row[0]
+
+    def peek(self, key: str) -> tuple[Any, bool] | None:
+        """Return ``(value, is_fresh)`` for live or stale entries."""
+        row = self._data.get(key)
+        if row is None:
+            return None
+        fresh_until, stale_until, value, _ = row
+        now = time.time()
+        if stale_until < now:
+            self._discard(key)
+            return None
+        self._data.move_to_end(key)
+        return value, fresh_until >= now
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        fresh_until: float,
+        stale_until: float | None = None,
+        tags: tuple[str, ...] = (),
+    ) -> None:
+        if key in self._data:
+            self._discard(key)
+        self._data[key] = (fresh_until, max(fresh_until, stale_until or 0), value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_entries:
+            oldest = next(iter(self._data))
+            self._discard(oldest)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> list[str]:
+        removed = []
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._discard(key)
+                removed.append(key)
+        return removed
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._tags.clear()
+
+    def _discard(self, key: str) -> None:
+        row = self._data.pop(key, None)
+        if row is None:
+            return
+        for tag in row[3]:
+            keys = self._tags.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                self._tags.pop(tag, None)
+
+
+_l1 = LRUCache(settings.CACHE_L1_MAX_ENTRIES)
+_worker_id = uuid4().hex
+_listener_task: asyncio.Task | None = None
+_inflight: dict[str, asyncio.Future] = {}
+# Recent local invalidations as (seq, tag). A load checks it on completion so a
+# result that raced with an invalidation of one of its tags is not written back.
+_invalidation_seq = 0
+_invalidation_log: deque[tuple[int, str]] = deque(maxlen=4096)
+# Per-namespace counters for this worker, see ``cache_stats``.
+_stats: defaultdict[str, Counter] = defaultdict(Counter)
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _value_key(key: str) -> str:
+    return f"{settings.CACHE_REDIS_PREFIX}val:{key}"
+
+
+def _tag_key(tag: str) -> str:
+    return f"{settings.CACHE_REDIS_PREFIX}tag:{tag}"
+
+
+def _lock_key(key: str) -> str:
+    return f"{settings.CACHE_REDIS_PREFIX}lock:{key}"
+
+
+def _namespace(name: str, depth: int = 2) -> str:
+    return ":".join(name.split(":", depth)[:depth])
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    """Hit/miss/invalidation counters of this worker, keyed by namespace.
+
+    Key namespaces (``search:products``, ``stores:nearby``...) count
+    ``l1_hits``, ``l2_hits``, ``stale_hits``, ``misses`` and ``evicted`` (entries
+    dropped by invalidation). Tag namespaces (``tag:product``, ``tag:geo``...)
+    count ``invalidations``.
+    """
+    return {name: dict(counter) for name, counter in sorted(_stats.items())}
+
+
+async def _l2_get(key: str) -> tuple[float, float, Any, tuple[str, ...]] | None:
+    if not settings.CACHE_L2_ENABLED:
+        return None
+    try:
+        redis = await get_redis()
+        raw = await redis.get(_value_key(key))
+    except Exception as exc:
+        logger.warning("Cache L2 read failed for %s: %s", key, str(exc))
+        return None
+    if raw is None:
+        return None
+    try:
+        row = json.loads(raw)
+        fresh_until = float(row["e"])
+        return fresh_until, float(row.get("s") or fresh_until), row["v"], tuple(row.get("t") or ())
+    except Exception:
+        return None
+
+
+async def _l2_set(
+    key: str,
+    value: Any,
+    fresh_until: float,
+    stale_until: float,
+    tags: tuple[str, ...],
+) -> None:
+    if not settings.CACHE_L2_ENABLED:
+        return
+    try:
+        raw = json.dumps(
+            {"e": fresh_until, "s": stale_until, "v": value, "t": tags},
+            separators=(",", ":"),
+        )
+    except (TypeError, ValueError) as exc:
+        logger.warning("Cache value for %s is not JSON serializable: %s", key, str(exc))
+        return
+    try:
+        redis = await get_redis()
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(_value_key(key), raw, ex=max(1, int(stale_until - time.time()) + 1))
+        for tag in tags:
+            pipe.sadd(_tag_key(tag), key)
+            # Tag sets only need to outlive the entries they point at.
+            pipe.expire(_tag_key(tag), settings.CACHE_TAG_TTL_SECONDS)
+        await pipe.execute()
+    except Exception as exc:
+        logger.warning("Cache L2 write failed for %s: %s", key, str(exc))
+
+
+async def _lookup(key: str) -> tuple[Any, bool] | None:
+    stats = _stats[_namespace(key)]
+    row = _l1.peek(key)
+    if row is not None:
+        stats["l1_hits" if row[1] else "stale_hits"] += 1
+        return row
+
+    l2_row = await _l2_get(key)
+    if l2_row is None:
+        stats["misses"] += 1
+        return None
+    fresh_until, stale_until, raw_value, tags = l2_row
+    if stale_until < time.time():
+        stats["misses"] += 1
+        return None
+    value = freeze(raw_value)
+    _l1.set(key, value, fresh_until, stale_until, tags)
+    is_fresh = fresh_until >= time.time()
+    stats["l2_hits" if is_fresh else "stale_hits"] += 1
+    return value, is_fresh
+
+
+async def cache_get(key: str) -> Any:
+    row = await _lookup(key)
+    if row is None or not row[1]:
+        return None
+    return row[0]
+
+
+async def cache_set(
+    key: str,
+    value: Any,
+    ttl_seconds: int,
+    tags: Iterable[str] = (),
+    stale_seconds: int = 0,
+) -> Any:
+    tags = tuple(tags)
+    frozen = freeze(value)
+    fresh_until = time.time() + ttl_seconds
+    stale_until = fresh_until + max(0, stale_seconds)
+    _l1.set(key, frozen, fresh_until, stale_until, tags)
+    await _l2_set(key, value, fresh_until, stale_until, tags)
+    return frozen
+
+
+async def _acquire_lock(key: str, token: str, lock_seconds: float) -> bool:
+    try:
+        redis = await get_redis()
+        return bool(await redis.set(_lock_key(key), token, nx=True, px=int(lock_seconds * 1000)))
+    except Exception as exc:
+        logger.warning("Cache lock acquire failed for %s: %s", key, str(exc))
+        # Without Redis we can still single-flight inside this worker.
+        return True
+
+
+async def _release_lock(key: str, token: str) -> None:
+    try:
+        redis = await get_redis()
+        await redis.eval(_RELEASE_LOCK_SCRIPT, 1, _lock_key(key), token)
+    except Exception as exc:
+        logger.warning("Cache lock release failed for %s: %s", key, str(exc))
+
+
+async def _wait_for_peer(key: str, lock_seconds: float) -> Any:
+    deadline = time.monotonic() + lock_seconds
+    delay = 0.02
+    while time.monotonic() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.2)
+        row = await _l2_get(key)
+        if row is not None and row[0] >= time.time():
+            value = freeze(row[2])
+            _l1.set(key, value, row[0], row[1], row[3])
+            return value
+    return None
+
+
+def _invalidated_since(seq: int, tags: Iterable[str]) -> bool:
+    if seq == _invalidation_seq:
+        return False
+    if not _invalidation_log or _invalidation_log[0][0] > seq + 1:
+        # The log rolled over while we were loading; assume the worst.
+        return True
+    tags = set(tags)
+    for entry_seq, tag in reversed(_invalidation_log):
+        if entry_seq <= seq:
+            break
+        if tag in tags:
+            return True
+    return False
+
+
+async def _load_and_store(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl_seconds: int,
+    tags: tuple[str, ...],
+    dependencies: Callable[[Any], Iterable[str]] | None,
+    stale_seconds: int,
+    lock_seconds: float | None,
+) -> Any:
+    started_seq = _invalidation_seq
+    token = None
+    try:
+        if lock_seconds and settings.CACHE_L2_ENABLED:
+            token = uuid4().hex
+            if not await _acquire_lock(key, token, lock_seconds):
+                token = None
+                value = await _wait_for_peer(key, lock_seconds)
+                if value is not None:
+                    return value
+
+        value = await loader()
+        if dependencies is not None:
+            tags = tags + tuple(dict.fromkeys(dependencies(value)))
+        if _invalidated_since(started_seq, tags):
+            return freeze(value)
+        return await cache_set(key, value, ttl_seconds, tags=tags, stale_seconds=stale_seconds)
+    finally:
+        if token is not None:
+            await _release_lock(key, token)
+
+
+def _track_inflight(key: str, future: asyncio.Future) -> None:
+    _inflight[key] = future
+
+    def _done(done: asyncio.Future) -> None:
+        if _inflight.get(key) is done:
+            _inflight.pop(key, None)
+        # Mark the exception as retrieved; callers awaiting the future re-raise it.
+        if not done.cancelled():
+            done.exception()
+
+    future.add_done_callback(_done)
+
+
+def _single_flight(key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+    """Run ``factory`` as its own task, shared by every caller for ``key``."""
+    future = _inflight.get(key)
+    if future is not None:
+        return future
+
+    future = asyncio.ensure_future(factory())
+    _track_inflight(key, future)
+    return future
+
+
+async def _load_as_owner(key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+    """Run ``load`` in the caller's task and hand its outcome to callers waiting on ``key``.
+
+    The load lives and dies with the caller, so it never runs on after the
+    caller's request (and its DB session) is gone; waiters then load themselves.
+    """
+    future = asyncio.get_running_loop().create_future()
+    _track_inflight(key, future)
+    try:
+        value = await load()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    future.set_result(value)
+    return value
+
+
+async def cache_get_or_set(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl_seconds: int,
+    *,
+    tags: Iterable[str] = (),
+    dependencies: Callable[[Any], Iterable[str]] | None = None,
+    stale_seconds: int = 0,
+    refresher: Callable[[], Awaitable[Any]] | None = None,
+    lock_seconds: float | None = None,
+) -> Any:
+    """Read-through cache with single-flight loading.
+
+    ``tags`` are known up front; ``dependencies`` derives extra tags from the
+    loaded value (e.g. ``product:<id>`` for every product in a result page).
+
+    Concurrent misses for ``key`` in this worker share one load. With
+    ``lock_seconds`` set, a Redis lock also makes other workers wait for that
+    result instead of loading it themselves. When ``refresher`` is given, an
+    entry up to ``stale_seconds`` past its TTL is returned immediately and
+    refreshed in the background, and shared loads run ``refresher`` in a task
+    of their own, so a caller going away does not stop them. ``refresher`` must
+    therefore not depend on request-scoped state (e.g. the request's DB
+    session). ``loader`` may: it only ever runs in its caller's task, and if
+    that caller is cancelled the callers waiting on it load for themselves.
+    """
+    tags = tuple(tags)
+    row = await _lookup(key)
+    if row is not None:
+        value, is_fresh = row
+        if is_fresh:
+            return value
+        if refresher is not None:
+            _single_flight(
+                key,
+                lambda: _load_and_store(
+                    key, refresher, ttl_seconds, tags, dependencies, stale_seconds, lock_seconds
+                ),
+            )
+            return value
+
+    if refresher is not None:
+        future = _single_flight(
+            key,
+            lambda: _load_and_store(
+                key, refresher, ttl_seconds, tags, dependencies, stale_seconds, lock_seconds
+            ),
+        )
+        # Shield so one caller going away does not cancel the load for the others.
+        return await asyncio.shield(future)
+
+    while (future := _inflight.get(key)) is not None:
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            # The caller that was loading went away; load it ourselves.
+    return await _load_as_owner(
+        key,
+        lambda: _load_and_store(key, loader, ttl_seconds, tags, dependencies, stale_seconds, lock_seconds),
+    )
+
+
+async def cache_invalidate_tags(*tags: str) -> None:
+    tags = tuple(dict.fromkeys(t for t in tags if t))
+    if not tags:
+        return
+    _invalidate_local(tags)
+    if not settings.CACHE_L2_ENABLED:
+        return
+
+    try:
+        redis = await get_redis()
+        pipe = redis.pipeline(transaction=False)
+        for tag in tags:
+            pipe.smembers(_tag_key(tag))
+        keys = sorted({key for members in await pipe.execute() for key in members})
+        pipe = redis.pipeline(transaction=False)
+        if keys:
+            pipe.delete(*[_value_key(k) for k in keys])
+        pipe.delete(*[_tag_key(t) for t in tags])
+        pipe.publish(
+            settings.CACHE_INVALIDATION_CHANNEL,
+            json.dumps({"origin": _worker_id, "tags": list(tags)}),
+        )
+        await pipe.execute()
+    except Exception as exc:
+        logger.warning("Cache invalidation failed for tags %s: %s", ",".join(tags), str(exc))
+
+
+def _invalidate_local(tags: Iterable[str]) -> None:
+    global _invalidation_seq
+    tags = tuple(tags)
+    for tag in tags:
+        _invalidation_seq += 1
+        _invalidation_log.append((_invalidation_seq, tag))
+        _stats[f"tag:{_namespace(tag, 1)}"]["invalidations"] += 1
+    for key in _l1.invalidate_tags(tags):
+        _stats[_namespace(key)]["evicted"] += 1
+
+
+def cache_clear_local() -> None:
+    _l1.clear()
+
+
+def _apply_remote_invalidation(message: dict) -> None:
+    try:
+        body = json.loads(message.get("data") or "{}")
+    except (TypeError, ValueError):
+        return
+    if body.get("origin") == _worker_id:
+        return
+    _invalidate_local(body.get("tags") or ())
+
+
+async def _listen_for_invalidations() -> None:
+    while True:
+        pubsub = None
+        try:
+            redis = await get_redis()
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _apply_remote_invalidation(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Cache invalidation listener error: %s", str(exc))
+            # We may have missed broadcasts while disconnected.
+            _l1.clear()
+            await asyncio.sleep(1)
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+
+async def start_cache_listener() -> None:
+    global _listener_task
+    if not settings.CACHE_L2_ENABLED or _listener_task is not None:
+        return
+    _listener_task = asyncio.create_task(_listen_for_invalidations())
+
+
+async def stop_cache_listener() -> None:
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    try:
+        await _listener_task
+    except asyncio.CancelledError:
+        pass
+    _listener_task = None
@@ -0,0 +1,99 @@
+import time
+from collections import Counter, deque
+
+
+class CircuitBreaker:
+    """Per-worker circuit breaker with a rolling latency window.
+
+    Closed: calls go through; ``failure_threshold`` consecutive failures (errors
+    or calls slower than ``slow_call_seconds``) open it. Open: calls are
+    rejected until ``reset_seconds`` have passed, then one probe is let through
+    (half-open). A successful probe closes the breaker, a failed one opens it
+    again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int,
+        slow_call_seconds: float,
+        reset_seconds: float,
+        window: int = 200,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: float | None = None
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._counts: Counter = Counter()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self._opened_at < self.reset_seconds:
+                self._counts["rejected"] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._counts["half_opened"] += 1
+        if self.state == self.HALF_OPEN:
+            # One probe at a time; a probe that never reported is given up on after reset_seconds.
+            if self._probe_started_at is not None and now - self._probe_started_at < self.reset_seconds:
+                self._counts["rejected"] += 1
+                return False
+            self._probe_started_at = now
+        return True
+
+    def record_success(self, seconds: float | None = None) -> None:
+        if seconds is not None:
+            self._latencies.append(seconds)
+            if seconds > self.slow_call_seconds:
+                self._counts["slow"] += 1
+                self._fail()
+                return
+        self._counts["success"] += 1
+        self._failures = 0
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            self._probe_started_at = None
+            self._counts["closed"] += 1
+
+    def record_failure(self) -> None:
+        self._counts["failure"] += 1
+        self._fail()
+
+    def _fail(self) -> None:
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self._counts["opened"] += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_started_at = None
+
+    def latency_percentile(self, fraction: float, min_samples: int = 20) -> float | None:
+        """Latency at ``fraction`` (0.95 for p95) over the recent window, or None with too few samples."""
+        if len(self._latencies) < min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def stats(self) -> dict:
+        p50 = self.latency_percentile(0.5, min_samples=1)
+        p95 = self.latency_percentile(0.95, min_samples=1)
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "counts": dict(self._counts),
+        }
@@ -1,4 +1,19 @@
-from math import radians, sin, cos, sqrt, atan2
+from math import asin, cos, isnan, radians, sin, sqrt, atan2
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; batch helpers fall back to pure Python
+    np = None
+
+EARTH_RADIUS_KM = 6371
+
+# Delivery ETA model: fixed preparation time plus travel at urban speed, capped.
+PREPARATION_MINUTES = 15
+AVERAGE_SPEED_KMPH = 20
+MAX_DELIVERY_MINUTES = 120
+
+NAN = float("nan")
 
 
 def calculate_distance_km(lat1, lon1, lat2, lon2) -> float:
@@ -6,13 +21,13 @@ def calculate_distance_km(lat1, lon1, lat2, lon2) -> float:
     Calculate the distance between two points on Earth using the Haversine formula.
     Returns distance in kilometers.
     """
-    R = 6371  # Earth's radius in kilometers
-    
+    R = EARTH_RADIUS_KM  # Earth's radius in kilometers
+
     lat1 = float(lat1)
     lon1 = float(lon1)
     lat2 = float(lat2)
     lon2 = float(lon2)
-    
+
     dlat = radians(lat2 - lat1)
     dlon = radians(lon2 - lon1)
 
@@ -24,3 +39,79 @@ def calculate_distance_km(lat1, lon1, lat2, lon2) -> float:
     )
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
     return float(R * c)
+
+
+def estimate_delivery_minutes(distance_km: float) -> int:
+    travel_time = (distance_km / AVERAGE_SPEED_KMPH) * 60
+    return min(int(PREPARATION_MINUTES + travel_time), MAX_DELIVERY_MINUTES)
+
+
+# Batch API
+#
+# Coordinates may be NumPy arrays or any sequence of numbers; ``None`` marks a
+# missing coordinate and yields NaN. With NumPy installed the results are
+# float64 arrays (N, or N x M for ``distance_matrix``), otherwise lists.
+
+
+def _as_array(values):
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    return np.array([NAN if v is None else v for v in values], dtype=np.float64)
+
+
+def _haversine_np(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(v) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _haversine_py(lat1, lng1, lat2, lng2) -> float:
+    if lat1 is None or lng1 is None or lat2 is None or lng2 is None:
+        return NAN
+    rlat1 = radians(lat1)
+    rlat2 = radians(lat2)
+    a = sin((rlat2 - rlat1) / 2) ** 2 + cos(rlat1) * cos(rlat2) * sin(radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0)))
+
+
+def distances_from(origin_lat: float, origin_lng: float, lats: Sequence, lngs: Sequence):
+    """Distance in km from one origin to each of N destinations."""
+    if np is not None:
+        return _haversine_np(origin_lat, origin_lng, _as_array(lats), _as_array(lngs))
+    return [_haversine_py(origin_lat, origin_lng, lat, lng) for lat, lng in zip(lats, lngs)]
+
+
+def distances_between(lats1: Sequence, lngs1: Sequence, lats2: Sequence, lngs2: Sequence):
+    """Element-wise distance in km between N (from, to) pairs."""
+    if np is not None:
+        return _haversine_np(_as_array(lats1), _as_array(lngs1), _as_array(lats2), _as_array(lngs2))
+    return [_haversine_py(*row) for row in zip(lats1, lngs1, lats2, lngs2)]
+
+
+def distance_matrix(lats1: Sequence, lngs1: Sequence, lats2: Sequence, lngs2: Sequence):
+    """N x M distances in km between every source and every destination."""
+    if np is not None:
+        return _haversine_np(
+            _as_array(lats1)[:, None],
+            _as_array(lngs1)[:, None],
+            _as_array(lats2)[None, :],
+            _as_array(lngs2)[None, :],
+        )
+    return [
+        [_haversine_py(lat1, lng1, lat2, lng2) for lat2, lng2 in zip(lats2, lngs2)]
+        for lat1, lng1 in zip(lats1, lngs1)
+    ]
+
+
+def delivery_minutes(distances):
+    """Vectorized ``estimate_delivery_minutes``; NaN distances stay NaN."""
+    if np is not None and isinstance(distances, np.ndarray):
+        travel = (distances / AVERAGE_SPEED_KMPH) * 60
+        return np.minimum(np.floor(PREPARATION_MINUTES + travel), MAX_DELIVERY_MINUTES)
+    return [NAN if isnan(d) else estimate_delivery_minutes(d) for d in distances]
+
+
+def distances_and_eta_from(origin_lat: float, origin_lng: float, lats: Sequence, lngs: Sequence):
+    """``(distances_km, eta_minutes)`` from one origin to N destinations."""
+    distances = distances_from(origin_lat, origin_lng, lats, lngs)
+    return distances, delivery_minutes(distances)
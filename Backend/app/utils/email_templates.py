@@ -41,6 +41,21 @@ def order_created_email(name: str, order_id: int, amount: int) -> tuple[str, str
     return subject, text
 
 
+def orders_created_email(name: str, order_ids: list[int], amount: int) -> tuple[str, str]:
+    if len(order_ids) == 1:
+        return order_created_email(name, order_ids[0], amount)
+    numbers = ", ".join(f"#{order_id}" for order_id in order_ids)
+    subject = f"{len(order_ids)} orders placed successfully"
+    text = (
+        f"Hi {name},\n\n"
+        f"Your orders {numbers} have been placed, one per store.\n"
+        f"Total amount: INR {amount}\n"
+        f"Track orders: {_app_url('buyer/orders')}\n\n"
+        "Thank you for shopping with RushCart."
+    )
+    return subject, text
+
+
 def order_status_email(name: str, order_id: int, status: str) -> tuple[str, str]:
     subject = f"Order #{order_id} status updated"
     text = (
@@ -0,0 +1,105 @@
+from math import cos, radians
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_KM_PER_DEGREE_LAT = 111.32
+
+# ~4.8m x 4.8m cells; stored on ``sellers.geohash``.
+SELLER_PRECISION = 9
+
+
+def encode(lat: float, lng: float, precision: int = 9) -> str:
+    """Standard base32 geohash of a point."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(lat_degrees, lng_degrees) covered by one cell at ``precision``."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) enclosing a circle of ``radius_km``."""
+    dlat = radius_km / _KM_PER_DEGREE_LAT
+    lat_cos = max(cos(radians(lat)), 0.01)
+    dlng = min(radius_km / (_KM_PER_DEGREE_LAT * lat_cos), 180.0)
+    return (
+        max(lat - dlat, -90.0),
+        max(lng - dlng, -180.0),
+        min(lat + dlat, 90.0),
+        min(lng + dlng, 180.0),
+    )
+
+
+def cells_covering(
+    min_lat: float, min_lng: float, max_lat: float, max_lng: float, precision: int
+) -> list[str]:
+    """Geohash cells at ``precision`` that intersect the bounding box."""
+    lat_step, lng_step = cell_size(precision)
+    cells: dict[str, None] = {}
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            cells[encode(lat, lng, precision)] = None
+            if lng >= max_lng:
+                break
+            lng = min(lng + lng_step, max_lng)
+        if lat >= max_lat:
+            break
+        lat = min(lat + lat_step, max_lat)
+    return list(cells)
+
+
+def covering_precision(
+    min_lat: float, min_lng: float, max_lat: float, max_lng: float, max_cells: int, precisions: tuple[int, ...]
+) -> int:
+    """Finest precision in ``precisions`` whose cover of the box stays within ``max_cells``."""
+    for precision in sorted(precisions, reverse=True):
+        lat_step, lng_step = cell_size(precision)
+        rows = int((max_lat - min_lat) / lat_step) + 2
+        cols = int((max_lng - min_lng) / lng_step) + 2
+        if rows * cols <= max_cells:
+            return precision
+    return min(precisions)
+
+
+def encode_location(lat, lng, precision: int = SELLER_PRECISION) -> str | None:
+    """Geohash for a stored location, or None when either coordinate is missing."""
+    if lat is None or lng is None:
+        return None
+    try:
+        return encode(float(lat), float(lng), precision)
+    except (TypeError, ValueError):
+        return None
@@ -1,6 +1,30 @@
+import base64
+import binascii
+import json
+
 from sqlalchemy.sql import Select
+
+from app.core.exceptions import ValidationException
 
 
 def paginate(query: Select, page: int, size: int):
     offset = (page - 1) * size
     return query.offset(offset).limit(size)
+
+
+def encode_cursor(backend: str, values: list) -> str:
+    """Opaque token for keyset pagination: the sort values of the last row served."""
+    raw = json.dumps({"b": backend, "k": values}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[str, list]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        body = json.loads(raw)
+        backend, values = body["b"], body["k"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise ValidationException("Invalid cursor") from exc
+    if not isinstance(backend, str) or not isinstance(values, list):
+        raise ValidationException("Invalid cursor")
+    return backend, values
@@ -0,0 +1,22 @@
+CATEGORY_SLUG_LENGTH = 100
+
+
+def slugify(value: str | None, max_length: int | None = None) -> str:
+    """Lowercase, runs of non-alphanumerics collapsed to one dash, no leading/trailing dashes."""
+    if not value:
+        return ""
+    out = []
+    prev_dash = False
+    for ch in str(value).strip().lower():
+        if ch.isalnum():
+            out.append(ch)
+            prev_dash = False
+        elif not prev_dash:
+            out.append("-")
+            prev_dash = True
+    return "".join(out).strip("-")[:max_length]
+
+
+def category_slug(category: str | None) -> str | None:
+    """Value stored in ``products.category_slug`` for ``category``."""
+    return slugify(category, CATEGORY_SLUG_LENGTH) or None
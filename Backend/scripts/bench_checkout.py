@@ -0,0 +1,129 @@
+"""
+Concurrency benchmark: checkouts per second on a single hot product.
+
+Runs ``--checkouts`` one-unit checkouts from ``--concurrency`` concurrent
+buyers against an existing product whose stock is set to ``--stock`` first
+(and put back afterwards), in three modes:
+
+- naive:  read the row, check and decrement in Python (the old create_order)
+- atomic: ``inventory_service.reserve_stock`` (conditional UPDATE)
+- hot:    ``reserve_stock`` with the product marked hot (Redis gate first)
+
+"oversold" counts checkouts that succeeded beyond the stock. Run it against a
+development database: the product's stock is rewritten while it runs.
+
+Usage: python -m scripts.bench_checkout --product-id 1 [--stock 500] [--checkouts 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.exceptions import ConflictException
+from app.db.postgres import AsyncSessionLocal, engine
+from app.db.redis import close_redis
+from app.models.product_model import Product
+from app.services.inventory_service import abort_reserved_stock, mark_hot_product, reserve_stock, unmark_hot_product
+
+
+async def _naive_checkout(product_id: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        product = await db.get(Product, product_id)
+        if product.stock < 1:
+            return False
+        product.stock -= 1
+        await db.commit()
+        return True
+
+
+async def _atomic_checkout(product_id: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        try:
+            await reserve_stock(db, {product_id: 1})
+        except ConflictException:
+            return False
+        try:
+            await db.commit()
+        except BaseException:
+            await abort_reserved_stock({product_id: 1})
+            raise
+        return True
+
+
+async def _set_stock(product_id: int, stock: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Product).where(Product.id == product_id).values(stock=stock))
+        await db.commit()
+
+
+async def _run(mode: str, checkout, product_id: int, stock: int, checkouts: int, concurrency: int) -> None:
+    await _set_stock(product_id, stock)
+    if mode == "hot":
+        async with AsyncSessionLocal() as db:
+            await mark_hot_product(db, product_id, seconds=600)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(checkouts):
+        queue.put_nowait(None)
+    outcomes = {"sold": 0, "rejected": 0, "errors": 0}
+
+    async def buyer() -> None:
+        while not queue.empty():
+            queue.get_nowait()
+            try:
+                outcomes["sold" if await checkout(product_id) else "rejected"] += 1
+            except Exception:
+                outcomes["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buyer() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    if mode == "hot":
+        await unmark_hot_product(product_id)
+    async with AsyncSessionLocal() as db:
+        left = await db.scalar(select(Product.stock).where(Product.id == product_id))
+    print(
+        f"{mode:>7} {checkouts / elapsed:>12.0f} {outcomes['sold']:>7} {outcomes['rejected']:>9} "
+        f"{outcomes['errors']:>7} {max(0, outcomes['sold'] - stock):>9} {left:>6}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--product-id", type=int, required=True)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--checkouts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--modes", default="naive,atomic,hot")
+    args = parser.parse_args()
+    modes = args.modes.split(",")
+    if set(modes) - {"naive", "atomic", "hot"}:
+        parser.error("--modes takes naive, atomic and/or hot")
+
+    async def runner() -> None:
+        async with AsyncSessionLocal() as db:
+            original = await db.scalar(select(Product.stock).where(Product.id == args.product_id))
+        if original is None:
+            raise SystemExit(f"product {args.product_id} not found")
+        hot_enabled = settings.INVENTORY_HOT_SKU_ENABLED
+        print(f"{args.checkouts} checkouts of 1 unit, stock {args.stock}, {args.concurrency} concurrent buyers")
+        print(f"{'mode':>7} {'checkouts/s':>12} {'sold':>7} {'rejected':>9} {'errors':>7} {'oversold':>9} {'left':>6}")
+        try:
+            for mode in modes:
+                settings.INVENTORY_HOT_SKU_ENABLED = mode == "hot"
+                checkout = _naive_checkout if mode == "naive" else _atomic_checkout
+                await _run(mode, checkout, args.product_id, args.stock, args.checkouts, args.concurrency)
+        finally:
+            settings.INVENTORY_HOT_SKU_ENABLED = hot_enabled
+            await _set_stock(args.product_id, original)
+            await close_redis()
+            await engine.dispose()
+
+    asyncio.run(runner())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark for dispatch ranking and matching with synthetic data.
+
+Compares the indexed paths used by ``app.services.dispatch_service`` (spatial
+prefilter for pickups, nearest-partner lookup for matching) against scanning
+every order / every partner. An in-memory grid stands in for the
+``sellers.geohash`` index and the Redis GEO set; like them it only visits the
+cells around the query point.
+
+Usage: python -m scripts.bench_dispatch [--orders 10000] [--partners 2000]
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from math import cos, radians
+
+from app.core.config import settings
+from app.services.dispatch_service import match_greedy, score_open_order
+from app.utils import distance
+
+
+def _points(n: int, rng: random.Random) -> list[tuple[float, float]]:
+    # A ~110km x 110km region: a metro and its satellite towns.
+    return [(12.5 + rng.random(), 77.1 + rng.random()) for _ in range(n)]
+
+
+class _Grid:
+    """Points bucketed into cells at least ``radius_km`` wide."""
+
+    def __init__(self, points: list[tuple[float, float]], radius_km: float):
+        self.points = points
+        self.radius_km = radius_km
+        mid_lat = sum(lat for lat, _ in points) / len(points)
+        self.lat_step = radius_km / 111.32
+        self.lng_step = radius_km / (111.32 * max(cos(radians(mid_lat)), 0.01))
+        self.cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+        for index, (lat, lng) in enumerate(points):
+            self.cells[self._cell(lat, lng)].append(index)
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return int(lat // self.lat_step), int(lng // self.lng_step)
+
+    def near(self, lat: float, lng: float) -> list[tuple[int, float]]:
+        """Indices within ``radius_km`` of (lat, lng) with distances, nearest first."""
+        row, col = self._cell(lat, lng)
+        indices = [i for dr in (-1, 0, 1) for dc in (-1, 0, 1) for i in self.cells.get((row + dr, col + dc), ())]
+        kms = distance.distances_from(
+            lat, lng, [self.points[i][0] for i in indices], [self.points[i][1] for i in indices]
+        )
+        found = [(i, float(km)) for i, km in zip(indices, kms) if km <= self.radius_km]
+        found.sort(key=lambda row: row[1])
+        return found
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def bench_feed(orders, earnings, ages, partners, requests: int) -> None:
+    radius = settings.DISPATCH_FEED_RADIUS_KM
+    grid = _Grid(orders, radius)
+    pool = settings.DISPATCH_FEED_CANDIDATES
+    order_lats = [lat for lat, _ in orders]
+    order_lngs = [lng for _, lng in orders]
+
+    def full_scan():
+        for lat, lng in partners[:requests]:
+            kms = distance.distances_from(lat, lng, order_lats, order_lngs)
+            scored = sorted(
+                (score_open_order(float(km), earnings[i], ages[i]), i) for i, km in enumerate(kms) if km <= radius
+            )
+            scored[:20]
+
+    def indexed():
+        for lat, lng in partners[:requests]:
+            nearest = grid.near(lat, lng)[:pool]
+            scored = sorted((score_open_order(km, earnings[i], ages[i]), i) for i, km in nearest)
+            scored[:20]
+
+    scan_s, _ = _timed(full_scan)
+    index_s, _ = _timed(indexed)
+    print(f"ranked feed, {len(orders)} open orders, {requests} requests")
+    print(f"  full scan : {scan_s / requests * 1000:8.2f} ms/request")
+    print(f"  indexed   : {index_s / requests * 1000:8.2f} ms/request")
+
+
+def bench_match(orders, partners) -> None:
+    radius = settings.DISPATCH_MATCH_RADIUS_KM
+    per_order = settings.DISPATCH_MATCH_CANDIDATES
+    batch = settings.DISPATCH_MATCH_MAX_ORDERS
+    capacity = {pid: settings.DISPATCH_MAX_ACTIVE_DELIVERIES for pid in range(len(partners))}
+    partner_lats = [lat for lat, _ in partners]
+    partner_lngs = [lng for _, lng in partners]
+    grid = _Grid(partners, radius)
+
+    def brute_force():
+        remaining = dict(capacity)
+        matched = 0
+        for start in range(0, len(orders), batch):
+            chunk = orders[start : start + batch]
+            matrix = distance.distance_matrix(
+                [lat for lat, _ in chunk], [lng for _, lng in chunk], partner_lats, partner_lngs
+            )
+            candidates = [
+                (start + i, pid, float(km))
+                for i, row in enumerate(matrix)
+                for pid, km in enumerate(row)
+                if km <= radius
+            ]
+            matches = match_greedy(candidates, remaining)
+            for partner_id, _ in matches.values():
+                remaining[partner_id] -= 1
+            matched += len(matches)
+        return matched
+
+    def indexed():
+        remaining = dict(capacity)
+        matched = 0
+        for start in range(0, len(orders), batch):
+            candidates = [
+                (start + i, pid, km)
+                for i, (lat, lng) in enumerate(orders[start : start + batch])
+                for pid, km in grid.near(lat, lng)[:per_order]
+            ]
+            matches = match_greedy(candidates, remaining)
+            for partner_id, _ in matches.values():
+                remaining[partner_id] -= 1
+            matched += len(matches)
+        return matched
+
+    brute_s, brute_matched = _timed(brute_force)
+    index_s, index_matched = _timed(indexed)
+    print(f"batch match, {len(orders)} orders x {len(partners)} partners, batches of {batch}")
+    print(f"  brute force: {brute_s:8.2f} s  matched={brute_matched}")
+    print(f"  indexed    : {index_s:8.2f} s  matched={index_matched}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--partners", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    orders = _points(args.orders, rng)
+    partners = _points(args.partners, rng)
+    earnings = [rng.randint(8, 200) for _ in orders]
+    ages = [rng.random() * 60 for _ in orders]
+
+    bench_feed(orders, earnings, ages, partners, min(args.requests, args.partners))
+    bench_match(orders, partners)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Microbenchmark: scalar ``calculate_distance_km`` loop vs the batch helpers in
+``app.utils.distance``.
+
+Usage: python -m scripts.bench_distance [--sizes 10000,100000,1000000]
+"""
+import argparse
+import random
+import time
+
+from app.utils import distance
+
+
+def _points(n: int, seed: int = 7) -> tuple[list[float], list[float]]:
+    rng = random.Random(seed)
+    # Roughly a metro area, like real pickup/drop points.
+    lats = [12.8 + rng.random() * 0.4 for _ in range(n)]
+    lngs = [77.4 + rng.random() * 0.4 for _ in range(n)]
+    return lats, lngs
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(sizes: list[int]) -> None:
+    origin_lat, origin_lng = 12.97, 77.59
+    backend = "numpy" if distance.np is not None else "pure-python"
+    print(f"batch backend: {backend}")
+    print(f"{'points':>10} {'scalar s':>10} {'batch s':>10} {'scalar pts/s':>14} {'batch pts/s':>14} {'speedup':>8}")
+    for n in sizes:
+        lats, lngs = _points(n)
+
+        def scalar():
+            for lat, lng in zip(lats, lngs):
+                d = distance.calculate_distance_km(origin_lat, origin_lng, lat, lng)
+                distance.estimate_delivery_minutes(d)
+
+        if distance.np is not None:
+            lat_arr = distance.np.asarray(lats)
+            lng_arr = distance.np.asarray(lngs)
+        else:
+            lat_arr, lng_arr = lats, lngs
+
+        def batch():
+            distance.distances_and_eta_from(origin_lat, origin_lng, lat_arr, lng_arr)
+
+        scalar_s = _timed(scalar)
+        batch_s = _timed(batch)
+        print(
+            f"{n:>10} {scalar_s:>10.4f} {batch_s:>10.4f} {n / scalar_s:>14.0f} "
+            f"{n / batch_s:>14.0f} {scalar_s / batch_s:>7.1f}x"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(",") if size])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Rebuild the Elasticsearch product/store indices and swap their aliases.
+
+Usage:
+    python -m scripts.reindex_search [products|stores|all]
+        [--chunk-size 1000] [--workers 4] [--resume] [--delete-old]
+
+With --resume a previously interrupted run continues from its checkpoint
+instead of starting a new index.
+"""
+import argparse
+import asyncio
+
+from app.db.redis import close_redis
+from app.services.search_reindex import REINDEX_TARGETS, reindex
+from app.services.search_service import close_search_client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target", nargs="?", default="all", choices=(*REINDEX_TARGETS, "all"))
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--delete-old", action="store_true")
+    args = parser.parse_args()
+    targets = REINDEX_TARGETS if args.target == "all" else (args.target,)
+
+    async def runner() -> None:
+        try:
+            for target in targets:
+                summary = await reindex(
+                    target,
+                    chunk_size=args.chunk_size,
+                    workers=args.workers,
+                    resume=args.resume,
+                    delete_old=args.delete_old,
+                )
+                print(
+                    f"[{target}] done: {summary['documents']} docs into {summary['index']} "
+                    f"in {summary['seconds']}s"
+                )
+        finally:
+            await close_search_client()
+            await close_redis()
+
+    asyncio.run(runner())
+
+
+if __name__ == "__main__":
+    main()
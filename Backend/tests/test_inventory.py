@@ -0,0 +1,179 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.exceptions import ConflictException
+from app.models.order_item_model import OrderItem
+from app.models.order_model import Order, PaymentMethod
+from app.models.product_model import Product
+from app.models.seller_model import Seller
+from app.models.user_model import User, UserRole
+from app.schemas.order_schema import CheckoutCreate
+from app.services.inventory_service import release_stock, reserve_stock
+from app.services.order_service import create_orders
+
+pytestmark = pytest.mark.anyio
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _FakeSession:
+    """Answers the reserve UPDATE with ``rows`` (or raises ``error``) and records rollbacks."""
+
+    def __init__(self, rows=(), error: Exception | None = None):
+        self.rows = [SimpleNamespace(id=pid, stock=stock) for pid, stock in rows]
+        self.error = error
+        self.rolled_back = 0
+
+    async def execute(self, statement, params=None):
+        if self.error is not None:
+            raise self.error
+        return _Result(self.rows)
+
+    async def rollback(self):
+        self.rolled_back += 1
+
+
+async def test_reserve_gives_hot_units_back_when_a_line_is_short(hot_counters):
+    db = _FakeSession(rows=[(1, 3)])
+
+    with pytest.raises(ConflictException, match="product 2"):
+        await reserve_stock(db, {1: 2, 2: 5})
+
+    assert db.rolled_back == 1
+    assert hot_counters["taken"] == [{1: 2, 2: 5}]
+    assert hot_counters["given_back"] == [{1: 2, 2: 5}]
+
+
+async def test_reserve_gives_hot_units_back_when_the_update_fails(hot_counters):
+    db = _FakeSession(error=RuntimeError("deadlock detected"))
+
+    with pytest.raises(RuntimeError, match="deadlock"):
+        await reserve_stock(db, {1: 2})
+
+    assert hot_counters["given_back"] == [{1: 2}]
+
+
+async def test_reserve_keeps_hot_units_on_success(hot_counters):
+    db = _FakeSession(rows=[(1, 1), (2, 0)])
+
+    assert await reserve_stock(db, {1: 2, 2: 5}) == {1: 1, 2: 0}
+    assert db.rolled_back == 0
+    assert hot_counters["given_back"] == []
+
+
+async def _seed(db, stocks: list[tuple[int, int]]) -> tuple[int, list[int]]:
+    """A buyer and one product per ``(seller number, stock)``; returns their ids.
+
+    Ids rather than instances: a rollback expires instances, and an async
+    session cannot lazy-load them back.
+    """
+    buyer = User(name="Buyer", email="buyer@rushcart.test", password="x", role=UserRole.buyer)
+    db.add(buyer)
+    sellers: dict[int, Seller] = {}
+    products = []
+    for number, stock in stocks:
+        if number not in sellers:
+            owner = User(
+                name=f"Seller {number}", email=f"seller{number}@rushcart.test", password="x", role=UserRole.seller
+            )
+            db.add(owner)
+            await db.flush()
+            sellers[number] = Seller(user_id=owner.id, store_name=f"Store {number}", approved=True)
+            db.add(sellers[number])
+            await db.flush()
+        product = Product(seller_id=sellers[number].id, title=f"Product {len(products) + 1}", price=100, stock=stock)
+        db.add(product)
+        products.append(product)
+    await db.flush()
+    ids = buyer.id, [product.id for product in products]
+    await db.commit()
+    return ids
+
+
+def _checkout(lines: list[tuple[int, int]]) -> CheckoutCreate:
+    return CheckoutCreate(
+        items=[{"product_id": product_id, "quantity": quantity} for product_id, quantity in lines],
+        address={
+            "name": "Buyer",
+            "phone": "9000000000",
+            "house_no": "1",
+            "city": "Pune",
+            "state": "MH",
+            "pincode": "411001",
+        },
+        payment_method=PaymentMethod.cod,
+    )
+
+
+async def _stocks(db, product_ids: list[int]) -> list[int]:
+    result = await db.execute(select(Product.id, Product.stock).where(Product.id.in_(product_ids)))
+    stock = dict(result.all())
+    return [stock[product_id] for product_id in product_ids]
+
+
+async def _count(db, model) -> int:
+    return await db.scalar(select(func.count()).select_from(model))
+
+
+async def test_short_line_rolls_back_the_whole_multi_seller_order(pg_session, hot_counters):
+    db = pg_session
+    buyer_id, (first, second) = await _seed(db, [(1, 5), (2, 1)])
+
+    # Each line passes the per-line early check; together they want 2 of the 1 in stock.
+    with pytest.raises(ConflictException, match=f"product {second}"):
+        await create_orders(db, buyer_id, _checkout([(first, 2), (second, 1), (second, 1)]))
+
+    assert await _count(db, Order) == 0
+    assert await _count(db, OrderItem) == 0
+    assert await _stocks(db, [first, second]) == [5, 1]
+    assert hot_counters["given_back"] == [{first: 2, second: 2}]
+
+
+async def test_hot_units_given_back_when_the_commit_fails(pg_session, hot_counters, monkeypatch):
+    db = pg_session
+    buyer_id, (first, second) = await _seed(db, [(1, 5), (2, 5)])
+
+    async def failing_commit():
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(RuntimeError, match="connection lost"):
+        await create_orders(db, buyer_id, _checkout([(first, 2), (second, 3)]))
+    monkeypatch.undo()
+    await db.rollback()
+
+    assert hot_counters["given_back"] == [{first: 2, second: 3}]
+    assert await _count(db, Order) == 0
+    assert await _stocks(db, [first, second]) == [5, 5]
+
+
+async def test_release_stock_restores_exact_quantities(pg_session, hot_counters):
+    db = pg_session
+    _, (first, second, untouched) = await _seed(db, [(1, 3), (1, 0), (2, 7)])
+
+    restored = await release_stock(db, {first: 2, second: 5, untouched: 0})
+    await db.commit()
+
+    assert restored == {first: 5, second: 5}
+    assert await _stocks(db, [first, second, untouched]) == [5, 5, 7]
+    assert hot_counters["given_back"] == [{first: 2, second: 5}]
+
+
+async def test_reserve_then_release_round_trips(pg_session, hot_counters):
+    db = pg_session
+    _, (first, second) = await _seed(db, [(1, 4), (2, 2)])
+
+    assert await reserve_stock(db, {first: 3, second: 2}) == {first: 1, second: 0}
+    await db.commit()
+    await release_stock(db, {first: 3, second: 2})
+    await db.commit()
+
+    assert await _stocks(db, [first, second]) == [4, 2]
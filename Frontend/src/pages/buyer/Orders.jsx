@@ -62,6 +62,7 @@ export default function BuyerOrders() {
     switch (status?.toLowerCase()) {
       case "delivered":
         return <CheckCircle className="w-5 h-5 text-green-500" />;
+      case "expired":
       case "cancelled":
         return <XCircle className="w-5 h-5 text-red-500" />;
       default:
@@ -73,6 +74,7 @@ export default function BuyerOrders() {
     switch (status?.toLowerCase()) {
       case "delivered":
         return "bg-emerald-500/20 text-emerald-200";
+      case "expired":
       case "cancelled":
         return "bg-red-500/20 text-red-200";
       case "processing":
@@ -38,6 +38,7 @@ export default function SellerOrders() {
     switch (status?.toLowerCase()) {
       case "delivered":
         return <CheckCircle className="w-5 h-5 text-green-500" />;
+      case "expired":
       case "cancelled":
         return <XCircle className="w-5 h-5 text-red-500" />;
       default:
@@ -49,6 +50,7 @@ export default function SellerOrders() {
     switch (status?.toLowerCase()) {
       case "delivered":
         return "bg-emerald-300/20 text-emerald-200";
+      case "expired":
       case "cancelled":
         return "bg-red-500/20 text-red-200";
       case "packed":
@@ -132,7 +134,7 @@ export default function SellerOrders() {
                 <div className="border-t border-white/10 pt-4 mt-4">
                   <p className="text-xl font-bold text-right text-white">₹{order.total_amount || order.total}</p>
                 </div>
-                {order.status !== "delivered" && order.status !== "cancelled" && (
+                {!["delivered", "cancelled", "expired"].includes(order.status) && (
                   <div className="border-t border-white/10 pt-3 mt-3 flex gap-2 justify-end">
                     {order.status === "placed" && (
                       <button